@@ -1,4 +1,4 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import os
 import base64
@@ -6,11 +6,27 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
-import pandas as pd
-import re
+import json
+import sys
 from werkzeug.utils import secure_filename
-from pypdf import PdfReader
-import google.generativeai as genai
+
+# Package core/ nằm ở thư mục gốc của project (dùng chung với api/ trên Vercel)
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.drug_summarizer import PROMPT_VERSION as SUMMARY_PROMPT_VERSION, has_source_text, no_info_summary, summarize_monograph
+from core.drug_catalog import DrugCatalog, MAX_BATCH_SIZE
+from core.ocr_resolver import OCR_COMMON_WORDS, OCRRegion, confident_candidate, resolve_ocr_regions
+from core.lazy_pdf import LazyPdf
+from core.llm_client import client_from_env
+from core.monograph_table import MonographTable, default_table_path, parse_monograph_details, read_monograph_text
+from core.monograph_spans import MonographSpanIndex, default_index_path as default_spans_path
+from core.page_offset_map import PageOffsetMap, default_map_path
+from core.page_text_cache import page_text_source, shared_page_text_cache
+from core.page_text_store import PageTextStore, default_store_path
+from core.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate, parse_limit
+from core.result_cache import ResultCache
+from core.single_flight import SingleFlight
+from core.summary_cache import SummaryCache, default_cache_path as default_summary_cache_path, source_hash
+from core.text_utils import normalize_key
 
 # Load environment variables from .env file
 try:
@@ -53,37 +69,165 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DRUG_DB_PATH = os.path.join(BASE_DIR, '..', 'Crawldata', 'drug_database_refined.csv')
 PDF_PATH = os.path.join(BASE_DIR, '..', 'Crawldata', 'duoc-thu-quoc-gia-viet-nam-2018.pdf')
-drug_db = None
-pdf_reader = None
+# Text từng trang trích xuất sẵn (Crawldata/build_page_text_store.py)
+PAGE_TEXT_STORE_PATH = os.getenv('PAGE_TEXT_STORE_PATH', default_store_path(PDF_PATH))
+drug_catalog = None  # DrugCatalog (load một lần, bất biến)
+pdf_reader = None  # LazyPdf (mmap, parse từng trang khi cần)
+page_text_store = None  # PageTextStore (None = trích xuất trực tiếp từ pdf_reader)
+# Vị trí từng chuyên luận trong PDF (Crawldata/build_monograph_spans.py)
+MONOGRAPH_SPANS_PATH = os.getenv('MONOGRAPH_SPANS_PATH', default_spans_path(PDF_PATH))
+monograph_spans = None  # MonographSpanIndex (None = parse cả trang)
+# Bản đồ trang sách -> trang PDF (Crawldata/calibrate_page_offsets.py)
+PAGE_OFFSET_MAP_PATH = os.getenv('PAGE_OFFSET_MAP_PATH', default_map_path(PDF_PATH))
+page_offset_map = PageOffsetMap.constant()  # Chưa hiệu chỉnh: cùng độ lệch cho cả cuốn
+# Các trường chuyên luận parse sẵn (Crawldata/build_monograph_table.py)
+MONOGRAPH_TABLE_PATH = os.getenv('MONOGRAPH_TABLE_PATH', default_table_path(PDF_PATH))
+monograph_table = None  # MonographTable (None = parse PDF trong request)
 ocr_reader = None  # EasyOCR reader (cache để không load lại mỗi lần)
+# Kết quả tổng hợp Gemini lưu bền trên đĩa, dùng chung với api/ (cùng file mặc định cạnh PDF)
+SUMMARY_CACHE_PATH = os.getenv('SUMMARY_CACHE_PATH', default_summary_cache_path(PDF_PATH))
+summary_cache = None  # SummaryCache (None = luôn gọi Gemini)
+llm_client = None  # LLMClient dùng lại giữa các request (None = chưa cấu hình GEMINI_API_KEY)
+
+# Cache kết quả tra thuốc / chi tiết trang PDF (thuốc phổ biến được scan lặp lại nhiều lần)
+CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL', 3600))
+drug_lookup_cache = ResultCache(maxsize=int(os.getenv('DRUG_CACHE_SIZE', 2048)),
+                                ttl=CACHE_TTL_SECONDS, name='drug_lookup')
+pdf_details_cache = ResultCache(maxsize=int(os.getenv('PDF_DETAILS_CACHE_SIZE', 512)),
+                                ttl=CACHE_TTL_SECONDS, name='pdf_details')
+# Chi tiết PDF + tổng hợp Gemini + khuyến nghị theo chuyên luận (nhiều biệt dược dùng chung một chuyên luận)
+monograph_cache = ResultCache(maxsize=int(os.getenv('MONOGRAPH_CACHE_SIZE', 1024)),
+                              ttl=CACHE_TTL_SECONDS, name='monograph')
+# Kết quả khớp của từng text OCR (dùng bởi resolver khi scan ảnh)
+ocr_match_cache = ResultCache(maxsize=int(os.getenv('OCR_MATCH_CACHE_SIZE', 4096)),
+                              ttl=CACHE_TTL_SECONDS, name='ocr_match')
+# Gộp các lần tổng hợp đồng thời cho cùng chuyên luận thành một lần gọi Gemini
+summary_flight = SingleFlight('summary')
 
 def load_drug_database():
-    """Load drug database từ CSV file"""
-    global drug_db
+    """Load drug catalog từ CSV file (kèm các index tìm kiếm)"""
+    global drug_catalog
     try:
         if os.path.exists(DRUG_DB_PATH):
-            drug_db = pd.read_csv(DRUG_DB_PATH)
-            print(f"✅ Đã load {len(drug_db)} thuốc từ database")
+            drug_catalog = DrugCatalog.from_csv(DRUG_DB_PATH)
+            print(f"✅ Đã load {len(drug_catalog)} thuốc từ database")
         else:
             print(f"⚠️ Không tìm thấy file database tại: {DRUG_DB_PATH}")
-            drug_db = pd.DataFrame()
+            drug_catalog = DrugCatalog.empty()
     except Exception as e:
         print(f"⚠️ Không thể load database: {e}")
-        drug_db = pd.DataFrame()
+        drug_catalog = DrugCatalog.empty()
+    # Kết quả tra cứu cũ không còn đúng với catalog mới
+    drug_lookup_cache.clear()
+    ocr_match_cache.clear()
+    monograph_cache.clear()
 
 def load_pdf():
-    """Load PDF dược thư quốc gia"""
-    global pdf_reader
+    """Load PDF dược thư quốc gia (ưu tiên store text trang đã trích xuất sẵn)"""
+    global pdf_reader, page_text_store, page_offset_map, monograph_spans, monograph_table
+    if page_text_store is not None:
+        page_text_store.close()
+    page_text_store = PageTextStore.open_for(PDF_PATH, PAGE_TEXT_STORE_PATH)
+    if page_text_store is not None:
+        print(f"✅ Đã load text {len(page_text_store)} trang PDF từ store: {PAGE_TEXT_STORE_PATH}")
+    calibrated_map = PageOffsetMap.open_for(PDF_PATH, PAGE_OFFSET_MAP_PATH)
+    if calibrated_map is not None:
+        page_offset_map = calibrated_map
+        print(f"✅ Đã load bản đồ trang sách -> PDF ({len(page_offset_map)} đoạn): {PAGE_OFFSET_MAP_PATH}")
+    else:
+        page_offset_map = PageOffsetMap.constant()
+    monograph_spans = MonographSpanIndex.open_for(PDF_PATH, MONOGRAPH_SPANS_PATH)
+    if monograph_spans is not None:
+        print(f"✅ Đã load vị trí {len(monograph_spans)} chuyên luận: {MONOGRAPH_SPANS_PATH}")
+    if monograph_table is not None:
+        monograph_table.close()
+    monograph_table = MonographTable.open_for(PDF_PATH, MONOGRAPH_TABLE_PATH)
+    if monograph_table is not None:
+        print(f"✅ Đã load bảng {len(monograph_table)} chuyên luận parse sẵn: {MONOGRAPH_TABLE_PATH}")
+    
     try:
         if os.path.exists(PDF_PATH):
-            pdf_reader = PdfReader(PDF_PATH)
-            print(f"✅ Đã load PDF với {len(pdf_reader.pages)} trang")
+            if pdf_reader is not None:
+                pdf_reader.close()
+            # Không đọc cả file/cây trang lúc khởi động: số trang lấy từ bảng vị trí trang
+            # (<pdf>.pageoffsets.sqlite, tự dựng lần đầu), trang chỉ được parse khi cần
+            pdf_reader = LazyPdf(PDF_PATH)
+            print(f"✅ Đã mở PDF với {len(pdf_reader)} trang (memory-map, đọc từng trang khi cần)")
         else:
             print(f"⚠️ Không tìm thấy file PDF tại: {PDF_PATH}")
             pdf_reader = None
     except Exception as e:
         print(f"⚠️ Không thể load PDF: {e}")
         pdf_reader = None
+    if page_text_store is None and pdf_reader is not None:
+        print("⚠️ Chưa có store text trang PDF, sẽ trích xuất trực tiếp (chạy Crawldata/build_page_text_store.py để tăng tốc)")
+    shared_page_text_cache.clear(page_text_source(PDF_PATH, 'pypdf'))
+    pdf_details_cache.clear()
+    monograph_cache.clear()
+
+def load_summary_cache():
+    """Mở summary cache bền (SQLite) cho kết quả tổng hợp Gemini"""
+    global summary_cache
+    if summary_cache is not None:
+        summary_cache.close()
+    summary_cache = SummaryCache.open(SUMMARY_CACHE_PATH)
+    if summary_cache is not None:
+        print(f"✅ Đã mở summary cache ({len(summary_cache)} kết quả Gemini): {SUMMARY_CACHE_PATH}")
+    else:
+        print(f"⚠️ Không mở được summary cache tại: {SUMMARY_CACHE_PATH}")
+
+def load_llm_client():
+    """Tạo LLM client dùng chung (LLM_CLIENT=stub: model giả lập để load test không cần mạng)"""
+    global llm_client
+    try:
+        llm_client = client_from_env()
+    except ValueError as e:
+        print(f"⚠️ Không tạo được LLM client: {e}")
+        llm_client = None
+    if llm_client is not None:
+        print(f"✅ LLM client: {llm_client.name} (timeout {llm_client.timeout}s, "
+              f"tối đa {llm_client.max_concurrency} lần gọi đồng thời)")
+
+def get_pdf_page_count():
+    """Số trang PDF (0 nếu không có cả store lẫn PDF)"""
+    if page_text_store is not None:
+        return len(page_text_store)
+    return len(pdf_reader) if pdf_reader is not None else 0
+
+def get_pdf_page_text(pdf_page_index):
+    """
+    Text của trang PDF (index từ 0): đọc từ store, không có store thì trích xuất trực tiếp
+    Qua cache text trang dùng chung trong process (store có cùng text với pypdf nên chung nguồn)
+    """
+    return shared_page_text_cache.get_or_load(
+        page_text_source(PDF_PATH, 'pypdf'),
+        pdf_page_index,
+        lambda: _read_pdf_page_text(pdf_page_index)
+    )
+
+def book_page_to_pdf_index(page_number):
+    """Index trang PDF (từ 0) của trang sách trong CSV, None nếu số trang không hợp lệ"""
+    try:
+        return page_offset_map.to_pdf_index(page_number)
+    except (TypeError, ValueError):
+        return None
+
+def find_monograph_span(page_number, title):
+    """Chuyên luận có tiêu đề `title` gần trang sách `page_number` (None nếu không có span index/không tìm thấy)"""
+    if monograph_spans is None or not title:
+        return None
+    pdf_page_index = book_page_to_pdf_index(page_number)
+    if pdf_page_index is None:
+        return None
+    return monograph_spans.find(title, pdf_page_index)
+
+def _read_pdf_page_text(pdf_page_index):
+    """Đọc text trang từ store hoặc pypdf (không qua cache)"""
+    if page_text_store is not None:
+        return page_text_store.get(pdf_page_index)
+    if pdf_reader is None:
+        return None
+    return pdf_reader.page_text(pdf_page_index)
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -180,12 +324,15 @@ def get_ocr_reader():
     return ocr_reader
 
 def extract_text_from_image(image_array):
-    """Trích xuất text từ ảnh sử dụng EasyOCR, trả về tất cả text và text được chọn"""
+    """
+    Trích xuất text từ ảnh sử dụng EasyOCR
+    Trả về (text được chọn, tất cả text, các OCRRegion kèm confidence/vị trí)
+    """
     try:
         reader = get_ocr_reader()
         if reader is None:
             print("❌ OCR reader is None")
-            return None, []
+            return None, [], []
         
         # EasyOCR cần ảnh ở dạng numpy array (BGR hoặc RGB)
         if len(image_array.shape) == 2:
@@ -205,17 +352,10 @@ def extract_text_from_image(image_array):
         
         if not results:
             print("⚠️ OCR không tìm thấy text nào trong ảnh")
-            return None, []
+            return None, [], []
         
         # Danh sách từ thông thường cần loại bỏ (không phải tên thuốc)
-        common_words = {
-            'arthritis', 'pain', 'relief', 'fever', 'reducer', 'temporary', 'minor',
-            'tablets', 'caplets', 'mg', 'each', 'extended', 'release', 'acetaminophen',
-            'ibuprofen', 'aspirin', 'do', 'not', 'use', 'with', 'other', 'medicines',
-            'containing', 'to', 'open', 'push', 'turn', 'cap', 'warnings', 'directions',
-            'store', 'at', 'room', 'temperature', 'keep', 'out', 'of', 'reach', 'children',
-            'active', 'ingredient', 'inactive', 'ingredients', 'see', 'package', 'insert'
-        }
+        common_words = OCR_COMMON_WORDS
         
         # Lấy tất cả text với thông tin chi tiết
         all_texts = []
@@ -307,7 +447,7 @@ def extract_text_from_image(image_array):
             
             if not all_texts:
                 print("❌ Vẫn không có text nào sau khi lấy tất cả")
-                return None, []
+                return None, [], []
             else:
                 print(f"✅ Đã lấy được {len(all_texts)} text (không filter confidence)")
         
@@ -366,19 +506,33 @@ def extract_text_from_image(image_array):
                 selected_text = max(all_texts, key=lambda x: len(x['text']))['text']
             print(f"✅ Chọn text dài nhất: '{selected_text}'")
         
-        # Trả về text đã chọn và danh sách tất cả text
+        # Trả về text đã chọn, danh sách tất cả text và các region (cho resolver)
         all_texts_list = [t['text'] for t in all_texts]
-        return selected_text, all_texts_list
+        regions = [
+            OCRRegion(t['text'], t['confidence'], t['distance_from_center'], t['area'])
+            for t in all_texts
+        ]
+        return selected_text, all_texts_list, regions
         
     except Exception as e:
         import traceback
         print(f"❌ Lỗi OCR: {e}")
         print(f"📋 Traceback:\n{traceback.format_exc()}")
-        return None, []
+        return None, [], []
 
 def search_drug_in_database(drug_name, all_ocr_texts=None):
-    """Tìm kiếm thuốc trong database - cải thiện với fuzzy matching và tìm theo hoạt chất"""
-    if drug_db is None or drug_db.empty:
+    """
+    Tìm kiếm thuốc trong database - cải thiện với fuzzy matching và tìm theo hoạt chất
+    Trả về DrugRecord (hỗ trợ .get('DrugName') như dict) hoặc None
+    Kết quả (kể cả không tìm thấy) được cache theo text đã chuẩn hóa
+    """
+    alternates = tuple(normalize_key(t) for t in (all_ocr_texts or [])[:5] if isinstance(t, str))
+    key = (normalize_key(drug_name), alternates)
+    return drug_lookup_cache.get_or_compute(key, lambda: _search_drug_in_database(drug_name, all_ocr_texts))
+
+def _search_drug_in_database(drug_name, all_ocr_texts=None):
+    """Cascade tìm kiếm thật (không qua cache)"""
+    if not drug_catalog:
         return None
     
     # Làm sạch text: loại bỏ ký tự đặc biệt có thể gây lỗi regex
@@ -393,19 +547,16 @@ def search_drug_in_database(drug_name, all_ocr_texts=None):
     print(f"🔍 Tìm kiếm thuốc: '{drug_name_clean}'")
     
     # Tìm exact match trong DrugName
-    exact_match = drug_db[drug_db['DrugName'].str.lower() == drug_name_lower]
-    if not exact_match.empty:
-        print(f"✅ Tìm thấy exact match: {exact_match.iloc[0]['DrugName']}")
-        return exact_match.iloc[0].to_dict()
+    exact_match = drug_catalog.get_by_name(drug_name_lower)
+    if exact_match is not None:
+        print(f"✅ Tìm thấy exact match: {exact_match.name}")
+        return exact_match
     
     # Tìm partial match trong DrugName
-    try:
-        partial_match = drug_db[drug_db['DrugName'].str.lower().str.contains(drug_name_lower, na=False, regex=False)]
-        if not partial_match.empty:
-            print(f"✅ Tìm thấy partial match: {partial_match.iloc[0]['DrugName']}")
-            return partial_match.iloc[0].to_dict()
-    except Exception as e:
-        print(f"⚠️ Lỗi tìm kiếm partial match: {e}")
+    record = drug_catalog.first_name_containing(drug_name_lower)
+    if record is not None:
+        print(f"✅ Tìm thấy partial match: {record.name}")
+        return record
     
     # Tìm theo từ khóa trong DrugName
     keywords = drug_name_lower.split()
@@ -413,24 +564,17 @@ def search_drug_in_database(drug_name, all_ocr_texts=None):
         if len(keyword) > 3:
             keyword_clean = keyword.strip('[](){}.,;:!?')
             if len(keyword_clean) > 3:
-                try:
-                    keyword_match = drug_db[drug_db['DrugName'].str.lower().str.contains(keyword_clean, na=False, regex=False)]
-                    if not keyword_match.empty:
-                        print(f"✅ Tìm thấy theo keyword '{keyword_clean}': {keyword_match.iloc[0]['DrugName']}")
-                        return keyword_match.iloc[0].to_dict()
-                except Exception as e:
-                    print(f"⚠️ Lỗi tìm kiếm keyword '{keyword_clean}': {e}")
-                    continue
+                record = drug_catalog.first_name_containing(keyword_clean)
+                if record is not None:
+                    print(f"✅ Tìm thấy theo keyword '{keyword_clean}': {record.name}")
+                    return record
     
     # Nếu không tìm thấy, thử tìm trong ActiveIngredient
     print(f"🔍 Không tìm thấy trong DrugName, thử tìm trong ActiveIngredient...")
-    try:
-        ingredient_match = drug_db[drug_db['ActiveIngredient'].str.lower().str.contains(drug_name_lower, na=False, regex=False)]
-        if not ingredient_match.empty:
-            print(f"✅ Tìm thấy theo hoạt chất: {ingredient_match.iloc[0]['DrugName']} ({ingredient_match.iloc[0]['ActiveIngredient']})")
-            return ingredient_match.iloc[0].to_dict()
-    except Exception as e:
-        print(f"⚠️ Lỗi tìm kiếm trong ActiveIngredient: {e}")
+    record = drug_catalog.first_ingredient_containing(drug_name_lower)
+    if record is not None:
+        print(f"✅ Tìm thấy theo hoạt chất: {record.name} ({record.ingredient})")
+        return record
     
     # Nếu có all_ocr_texts, thử tìm với các text khác có confidence cao
     if all_ocr_texts:
@@ -438,20 +582,26 @@ def search_drug_in_database(drug_name, all_ocr_texts=None):
         for ocr_text in all_ocr_texts[:5]:  # Thử 5 text đầu tiên
             if ocr_text and len(ocr_text.strip()) > 3:
                 ocr_clean = ocr_text.strip().lower()
-                try:
-                    # Tìm trong DrugName
-                    ocr_match = drug_db[drug_db['DrugName'].str.lower().str.contains(ocr_clean, na=False, regex=False)]
-                    if not ocr_match.empty:
-                        print(f"✅ Tìm thấy với text OCR '{ocr_text}': {ocr_match.iloc[0]['DrugName']}")
-                        return ocr_match.iloc[0].to_dict()
-                    
-                    # Tìm trong ActiveIngredient
-                    ocr_ingredient_match = drug_db[drug_db['ActiveIngredient'].str.lower().str.contains(ocr_clean, na=False, regex=False)]
-                    if not ocr_ingredient_match.empty:
-                        print(f"✅ Tìm thấy hoạt chất với text OCR '{ocr_text}': {ocr_ingredient_match.iloc[0]['DrugName']} ({ocr_ingredient_match.iloc[0]['ActiveIngredient']})")
-                        return ocr_ingredient_match.iloc[0].to_dict()
-                except:
-                    continue
+                
+                # Tìm trong DrugName
+                record = drug_catalog.first_name_containing(ocr_clean)
+                if record is not None:
+                    print(f"✅ Tìm thấy với text OCR '{ocr_text}': {record.name}")
+                    return record
+                
+                # Tìm trong ActiveIngredient
+                record = drug_catalog.first_ingredient_containing(ocr_clean)
+                if record is not None:
+                    print(f"✅ Tìm thấy hoạt chất với text OCR '{ocr_text}': {record.name} ({record.ingredient})")
+                    return record
+    
+    # Cuối cùng: tìm gần đúng, chấp nhận lỗi OCR (PARACETAM0L, Panad1l, ...)
+    candidates = [drug_name_lower] + [t for t in (all_ocr_texts or [])[:5] if t and len(t.strip()) > 3]
+    for ocr_text in candidates:
+        record, match = drug_catalog.find_ocr_match(ocr_text)
+        if record is not None:
+            print(f"✅ Tìm thấy gần đúng (lỗi OCR) '{ocr_text}' ~ '{match.term}' (khoảng cách {match.distance}): {record.name}")
+            return record
     
     print(f"❌ Không tìm thấy thuốc: '{drug_name_clean}'")
     return None
@@ -461,167 +611,50 @@ def summarize_drug_info_with_gemini(pdf_text, drug_name, drug_info):
     Sử dụng Gemini AI để đọc toàn bộ thông tin từ PDF và tổng hợp thành:
     - Cách dùng (usage): Dễ hiểu, ngắn gọn
     - Lưu ý (notes): Từ chống chỉ định, tương tác thuốc, tác dụng phụ
+    
+    Kết quả được lưu trong summary cache bền (SQLite, dùng chung giữa Backend và api/) theo
+    chuyên luận + hash text nguồn + phiên bản prompt; cache hit không gọi Gemini.
+    Các request đồng thời cho cùng chuyên luận chờ và dùng chung một lần tổng hợp (summary_flight).
     """
-    if not pdf_text or len(pdf_text.strip()) < 50:
+    if not has_source_text(pdf_text):
         print("⚠️ PDF text quá ngắn hoặc rỗng, không thể tổng hợp")
-        return {
-            'usage': 'Thông tin cách dùng không có trong dược thư cho thuốc này.',
-            'notes': 'Thông tin lưu ý không có trong dược thư cho thuốc này.'
-        }
+        return no_info_summary()
+    
+    # Chỉ cache/gộp theo chuyên luận (nhiều biệt dược dùng chung một kết quả)
+    monograph_id = getattr(drug_info, 'monograph_id', None)
+    if not monograph_id:
+        return _summarize_through_cache(pdf_text, drug_name, drug_info, None)
+    summary = summary_flight.do((monograph_id, source_hash(pdf_text)),
+                                lambda: _summarize_through_cache(pdf_text, drug_name, drug_info, monograph_id))
+    return dict(summary)
+
+def _summarize_through_cache(pdf_text, drug_name, drug_info, monograph_id):
+    """Tra summary cache, miss thì gọi LLM và lưu kết quả (không gộp request)"""
+    cache = summary_cache if monograph_id else None
+    if cache is not None:
+        cached = cache.get(monograph_id, pdf_text, SUMMARY_PROMPT_VERSION)
+        if cached is not None:
+            return cached
     
-    # Lấy API key từ environment variable
-    gemini_api_key = os.getenv('GEMINI_API_KEY')
-    if not gemini_api_key:
+    # LLM client dùng chung cho cả process (None = chưa cấu hình GEMINI_API_KEY)
+    client = llm_client
+    if client is None:
         print("⚠️ GEMINI_API_KEY không được cấu hình, trả về 'không có'")
-        return {
-            'usage': 'Thông tin cách dùng không có trong dược thư cho thuốc này.',
-            'notes': 'Thông tin lưu ý không có trong dược thư cho thuốc này.'
-        }
+        return no_info_summary()
     
-    try:
-        # Cấu hình Gemini
-        genai.configure(api_key=gemini_api_key)
-        # Sử dụng Gemini 2.0 Flash (model mới nhất, nhanh và chính xác)
-        try:
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        except Exception as e:
-            print(f"⚠️ Không thể dùng gemini-2.0-flash-exp, thử gemini-2.0-flash: {e}")
-            try:
-                model = genai.GenerativeModel('gemini-2.0-flash')
-            except Exception as e2:
-                print(f"⚠️ Không thể dùng gemini-2.0-flash, thử gemini-1.5-flash: {e2}")
-                model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Lấy thông tin bổ sung từ drug_info
-        category = drug_info.get('Category', '')
-        active_ingredient = drug_info.get('ActiveIngredient', '')
-        
-        # Giới hạn độ dài PDF text để tránh vượt quá token limit
-        pdf_text_limited = pdf_text[:3000] if len(pdf_text) > 3000 else pdf_text
-        
-        # Prompt để tổng hợp thông tin - cải thiện để filter đúng thuốc và không bịa ra thông tin
-        prompt = f"""Bạn là một dược sĩ chuyên nghiệp. Hãy đọc và tổng hợp thông tin từ Dược thư Quốc gia về thuốc CỤ THỂ sau:
-
-**THUỐC CẦN TÌM:**
-- Tên thuốc: {drug_name}
-- Hoạt chất: {active_ingredient}
-- Phân loại: {category}
-
-**LƯU Ý QUAN TRỌNG - ĐỌC KỸ:**
-- Trang PDF có thể chứa thông tin của NHIỀU thuốc khác nhau
-- BẠN CHỈ ĐƯỢC tổng hợp thông tin về thuốc "{drug_name}" hoặc "{active_ingredient}"
-- BỎ QUA hoàn toàn thông tin về các thuốc khác (như Polymyxin, Polygelin, hoặc bất kỳ thuốc nào khác)
-- **QUAN TRỌNG NHẤT: NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY TRONG PDF, BẠN PHẢI TRẢ VỀ "KHÔNG CÓ TRONG DƯỢC THƯ"**
-- **TUYỆT ĐỐI KHÔNG ĐƯỢC BỊA RA, TẠO RA, HOẶC SUY ĐOÁN THÔNG TIN KHÔNG CÓ TRONG PDF**
-- **CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF, KHÔNG THÊM BẤT KỲ THÔNG TIN NÀO KHÔNG CÓ TRONG PDF**
-
-**Thông tin từ Dược thư (có thể chứa nhiều thuốc):**
-{pdf_text_limited}
-
-**YÊU CẦU:**
-1. Tổng hợp phần "CÁCH DÙNG" (usage) - CHỈ về thuốc "{drug_name}":
-   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
-   - Viết bằng ngôn ngữ đơn giản, dễ hiểu
-   - Tập trung vào: liều lượng, thời điểm uống, cách uống, tần suất
-   - Sử dụng câu ngắn gọn, rõ ràng
-   - Loại bỏ thuật ngữ y khoa phức tạp
-   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin cách dùng không có trong dược thư cho thuốc này."**
-   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
-
-2. Tổng hợp phần "LƯU Ý" (notes) - CHỈ về thuốc "{drug_name}":
-   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
-   - Từ chống chỉ định: ai không nên dùng
-   - Tương tác thuốc: không dùng cùng với thuốc gì
-   - Tác dụng phụ: cần chú ý gì
-   - Đối tượng đặc biệt: phụ nữ có thai, trẻ em, người già
-   - Bảo quản: cách bảo quản thuốc
-   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin lưu ý không có trong dược thư cho thuốc này."**
-   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
-
-**Trả về theo định dạng JSON:**
-{{
-  "usage": "Phần cách dùng (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin cách dùng không có trong dược thư cho thuốc này.' nếu không có)",
-  "notes": "Phần lưu ý (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin lưu ý không có trong dược thư cho thuốc này.' nếu không có)"
-}}
+    summary = _summarize_with_llm(pdf_text, drug_name, drug_info, client)
+    # Không lưu kết quả rỗng (lỗi gọi Gemini) để lần sau thử lại
+    if cache is not None and (summary.get('usage') or summary.get('notes')):
+        cache.put(monograph_id, pdf_text, SUMMARY_PROMPT_VERSION, summary)
+    return summary
 
-**QUAN TRỌNG:**
-- Chỉ trả về JSON, không thêm text khác
-- KHÔNG được trả về thông tin của thuốc khác
-- **TUYỆT ĐỐI KHÔNG BỊA RA THÔNG TIN - CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF**
-- Nếu không tìm thấy, phải trả về message "không có trong dược thư" một cách rõ ràng"""
-        
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        # Loại bỏ markdown code blocks nếu có
-        result_text = result_text.replace('```json', '').replace('```', '').strip()
-        
-        # Parse JSON
-        import json
-        try:
-            result = json.loads(result_text)
-            usage = result.get('usage', '').strip()
-            notes = result.get('notes', '').strip()
-            
-            # Kiểm tra xem có phải là thông báo không có thông tin không
-            # Chuẩn hóa message để đảm bảo rõ ràng
-            usage_lower = usage.lower()
-            notes_lower = notes.lower()
-            
-            # Kiểm tra các pattern cho "không có thông tin"
-            no_info_patterns = [
-                'không tìm thấy',
-                'không có trong',
-                'không có thông tin',
-                'chưa có thông tin',
-                'thiếu thông tin'
-            ]
-            
-            if any(pattern in usage_lower for pattern in no_info_patterns):
-                usage = "Thông tin cách dùng không có trong dược thư cho thuốc này."
-            
-            if any(pattern in notes_lower for pattern in no_info_patterns):
-                notes = "Thông tin lưu ý không có trong dược thư cho thuốc này."
-            
-            # Kiểm tra nếu Gemini trả về text quá ngắn hoặc không có ý nghĩa (có thể là bịa ra)
-            # Nếu usage hoặc notes quá ngắn (< 20 ký tự) và không phải là message "không có", có thể là lỗi
-            if len(usage.strip()) < 20 and not any(pattern in usage_lower for pattern in no_info_patterns):
-                print(f"⚠️ Usage quá ngắn ({len(usage)} ký tự), có thể không chính xác. Đặt lại thành 'không có'")
-                usage = "Thông tin cách dùng không có trong dược thư cho thuốc này."
-            
-            if len(notes.strip()) < 20 and not any(pattern in notes_lower for pattern in no_info_patterns):
-                print(f"⚠️ Notes quá ngắn ({len(notes)} ký tự), có thể không chính xác. Đặt lại thành 'không có'")
-                notes = "Thông tin lưu ý không có trong dược thư cho thuốc này."
-            
-            # Giới hạn độ dài
-            if len(usage) > 500:
-                usage = usage[:500] + "..."
-            if len(notes) > 600:
-                notes = notes[:600] + "..."
-            
-            print(f"✅ Đã tổng hợp thông tin với Gemini cho {drug_name}")
-            return {
-                'usage': usage,
-                'notes': notes
-            }
-        except json.JSONDecodeError:
-            # Nếu không parse được JSON, thử extract thủ công
-            print("⚠️ Không parse được JSON từ Gemini, thử extract thủ công")
-            # Tìm phần usage và notes trong text
-            usage_start = result_text.find('"usage"') or result_text.find('CÁCH DÙNG')
-            notes_start = result_text.find('"notes"') or result_text.find('LƯU Ý')
-            
-            if usage_start > -1 and notes_start > -1:
-                usage = result_text[usage_start:notes_start].replace('"usage":', '').strip('",')
-                notes = result_text[notes_start:].replace('"notes":', '').strip('",')
-                return {'usage': usage[:500], 'notes': notes[:600]}
-            else:
-                # Fallback: chia text làm 2 phần
-                parts = result_text.split('\n\n')
-                usage = parts[0] if len(parts) > 0 else ''
-                notes = parts[1] if len(parts) > 1 else ''
-                return {'usage': usage[:500], 'notes': notes[:600]}
-        
+def _summarize_with_llm(pdf_text, drug_name, drug_info, client):
+    """Gọi LLM (Gemini hoặc model giả lập) và hậu xử lý kết quả JSON (không qua cache)"""
+    try:
+        # Prompt + hậu xử lý dùng chung với job tổng hợp trước (core/drug_summarizer.py)
+        summary = summarize_monograph(client, pdf_text, drug_name, drug_info)
+        print(f"✅ Đã tổng hợp thông tin với Gemini cho {drug_name}")
+        return summary
     except Exception as e:
         print(f"⚠️ Lỗi khi gọi Gemini API: {e}")
         return {'usage': '', 'notes': ''}
@@ -668,66 +701,99 @@ def generate_recommendations(drug_info, pdf_details):
     
     return recommendations
 
-def extract_drug_details_from_pdf(page_number, offset=-1):
+def get_monograph_details(drug_info):
+    """
+    Chi tiết từ PDF (kèm cách dùng/lưu ý tổng hợp bởi Gemini) và khuyến nghị cho thuốc
+    
+    Được tính và cache theo chuyên luận (hoạt chất + trang), nên các biệt dược dùng chung
+    chuyên luận chỉ tốn một lần đọc trang, parse và gọi Gemini.
+    
+    Returns:
+        tuple: (pdf_details, recommendations) - bản sao, caller có thể sửa
+    """
+    monograph_id = drug_info.monograph_id
+    if monograph_id is None or (get_pdf_page_count() == 0 and monograph_table is None):
+        return {}, generate_recommendations(drug_info, {})
+    
+    # Chỉ cache khi đã có text PDF và Gemini trả về kết quả (notes chỉ đến từ Gemini; lỗi thì lần sau thử lại)
+    pdf_details, recommendations = monograph_cache.get_or_compute(
+        monograph_id,
+        lambda: _build_monograph_details(drug_info),
+        should_cache=lambda result: bool(result[0].get('notes'))
+    )
+    return dict(pdf_details), list(recommendations)
+
+def _build_monograph_details(drug_info):
+    """Đọc trang PDF, tổng hợp với Gemini và tạo khuyến nghị cho chuyên luận của thuốc (không qua cache)"""
+    pdf_details = get_structured_details(drug_info)
+    pdf_full_text = pdf_details.get('full_text', '')
+    
+    if pdf_full_text:
+        # Dược thư viết theo hoạt chất, nên tổng hợp theo hoạt chất (dùng chung cho mọi biệt dược)
+        subject = drug_info.get('ActiveIngredient', '') or drug_info.get('DrugName', '')
+        gemini_summary = summarize_drug_info_with_gemini(pdf_full_text, subject, drug_info)
+        
+        # Cập nhật usage và thêm notes
+        if gemini_summary.get('usage'):
+            pdf_details['usage'] = gemini_summary['usage']
+        if gemini_summary.get('notes'):
+            pdf_details['notes'] = gemini_summary['notes']
+    
+    # Khuyến nghị dựa trên danh mục + chống chỉ định/cách dùng (giống nhau trong cùng chuyên luận)
+    return pdf_details, generate_recommendations(drug_info, pdf_details)
+
+def get_structured_details(drug_info):
+    """
+    Thành phần, chỉ định, chống chỉ định, liều dùng... của chuyên luận
+    Tra theo monograph_id trong bảng build sẵn (Crawldata/build_monograph_table.py);
+    không có bảng hoặc chuyên luận chưa có trong bảng thì đọc và parse PDF
+    """
+    table = monograph_table
+    if table is not None and drug_info.monograph_id is not None:
+        try:
+            details = table.get(drug_info.monograph_id)
+            if details is not None:
+                return details
+        except Exception as e:
+            print(f"⚠️ Lỗi đọc bảng chuyên luận: {e}")
+    return extract_drug_details_from_pdf(drug_info.page, title=drug_info.get('ActiveIngredient', ''))
+
+def extract_drug_details_from_pdf(page_number, title=None):
     """
     Trích xuất thông tin chi tiết từ PDF dựa trên số trang
     Tìm thành phần, công dụng, chỉ định, chống chỉ định...
+    
+    Nếu có span index và biết tiêu đề chuyên luận (title, vd: hoạt chất) thì chỉ parse đúng
+    đoạn chuyên luận đó (kể cả khi trải qua nhiều trang); không thì parse cả trang.
+    Trang sách được đổi sang trang PDF theo bản đồ độ lệch đã hiệu chỉnh (page_offset_map).
+    Kết quả được cache theo chuyên luận hoặc trang PDF; trả về bản sao vì caller sửa dict
     """
-    if pdf_reader is None:
+    span = find_monograph_span(page_number, title)
+    key = ('span', span.start_page, span.start_offset) if span is not None else ('page', book_page_to_pdf_index(page_number))
+    # Không cache kết quả rỗng (PDF chưa load, lỗi đọc trang...)
+    details = pdf_details_cache.get_or_compute(
+        key,
+        lambda: _extract_drug_details_from_pdf(page_number, span),
+        should_cache=bool
+    )
+    return dict(details)
+
+def _extract_drug_details_from_pdf(page_number, span=None):
+    """Đọc và parse trang PDF hoặc đoạn chuyên luận `span` (không qua cache)"""
+    page_count = get_pdf_page_count()
+    if page_count == 0:
         return {}
     
     try:
-        # Chuyển đổi số trang sách thành index PDF (pypdf đánh số từ 0)
-        # Offset thường là -1 vì PDF có thể có trang bìa, mục lục
-        pdf_page_index = int(page_number) + offset - 1
-        
-        # Đảm bảo index hợp lệ
-        if pdf_page_index < 0 or pdf_page_index >= len(pdf_reader.pages):
-            # Thử không có offset
-            pdf_page_index = int(page_number) - 1
-            if pdf_page_index < 0 or pdf_page_index >= len(pdf_reader.pages):
-                return {}
-        
-        # Đọc trang PDF
-        page = pdf_reader.pages[pdf_page_index]
-        text = page.extract_text()
-        
+        # Đúng đoạn chuyên luận nếu có span, không thì cả trang (store trích xuất sẵn hoặc pypdf)
+        text = read_monograph_text(page_number, get_pdf_page_text, page_count, span, page_offset_map)
         if not text:
             return {}
         
-        # Tìm phần text liên quan đến thuốc cụ thể (nếu có tên thuốc trong text)
-        # Lấy toàn bộ text nhưng sẽ filter trong prompt của Gemini
-        full_text = text
-        
-        details = {
-            'composition': '',
-            'indications': '',
-            'contraindications': '',
-            'dosage': '',
-            'usage': '',  # Cách dùng
-            'full_text': full_text  # Giữ toàn bộ text để Gemini có thể filter
-        }
-        
-        # Regex patterns để tìm các thông tin
-        patterns = {
-            'composition': re.compile(r'(Thành phần|Thành phần chính|Hoạt chất)[:\.]\s*(.+?)(?:\n|$)', re.IGNORECASE),
-            'indications': re.compile(r'(Chỉ định|Công dụng|Tác dụng)[:\.]\s*(.+?)(?:\n|Chống chỉ định|Liều dùng|$)', re.IGNORECASE | re.DOTALL),
-            'contraindications': re.compile(r'(Chống chỉ định|Không dùng)[:\.]\s*(.+?)(?:\n|Liều dùng|Cách dùng|$)', re.IGNORECASE | re.DOTALL),
-            'dosage': re.compile(r'(Liều dùng|Cách dùng|Liều lượng|Cách sử dụng)[:\.]\s*(.+?)(?:\n|Tác dụng phụ|Lưu ý|Bảo quản|$)', re.IGNORECASE | re.DOTALL),
-            'usage': re.compile(r'(Cách dùng|Hướng dẫn sử dụng|Sử dụng)[:\.]\s*(.+?)(?:\n|Lưu ý|Tác dụng phụ|$)', re.IGNORECASE | re.DOTALL)
-        }
-        
-        # Tìm từng loại thông tin
-        for key, pattern in patterns.items():
-            match = pattern.search(text)
-            if match:
-                details[key] = match.group(2).strip()[:500]  # Giới hạn độ dài
-        
-        # Nếu không tìm thấy "usage", dùng "dosage" làm cách dùng
-        if not details['usage'] and details['dosage']:
-            details['usage'] = details['dosage']
-        
-        return details
+        # Tách các mục một lần bằng tokenizer dùng chung (giống hệt bước build bảng chuyên luận).
+        # full_text: có span thì chỉ gồm chuyên luận của thuốc; không thì cả trang
+        # (có thể gồm nhiều chuyên luận, sẽ filter trong prompt của Gemini)
+        return parse_monograph_details(text)
         
     except Exception as e:
         print(f"⚠️ Lỗi đọc PDF trang {page_number}: {e}")
@@ -747,7 +813,21 @@ def health_check():
     return jsonify({
         'status': 'ok',
         'message': 'Backend API is running',
-        'drugs_loaded': len(drug_db) if drug_db is not None else 0
+        'drugs_loaded': len(drug_catalog) if drug_catalog is not None else 0,
+        'pdf_pages': get_pdf_page_count(),
+        'page_text_store': page_text_store is not None,
+        'page_offset_map': len(page_offset_map) if page_offset_map.sample_count else 0,
+        'monograph_table': len(monograph_table) if monograph_table is not None else 0,
+        'cache': {
+            'drug_lookup': drug_lookup_cache.stats(),
+            'ocr_match': ocr_match_cache.stats(),
+            'pdf_details': pdf_details_cache.stats(),
+            'monograph': monograph_cache.stats(),
+            'page_text': shared_page_text_cache.stats(),
+            'summary': summary_cache.stats() if summary_cache is not None else None,
+            'llm': llm_client.stats() if llm_client is not None else None,
+            'summary_flight': summary_flight.stats()
+        }
     })
 
 @app.route('/api/scan', methods=['POST', 'OPTIONS'])
@@ -780,14 +860,8 @@ def scan_drug():
             drug_info = search_drug_in_database(confirmed_text, None)
             
             if drug_info:
-                # Kiểm tra thuốc kê đơn
-                is_prescription = drug_info.get('Is_Prescription', False)
-                if isinstance(is_prescription, str):
-                    is_prescription = is_prescription.lower() in ['true', '1', 'yes']
-                elif pd.isna(is_prescription):
-                    is_prescription = False
-                
-                if is_prescription:
+                # Kiểm tra thuốc kê đơn (cột Rx đã parse sẵn thành bool khi load catalog)
+                if drug_info.is_prescription:
                     return jsonify({
                         'success': False,
                         'error': 'PRESCRIPTION_REQUIRED',
@@ -798,34 +872,16 @@ def scan_drug():
                         'extracted_text': confirmed_text
                     }), 403
                 
-                # Lấy thông tin từ PDF
+                # Lấy thông tin từ PDF + Gemini + khuyến nghị (tính một lần cho mỗi chuyên luận)
                 page_number = drug_info.get('PageNumber', '')
-                pdf_details = {}
-                if page_number and pdf_reader:
-                    pdf_details = extract_drug_details_from_pdf(page_number)
-                    
-                    # Sử dụng Gemini để tổng hợp thông tin từ PDF
-                    drug_name = drug_info.get('DrugName', '')
-                    pdf_full_text = pdf_details.get('full_text', '')
-                    
-                    if pdf_full_text:
-                        # Tổng hợp với Gemini: cách dùng + lưu ý
-                        gemini_summary = summarize_drug_info_with_gemini(pdf_full_text, drug_name, drug_info)
-                        
-                        # Cập nhật usage và thêm notes
-                        if gemini_summary.get('usage'):
-                            pdf_details['usage'] = gemini_summary['usage']
-                        if gemini_summary.get('notes'):
-                            pdf_details['notes'] = gemini_summary['notes']
-                
-                # Tạo khuyến nghị
-                recommendations = generate_recommendations(drug_info, pdf_details)
+                pdf_details, recommendations = get_monograph_details(drug_info)
                 
                 return jsonify({
                     'success': True,
                     'drug_name': drug_info.get('DrugName', ''),
                     'active_ingredient': drug_info.get('ActiveIngredient', ''),
                     'page_number': str(page_number),
+                    'monograph_id': drug_info.monograph_id,
                     'category': drug_info.get('Category', ''),
                     'extracted_text': confirmed_text,
                     'rx_status': 'OTC',
@@ -883,7 +939,7 @@ def scan_drug():
         processed_image = preprocess_image(image_array)
         
         # Trích xuất text từ ảnh (OCR) - trả về text đã chọn và tất cả text
-        extracted_text, all_ocr_texts = extract_text_from_image(image_array)  # Dùng ảnh gốc
+        extracted_text, all_ocr_texts, ocr_regions = extract_text_from_image(image_array)  # Dùng ảnh gốc
         
         # Kiểm tra kết quả OCR
         if extracted_text is None:
@@ -908,20 +964,24 @@ def scan_drug():
         print(f"📝 Text nhận diện được: {extracted_text}")
         print(f"📋 Tất cả text OCR: {all_ocr_texts}")
         
-        # Tìm kiếm trong database - truyền cả all_ocr_texts để tìm với các text khác
-        drug_info = search_drug_in_database(extracted_text, all_ocr_texts)
+        # Chấm điểm tất cả region OCR với catalog trong một lượt (khớp + confidence + vị trí)
+        ocr_candidates = resolve_ocr_regions(drug_catalog, ocr_regions, ignore_words=OCR_COMMON_WORDS,
+                                             match_cache=ocr_match_cache)
+        # Chỉ tin resolver khi đủ chắc chắn (khớp tốt, bỏ xa thuốc thứ hai)
+        best = confident_candidate(ocr_candidates)
+        if best is not None:
+            drug_info = best.record
+            print(f"✅ Resolver chọn: {drug_info.name} từ '{best.region.text}' ({best.method}, score {best.score:.2f})")
+        else:
+            # Không region nào khớp chắc chắn - thử cascade cũ với text đã chọn và các text khác
+            drug_info = search_drug_in_database(extracted_text, all_ocr_texts)
+        # Các phương án khác để frontend cho người dùng chọn nếu kết quả chưa đúng
+        ocr_alternatives = [candidate.to_dict() for candidate in ocr_candidates
+                            if drug_info is None or candidate.record.name_key != drug_info.name_key]
         
         if drug_info:
             # KIỂM TRA AN TOÀN: Nếu là thuốc kê đơn (Is_Prescription = True), chặn lại
-            is_prescription = drug_info.get('Is_Prescription', False)
-            
-            # Chuyển đổi giá trị boolean từ CSV (có thể là string "True"/"False" hoặc boolean)
-            if isinstance(is_prescription, str):
-                is_prescription = is_prescription.lower() in ['true', '1', 'yes']
-            elif pd.isna(is_prescription):
-                is_prescription = False
-            
-            if is_prescription:
+            if drug_info.is_prescription:
                 return jsonify({
                     'success': False,
                     'error': 'PRESCRIPTION_REQUIRED',
@@ -931,32 +991,14 @@ def scan_drug():
                     'category': drug_info.get('Category', ''),
                     'extracted_text': extracted_text,
                     'all_ocr_texts': all_ocr_texts,  # Trả về tất cả text OCR
+                    'ocr_alternatives': ocr_alternatives,
                     'needs_ocr_confirm': True  # Flag để frontend hiển thị OCR editor
                 }), 403  # 403 Forbidden
             
             # Nếu là thuốc OTC, tiếp tục tra cứu thông tin chi tiết từ PDF
+            # (đọc trang + Gemini + khuyến nghị được tính một lần cho mỗi chuyên luận)
             page_number = drug_info.get('PageNumber', '')
-            pdf_details = {}
-            
-            if page_number and pdf_reader:
-                pdf_details = extract_drug_details_from_pdf(page_number)
-                
-                # Sử dụng Gemini để tổng hợp thông tin từ PDF
-                drug_name = drug_info.get('DrugName', '')
-                pdf_full_text = pdf_details.get('full_text', '')
-                
-                if pdf_full_text:
-                    # Tổng hợp với Gemini: cách dùng + lưu ý
-                    gemini_summary = summarize_drug_info_with_gemini(pdf_full_text, drug_name, drug_info)
-                    
-                    # Cập nhật usage và thêm notes
-                    if gemini_summary.get('usage'):
-                        pdf_details['usage'] = gemini_summary['usage']
-                    if gemini_summary.get('notes'):
-                        pdf_details['notes'] = gemini_summary['notes']
-            
-            # Tạo khuyến nghị
-            recommendations = generate_recommendations(drug_info, pdf_details)
+            pdf_details, recommendations = get_monograph_details(drug_info)
             
             # Trả về thông tin thuốc đầy đủ
             return jsonify({
@@ -964,9 +1006,11 @@ def scan_drug():
                 'drug_name': drug_info.get('DrugName', ''),
                 'active_ingredient': drug_info.get('ActiveIngredient', ''),
                 'page_number': str(page_number),
+                'monograph_id': drug_info.monograph_id,
                 'category': drug_info.get('Category', ''),
                 'extracted_text': extracted_text,
                 'all_ocr_texts': all_ocr_texts,  # Trả về tất cả text OCR
+                'ocr_alternatives': ocr_alternatives,  # Thuốc khác có thể khớp (runners-up)
                 'rx_status': 'OTC',
                 'composition': pdf_details.get('composition', ''),
                 'indications': pdf_details.get('indications', ''),
@@ -983,7 +1027,8 @@ def scan_drug():
                 'needs_ocr_confirm': True,  # Flag để frontend hiển thị modal xác nhận
                 'message': 'Không tìm thấy thông tin thuốc trong database',
                 'extracted_text': extracted_text,
-                'all_ocr_texts': all_ocr_texts  # Trả về tất cả text OCR
+                'all_ocr_texts': all_ocr_texts,  # Trả về tất cả text OCR
+                'ocr_alternatives': ocr_alternatives  # Thuốc có thể khớp nhưng chưa đủ chắc chắn
             }), 404
             
     except Exception as e:
@@ -997,30 +1042,139 @@ def scan_drug():
             'message': f'Lỗi khi xử lý: {str(e)}'
         }), 500
 
+def drug_listing_response(iter_records):
+    """
+    Trả danh sách thuốc (theo thứ tự CSV) phân trang bằng cursor
+    - cursor: lấy từ next_cursor của trang trước
+    - limit: số thuốc mỗi trang (mặc định 20, tối đa 200)
+    - format=ndjson (hoặc Accept: application/x-ndjson): stream mỗi dòng một thuốc,
+      không truyền limit thì stream hết danh sách; cursor trang sau nằm trong header X-Next-Cursor
+    
+    Args:
+        iter_records: Hàm nhận after_row, trả về iterator DrugRecord sau dòng đó
+    """
+    wants_ndjson = (request.args.get('format') == 'ndjson'
+                    or 'application/x-ndjson' in request.headers.get('Accept', ''))
+    try:
+        after_row = decode_cursor(request.args.get('cursor'))
+        limit = parse_limit(request.args.get('limit'), default=None if wants_ndjson else DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    
+    records = iter_records(after_row)
+    if wants_ndjson:
+        headers = {}
+        if limit is not None:
+            records, next_cursor = paginate(records, limit)
+            if next_cursor:
+                headers['X-Next-Cursor'] = next_cursor
+                headers['Access-Control-Expose-Headers'] = 'X-Next-Cursor'
+        
+        def generate():
+            for record in records:
+                yield json.dumps(record.to_dict(), ensure_ascii=False) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson', headers=headers)
+    
+    page, next_cursor = paginate(records, limit)
+    return jsonify({
+        'drugs': [record.to_dict() for record in page],
+        'next_cursor': next_cursor
+    })
+
 @app.route('/api/drugs/search', methods=['GET'])
 def search_drugs():
-    """API endpoint để tìm kiếm thuốc theo tên"""
+    """
+    API endpoint để tìm kiếm thuốc theo tên
+    - mode=autocomplete: gợi ý khi đang gõ (prefix index), tham số limit (mặc định 10, tối đa 50)
+    - Mặc định: thuốc có tên chứa q, phân trang bằng cursor (xem drug_listing_response)
+    """
     query = request.args.get('q', '')
     if not query:
         return jsonify({'error': 'Query parameter required'}), 400
     
-    if drug_db is None or drug_db.empty:
-        return jsonify({'drugs': []})
+    mode = request.args.get('mode', '')
+    
+    if mode == 'autocomplete':
+        try:
+            limit = min(max(int(request.args.get('limit', 10)), 1), 50)
+        except ValueError:
+            return jsonify({'error': 'Invalid limit'}), 400
+        suggestions = drug_catalog.autocomplete(query, limit=limit) if drug_catalog else []
+        return jsonify({
+            'query': query,
+            'suggestions': suggestions
+        })
+    
+    catalog = drug_catalog if drug_catalog is not None else DrugCatalog.empty()
+    # Tìm kiếm (substring theo tên, không phân biệt dấu, qua index)
+    return drug_listing_response(lambda after_row: catalog.iter_names_containing(query, after_row))
+
+@app.route('/api/drugs/categories', methods=['GET'])
+def list_categories():
+    """API endpoint trả danh sách danh mục thuốc (tính sẵn khi load database)"""
+    categories = drug_catalog.categories if drug_catalog else ()
+    return jsonify({
+        'categories': list(categories),
+        'count': len(categories)
+    })
+
+@app.route('/api/drugs/category', methods=['GET'])
+def search_drugs_by_category():
+    """
+    API endpoint liệt kê thuốc theo danh mục (q: một phần tên danh mục, không phân biệt dấu
+    nếu q không dấu), phân trang bằng cursor (xem drug_listing_response)
+    """
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({'error': 'Query parameter required'}), 400
+    
+    catalog = drug_catalog if drug_catalog is not None else DrugCatalog.empty()
+    return drug_listing_response(lambda after_row: catalog.iter_by_category(query, after_row))
+
+@app.route('/api/drugs/search/batch', methods=['POST'])
+def search_drugs_batch():
+    """
+    API endpoint để tra cứu cả danh sách tên thuốc trong một request
+    Body JSON: {"names": [...], "threshold": 0.6}
+    - Mặc định trả JSON {'results': [...], 'count': n}
+    - ?format=ndjson (hoặc Accept: application/x-ndjson): stream mỗi dòng một kết quả
+    """
+    payload = request.get_json(silent=True)
+    names = payload.get('names') if isinstance(payload, dict) else None
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return jsonify({'error': 'Body must be JSON with a "names" list of strings'}), 400
+    if len(names) > MAX_BATCH_SIZE:
+        return jsonify({'error': f'Too many names (max {MAX_BATCH_SIZE})'}), 400
+    
+    try:
+        threshold = float(payload.get('threshold', 0.6))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid threshold'}), 400
+    if not 0 <= threshold <= 1:
+        return jsonify({'error': 'Invalid threshold'}), 400
     
-    # Tìm kiếm
-    query_lower = query.lower()
-    results = drug_db[drug_db['DrugName'].str.lower().str.contains(query_lower, na=False)]
+    catalog = drug_catalog if drug_catalog is not None else DrugCatalog.empty()
+    results = catalog.match_batch(names, threshold=threshold)
     
-    # Giới hạn kết quả
-    results = results.head(20)
+    wants_ndjson = (request.args.get('format') == 'ndjson'
+                    or 'application/x-ndjson' in request.headers.get('Accept', ''))
+    if wants_ndjson:
+        def generate():
+            for result in results:
+                yield json.dumps(result, ensure_ascii=False) + '\n'
+        return Response(generate(), mimetype='application/x-ndjson')
     
+    results = list(results)
     return jsonify({
-        'drugs': results.to_dict('records')
+        'results': results,
+        'count': len(results)
     })
 
 if __name__ == '__main__':
     load_drug_database()
     load_pdf()
+    load_summary_cache()
+    load_llm_client()
     print("🚀 Starting MediScan AI Backend Server...")
     print("📡 API available at http://localhost:5000")
     
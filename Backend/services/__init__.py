@@ -1,6 +1,14 @@
 """
 Services package initialization
 """
+import os
+import sys
+
+# Package core/ nằm ở thư mục gốc của project (dùng chung với api/ trên Vercel)
+_PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if _PROJECT_ROOT not in sys.path:
+    sys.path.insert(0, _PROJECT_ROOT)
+
 from .ocr_service import OCRService
 from .drug_lookup_service import DrugLookupService
 from .pdf_extractor_service import PDFExtractorService
@@ -1,10 +1,12 @@
 """
 Drug Lookup Service - Tra cứu thông tin thuốc từ CSV database
 """
-import pandas as pd
 import logging
 from difflib import SequenceMatcher
-import re
+
+from core.drug_catalog import DrugCatalog
+from core.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate
+from core.text_utils import normalize_query
 
 logger = logging.getLogger(__name__)
 
@@ -18,28 +20,34 @@ class DrugLookupService:
             csv_path: Path to drug database CSV file
         """
         try:
-            self.df = pd.read_csv(csv_path)
-            logger.info(f"Loaded {len(self.df)} drugs from database")
+            # Catalog đã có sẵn key chuẩn hóa, cột Rx dạng bool và index tra cứu
+            self.catalog = DrugCatalog.from_csv(csv_path)
+            logger.info(f"Loaded {len(self.catalog)} drugs from database")
             
-            # Preprocess drug names for better matching
-            self.df['DrugName_Lower'] = self.df['DrugName'].str.lower().str.strip()
-            self.df['ActiveIngredient_Lower'] = self.df['ActiveIngredient'].str.lower().str.strip()
+            # Dựng index so khớp gần đúng một lần, dùng lại cho mọi query
+            self.matcher = self.catalog.fuzzy_matcher
             
         except Exception as e:
             logger.error(f"Failed to load drug database: {str(e)}")
-            self.df = None
+            self.catalog = None
+            self.matcher = None
+
+    @staticmethod
+    def _record_to_dict(record):
+        """Chuyển DrugRecord thành dict trả về cho client"""
+        return {
+            'DrugName': record.name,
+            'ActiveIngredient': record.ingredient,
+            'Category': record.category,
+            'Is_Prescription': record.is_prescription,
+            'PageNumber': record.page
+        }
 
     def normalize_text(self, text):
         """
         Chuẩn hóa text để so sánh (loại bỏ ký tự đặc biệt, viết thường)
         """
-        # Convert to lowercase
-        text = text.lower().strip()
-        # Remove special characters but keep spaces
-        text = re.sub(r'[^\w\s]', '', text)
-        # Remove extra spaces
-        text = ' '.join(text.split())
-        return text
+        return normalize_query(text)
 
     def calculate_similarity(self, str1, str2):
         """
@@ -47,58 +55,33 @@ class DrugLookupService:
         """
         return SequenceMatcher(None, str1, str2).ratio()
 
-    def search_drugs(self, query, threshold=0.6):
+    def search_drugs(self, query, threshold=0.6, limit=None):
         """
         Tìm kiếm thuốc theo tên (hỗ trợ fuzzy matching)
         
         Args:
             query: Text query từ OCR
             threshold: Ngưỡng độ tương đồng tối thiểu (0-1)
+            limit: Số kết quả tối đa (None = trả về tất cả)
             
         Returns:
             list: Danh sách thuốc phù hợp, sắp xếp theo độ tương đồng
         """
-        if self.df is None:
+        if self.catalog is None:
             return []
         
         try:
             # Normalize query
             normalized_query = self.normalize_text(query)
-            query_words = normalized_query.split()
-            
-            matches = []
             
-            # Search in drug names and active ingredients
-            for idx, row in self.df.iterrows():
-                drug_name = row['DrugName_Lower']
-                active_ingredient = row['ActiveIngredient_Lower']
-                
-                # Calculate similarity scores
-                name_similarity = self.calculate_similarity(normalized_query, drug_name)
-                ingredient_similarity = self.calculate_similarity(normalized_query, active_ingredient)
-                
-                # Check if any word in query matches drug name
-                word_match_score = 0
-                for word in query_words:
-                    if len(word) >= 3:  # Only consider words with 3+ characters
-                        if word in drug_name or word in active_ingredient:
-                            word_match_score = max(word_match_score, 0.8)
-                
-                # Take the best similarity score
-                best_score = max(name_similarity, ingredient_similarity, word_match_score)
-                
-                if best_score >= threshold:
-                    matches.append({
-                        'DrugName': row['DrugName'],
-                        'ActiveIngredient': row['ActiveIngredient'],
-                        'Category': row['Category'],
-                        'Is_Prescription': bool(row['Is_Prescription']),
-                        'PageNumber': row['PageNumber'],
-                        'similarity_score': round(best_score, 3)
-                    })
+            # Chấm điểm toàn bộ danh mục qua index, chỉ giữ top-k nếu có limit
+            scored = self.matcher.search(normalized_query, threshold=threshold, limit=limit)
             
-            # Sort by similarity score (descending)
-            matches.sort(key=lambda x: x['similarity_score'], reverse=True)
+            matches = []
+            for row, score in scored:
+                match = self._record_to_dict(self.catalog[row])
+                match['similarity_score'] = score
+                matches.append(match)
             
             logger.info(f"Found {len(matches)} matches for query: '{query}'")
             
@@ -118,22 +101,15 @@ class DrugLookupService:
         Returns:
             dict: Thông tin thuốc hoặc None nếu không tìm thấy
         """
-        if self.df is None:
+        if self.catalog is None:
             return None
         
         try:
-            # Search for exact match (case-insensitive)
-            result = self.df[self.df['DrugName'].str.lower() == drug_name.lower()]
+            # Exact match (case-insensitive) qua dict index của catalog
+            record = self.catalog.get_by_name(drug_name)
             
-            if len(result) > 0:
-                row = result.iloc[0]
-                return {
-                    'DrugName': row['DrugName'],
-                    'ActiveIngredient': row['ActiveIngredient'],
-                    'Category': row['Category'],
-                    'Is_Prescription': bool(row['Is_Prescription']),
-                    'PageNumber': row['PageNumber']
-                }
+            if record is not None:
+                return self._record_to_dict(record)
             
             return None
             
@@ -152,28 +128,54 @@ class DrugLookupService:
         Returns:
             list: Danh sách gợi ý
         """
-        matches = self.search_drugs(query, threshold=0.3)
-        return [m['DrugName'] for m in matches[:limit]]
+        matches = self.search_drugs(query, threshold=0.3, limit=limit)
+        return [m['DrugName'] for m in matches]
 
     def get_all_categories(self):
         """
         Lấy tất cả danh mục thuốc
         """
-        if self.df is None:
+        if self.catalog is None:
             return []
         
-        return self.df['Category'].unique().tolist()
+        # Tính sẵn khi dựng catalog (thứ tự xuất hiện đầu tiên như unique())
+        return list(self.catalog.categories)
 
     def search_by_category(self, category):
         """
         Tìm kiếm thuốc theo danh mục
         """
-        if self.df is None:
+        if self.catalog is None:
             return []
         
         try:
-            result = self.df[self.df['Category'].str.contains(category, case=False, na=False)]
-            return result[['DrugName', 'ActiveIngredient', 'Category', 'Is_Prescription', 'PageNumber']].to_dict('records')
+            # Index danh mục của catalog (không phân biệt hoa thường/dấu)
+            return [self._record_to_dict(record) for record in self.catalog.iter_by_category(category)]
         except Exception as e:
             logger.error(f"Error searching by category: {str(e)}")
             return []
+
+    def search_by_category_page(self, category, cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """
+        Tìm kiếm thuốc theo danh mục, từng trang (thứ tự CSV)
+        
+        Args:
+            category: Một phần tên danh mục
+            cursor: next_cursor của trang trước (None = trang đầu)
+            limit: Số thuốc mỗi trang
+            
+        Returns:
+            dict: {'drugs': [...], 'next_cursor': cursor trang sau hoặc None}
+            
+        Raises:
+            ValueError: Cursor không hợp lệ
+        """
+        if self.catalog is None:
+            return {'drugs': [], 'next_cursor': None}
+        
+        after_row = decode_cursor(cursor)
+        page, next_cursor = paginate(self.catalog.iter_by_category(category, after_row), limit)
+        return {
+            'drugs': [self._record_to_dict(record) for record in page],
+            'next_cursor': next_cursor
+        }
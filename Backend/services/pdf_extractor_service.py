@@ -1,28 +1,96 @@
 """
 PDF Extractor Service - Trích xuất thông tin chi tiết từ PDF Dược thư
 """
-import pdfplumber
 import logging
+import os
 import re
 
+from core.page_search_index import PageSearchIndex
+from core.pdf_text_backends import open_backend
+from core.page_text_cache import page_text_source, shared_page_text_cache
+from core.page_text_store import PageTextStore
+from core.section_tokenizer import find_sections
+
 logger = logging.getLogger(__name__)
 
+# Trường của parse_drug_info -> nhãn mục của section tokenizer
+SECTION_FIELDS = {
+    'active_ingredient': 'composition',
+    'dosage': 'dosage_form',
+    'indication': 'indications',
+    'contraindication': 'contraindications',
+    'side_effects': 'side_effects',
+    'dosage_administration': 'dosage',
+    'precautions': 'precautions',
+    'interactions': 'interactions',
+    'storage': 'storage'
+}
+
 
 class PDFExtractorService:
-    def __init__(self, pdf_path):
+    def __init__(self, pdf_path, page_store_path=None, search_index_path=None, text_backend='pdfplumber'):
         """
         Initialize PDF extractor service
         
         Args:
             pdf_path: Path to PDF file
+            page_store_path: Store text trang trích xuất sẵn (mặc định cạnh file PDF);
+                             không có hoặc đã cũ thì trích xuất trực tiếp bằng text_backend
+            search_index_path: Index BM25 cho search_in_pdf (mặc định cạnh file PDF);
+                               không có hoặc đã cũ thì quét tuần tự từng trang
+            text_backend: Backend trích xuất trực tiếp - 'pdfplumber', 'pypdf' hoặc 'pdfminer'
+                          (xem core/pdf_text_backends.py)
         """
         self.pdf_path = pdf_path
+        self.page_store = PageTextStore.open_for(pdf_path, page_store_path)
+        if self.page_store is not None:
+            logger.info(f"Using page text store {self.page_store.store_path} ({len(self.page_store)} pages)")
+        # Store có cùng text với pypdf (Backend/app.py), không có store thì text từ text_backend
+        self.text_source = page_text_source(pdf_path, 'pypdf' if self.page_store is not None else text_backend)
+        self.search_index = PageSearchIndex.open_for(pdf_path, search_index_path)
+        if self.search_index is not None:
+            logger.info(f"Using page search index {self.search_index.index_path}")
+        # Backend chỉ mở PDF khi cần đọc trang; số trang từ bảng vị trí trang (không parse cả PDF)
+        self.backend = open_backend(text_backend, pdf_path) if os.path.exists(pdf_path) else None
+
+    def _page_count(self):
+        """Số trang PDF (0 nếu không có cả store lẫn PDF)"""
+        if self.page_store is not None:
+            return len(self.page_store)
+        if self.backend is None:
+            return 0
         try:
-            self.pdf = pdfplumber.open(pdf_path)
-            logger.info(f"Loaded PDF with {len(self.pdf.pages)} pages")
+            return self.backend.page_count()
         except Exception as e:
             logger.error(f"Failed to load PDF: {str(e)}")
-            self.pdf = None
+            self.backend = None
+            return 0
+
+    def _page_text(self, page_index):
+        """
+        Text của trang (index từ 0): đọc từ store, không có store thì trích xuất trực tiếp
+        Qua cache text trang dùng chung trong process (chung với Backend/app.py)
+        """
+        return shared_page_text_cache.get_or_load(
+            self.text_source, page_index, lambda: self._read_page_text(page_index))
+
+    def _read_page_text(self, page_index):
+        """Đọc text trang từ store hoặc backend (không qua cache)"""
+        if self.page_store is not None:
+            return self.page_store.get(page_index)
+        return self.backend.page_text(page_index)
+
+    def _iter_page_texts(self):
+        """
+        Duyệt (page_index, text) mọi trang cho các vòng lặp cả tài liệu
+        Không qua cache (để không đẩy các trang hay tra ra ngoài) và backend giải phóng
+        object của trang đã duyệt, nên bộ nhớ không tăng theo số trang
+        """
+        if self.page_store is not None:
+            for page_index in range(len(self.page_store)):
+                yield page_index, self.page_store.get(page_index)
+        elif self.backend is not None:
+            yield from self.backend.iter_pages()
 
     def extract_page_info(self, page_number):
         """
@@ -34,7 +102,7 @@ class PDFExtractorService:
         Returns:
             dict: Thông tin chi tiết về thuốc
         """
-        if not self.pdf:
+        if not self._page_count():
             return {
                 'error': 'PDF not loaded',
                 'content': ''
@@ -44,15 +112,14 @@ class PDFExtractorService:
             # PDF pages are 0-indexed
             page_index = page_number - 1
             
-            if page_index < 0 or page_index >= len(self.pdf.pages):
+            if page_index < 0 or page_index >= self._page_count():
                 return {
                     'error': f'Invalid page number: {page_number}',
                     'content': ''
                 }
             
-            # Extract text from page
-            page = self.pdf.pages[page_index]
-            text = page.extract_text()
+            # Extract text from page (store trích xuất sẵn hoặc text backend)
+            text = self._page_text(page_index)
             
             if not text:
                 return {
@@ -107,48 +174,13 @@ class PDFExtractorService:
             if lines:
                 info['drug_name'] = lines[0].strip()
             
-            # Keywords to identify sections
-            section_keywords = {
-                'active_ingredient': ['thành phần', 'hoạt chất', 'active ingredient'],
-                'dosage': ['dạng bào chế', 'hàm lượng', 'dosage form'],
-                'indication': ['chỉ định', 'công dụng', 'indication', 'chỉ_định'],
-                'contraindication': ['chống chỉ định', 'chống_chỉ_định', 'contraindication'],
-                'side_effects': ['tác dụng phụ', 'tác_dụng_phụ', 'phản ứng có hại', 'side effect'],
-                'dosage_administration': ['liều dùng', 'cách dùng', 'liều_dùng', 'dosage'],
-                'precautions': ['thận trọng', 'lưu ý', 'precaution', 'cảnh báo'],
-                'interactions': ['tương tác', 'interaction'],
-                'storage': ['bảo quản', 'storage']
-            }
-            
-            # Simple section extraction
-            current_section = None
-            section_content = []
-            
-            for line in lines:
-                line_lower = line.lower().strip()
-                
-                # Check if line is a section header
-                for section, keywords in section_keywords.items():
-                    for keyword in keywords:
-                        if keyword in line_lower:
-                            # Save previous section
-                            if current_section and section_content:
-                                info[current_section] = '\n'.join(section_content).strip()
-                            
-                            # Start new section
-                            current_section = section
-                            section_content = []
-                            break
-                    if current_section == section:
-                        break
-                else:
-                    # Add line to current section
-                    if current_section and line.strip():
-                        section_content.append(line.strip())
-            
-            # Save last section
-            if current_section and section_content:
-                info[current_section] = '\n'.join(section_content).strip()
+            # Tách các mục một lần bằng tokenizer dùng chung (cùng tiêu đề với Backend/api)
+            sections = find_sections(text)
+            for field, label in SECTION_FIELDS.items():
+                if label in sections:
+                    info[field] = sections[label]
+            if not info['dosage_administration']:
+                info['dosage_administration'] = sections.get('usage', '')
             
             # Clean up empty fields
             info = {k: v for k, v in info.items() if v}
@@ -159,29 +191,42 @@ class PDFExtractorService:
             logger.error(f"Error parsing drug info: {str(e)}")
             return {}
 
-    def search_in_pdf(self, query):
+    def search_in_pdf(self, query, limit=20):
         """
         Tìm kiếm text trong toàn bộ PDF
         
+        Có index (Crawldata/build_page_search_index.py) thì trả về các trang xếp hạng BM25
+        (không phân biệt dấu, kèm 'score' và vị trí 'highlights' trong snippet);
+        không có thì quét tuần tự các trang chứa nguyên query.
+        
         Args:
             query: Text cần tìm
+            limit: Số trang tối đa
             
         Returns:
             list: Danh sách các trang có chứa query
         """
-        if not self.pdf:
+        if self.search_index is not None:
+            try:
+                return self.search_index.search(query, limit=limit)
+            except Exception as e:
+                logger.error(f"Error searching page index, scanning PDF instead: {str(e)}")
+        
+        if not self._page_count():
             return []
         
         try:
             matching_pages = []
             
-            for page_num, page in enumerate(self.pdf.pages, start=1):
-                text = page.extract_text()
+            for page_index, text in self._iter_page_texts():
+                page_num = page_index + 1
                 if text and query.lower() in text.lower():
                     matching_pages.append({
                         'page_number': page_num,
                         'snippet': self.get_text_snippet(text, query)
                     })
+                    if len(matching_pages) >= limit:
+                        break
             
             return matching_pages
             
@@ -219,5 +264,9 @@ class PDFExtractorService:
 
     def __del__(self):
         """Close PDF when object is destroyed"""
-        if self.pdf:
-            self.pdf.close()
+        if getattr(self, 'backend', None) is not None:
+            self.backend.close()
+        if getattr(self, 'page_store', None) is not None:
+            self.page_store.close()
+        if getattr(self, 'search_index', None) is not None:
+            self.search_index.close()
@@ -0,0 +1,89 @@
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.pdf_text_backends import BACKENDS, open_backend
+
+# Cách cũ của PDFExtractorService (giữ lại để so sánh): duyệt pdf.pages, Page giữ cache layout
+LEGACY_PDFPLUMBER = 'pdfplumber (pdf.pages cũ)'
+
+def peak_rss_mb():
+    """Peak RSS của process hiện tại (ru_maxrss: KB trên Linux, byte trên macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def run_backend(name, pdf_path, max_pages, random_pages, results):
+    """Chạy trong process riêng (spawn) để peak RSS của mỗi backend không lẫn nhau"""
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    pages = chars = 0
+    if name == LEGACY_PDFPLUMBER:
+        import pdfplumber
+        pdf = pdfplumber.open(pdf_path)
+        for page in pdf.pages[:max_pages]:
+            chars += len(page.extract_text() or '')
+            pages += 1
+        pdf.close()
+        random_ms = None
+    else:
+        with open_backend(name, pdf_path) as backend:
+            for _, text in backend.iter_pages(0, max_pages):
+                chars += len(text)
+                pages += 1
+            elapsed = time.perf_counter() - start
+            # Truy cập ngẫu nhiên từng trang (kiểu request tra một trang)
+            sample = random.Random(0).sample(range(backend.page_count()), min(random_pages, backend.page_count()))
+            random_start = time.perf_counter()
+            for page_index in sample:
+                backend.page_text(page_index)
+            random_ms = (time.perf_counter() - random_start) / max(len(sample), 1) * 1000
+    if name == LEGACY_PDFPLUMBER:
+        elapsed = time.perf_counter() - start
+    results.put({
+        'backend': name,
+        'pages': pages,
+        'chars': chars,
+        'pages_per_sec': pages / elapsed if elapsed else 0.0,
+        'random_ms': random_ms,
+        'peak_rss_mb': peak_rss_mb(),
+        'rss_growth_mb': peak_rss_mb() - baseline,
+    })
+
+def benchmark_pdf_backends(pdf_path, max_pages, random_pages):
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+
+    print(f"⏱️ Đo {max_pages} trang đầu (duyệt tuần tự) + {random_pages} trang ngẫu nhiên: {pdf_path}")
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    rows = []
+    for name in list(BACKENDS) + [LEGACY_PDFPLUMBER]:
+        process = context.Process(target=run_backend, args=(name, pdf_path, max_pages, random_pages, results))
+        process.start()
+        process.join()
+        if process.exitcode != 0:
+            print(f"⚠️ {name}: lỗi (exit code {process.exitcode})")
+            continue
+        rows.append(results.get())
+
+    print("-" * 30)
+    print(f"{'backend':<28}{'trang/s':>10}{'ms/trang ngẫu nhiên':>22}{'peak RSS (MB)':>16}{'tăng thêm (MB)':>16}")
+    for row in sorted(rows, key=lambda row: -row['pages_per_sec']):
+        random_ms = f"{row['random_ms']:.1f}" if row['random_ms'] is not None else '-'
+        print(f"{row['backend']:<28}{row['pages_per_sec']:>10.1f}{random_ms:>22}"
+              f"{row['peak_rss_mb']:>16.1f}{row['rss_growth_mb']:>16.1f}")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.getenv('BENCHMARK_PDF', os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf"))
+MAX_PAGES = int(os.getenv('BENCHMARK_PAGES', 300))
+RANDOM_PAGES = int(os.getenv('BENCHMARK_RANDOM_PAGES', 30))
+
+if __name__ == "__main__":
+    benchmark_pdf_backends(PDF_FILE, MAX_PAGES, RANDOM_PAGES)
@@ -0,0 +1,109 @@
+import os
+import re
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_text_store import PageTextStore, extract_pdf_pages
+from core.section_tokenizer import find_sections
+
+# --- CÁCH PARSE CŨ (giữ lại để so sánh) ---
+def legacy_extract_details(text):
+    """extract_drug_details_from_pdf trước đây: compile 5 regex mỗi lần, quét text một lần mỗi regex"""
+    details = {}
+    patterns = {
+        'composition': re.compile(r'(Thành phần|Thành phần chính|Hoạt chất)[:\.]\s*(.+?)(?:\n|$)', re.IGNORECASE),
+        'indications': re.compile(r'(Chỉ định|Công dụng|Tác dụng)[:\.]\s*(.+?)(?:\n|Chống chỉ định|Liều dùng|$)', re.IGNORECASE | re.DOTALL),
+        'contraindications': re.compile(r'(Chống chỉ định|Không dùng)[:\.]\s*(.+?)(?:\n|Liều dùng|Cách dùng|$)', re.IGNORECASE | re.DOTALL),
+        'dosage': re.compile(r'(Liều dùng|Cách dùng|Liều lượng|Cách sử dụng)[:\.]\s*(.+?)(?:\n|Tác dụng phụ|Lưu ý|Bảo quản|$)', re.IGNORECASE | re.DOTALL),
+        'usage': re.compile(r'(Cách dùng|Hướng dẫn sử dụng|Sử dụng)[:\.]\s*(.+?)(?:\n|Lưu ý|Tác dụng phụ|$)', re.IGNORECASE | re.DOTALL)
+    }
+    for key, pattern in patterns.items():
+        match = pattern.search(text)
+        if match:
+            details[key] = match.group(2).strip()[:500]
+    return details
+
+def legacy_parse_drug_info(text):
+    """PDFExtractorService.parse_drug_info trước đây: lặp dòng × mục × từ khóa"""
+    info = {}
+    section_keywords = {
+        'active_ingredient': ['thành phần', 'hoạt chất', 'active ingredient'],
+        'dosage': ['dạng bào chế', 'hàm lượng', 'dosage form'],
+        'indication': ['chỉ định', 'công dụng', 'indication', 'chỉ_định'],
+        'contraindication': ['chống chỉ định', 'chống_chỉ_định', 'contraindication'],
+        'side_effects': ['tác dụng phụ', 'tác_dụng_phụ', 'phản ứng có hại', 'side effect'],
+        'dosage_administration': ['liều dùng', 'cách dùng', 'liều_dùng', 'dosage'],
+        'precautions': ['thận trọng', 'lưu ý', 'precaution', 'cảnh báo'],
+        'interactions': ['tương tác', 'interaction'],
+        'storage': ['bảo quản', 'storage']
+    }
+    current_section = None
+    section_content = []
+    for line in text.split('\n'):
+        line_lower = line.lower().strip()
+        for section, keywords in section_keywords.items():
+            for keyword in keywords:
+                if keyword in line_lower:
+                    if current_section and section_content:
+                        info[current_section] = '\n'.join(section_content).strip()
+                    current_section = section
+                    section_content = []
+                    break
+            if current_section == section:
+                break
+        else:
+            if current_section and line.strip():
+                section_content.append(line.strip())
+    if current_section and section_content:
+        info[current_section] = '\n'.join(section_content).strip()
+    return info
+
+def time_per_page(parse, pages, repeat):
+    """Thời gian trung bình (µs) mỗi trang, lấy lần chạy nhanh nhất trong `repeat` lần"""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for text in pages:
+            parse(text)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(pages) * 1e6
+
+def run_benchmark(pages, repeat=5):
+    pages = [text for text in pages if text]
+    if not pages:
+        print("❌ Không có trang nào có text để đo")
+        return
+    print(f"⏱️ Đo trên {len(pages)} trang, lấy lần nhanh nhất trong {repeat} lần chạy")
+    tokenizer_us = time_per_page(find_sections, pages, repeat)
+    for name, legacy in [('extract_drug_details_from_pdf', legacy_extract_details),
+                         ('PDFExtractorService.parse_drug_info', legacy_parse_drug_info)]:
+        legacy_us = time_per_page(legacy, pages, repeat)
+        print(f"   {name}: cũ {legacy_us:.1f} µs/trang -> tokenizer {tokenizer_us:.1f} µs/trang "
+              f"(nhanh hơn {legacy_us / tokenizer_us:.1f}x)")
+    found = sum(len(find_sections(text)) for text in pages)
+    print(f"📊 Tokenizer tìm được {found} mục ({found / len(pages):.1f} mục/trang)")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+MAX_PAGES = int(os.getenv('BENCHMARK_PAGES', 300))
+
+if __name__ == "__main__":
+    store = PageTextStore.open_for(PDF_FILE)
+    if store is not None:
+        print(f"📖 Đọc text trang từ store: {store.store_path}")
+        sample = [store.get(page_index) for page_index in range(min(len(store), MAX_PAGES))]
+    elif os.path.exists(PDF_FILE):
+        print(f"📖 Trích xuất text trang từ: {PDF_FILE}")
+        sample = []
+        for text in extract_pdf_pages(PDF_FILE):
+            sample.append(text)
+            if len(sample) >= MAX_PAGES:
+                break
+    else:
+        print(f"❌ Không tìm thấy file PDF tại: {PDF_FILE}")
+        sys.exit(1)
+    run_benchmark(sample)
@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.monograph_spans import MonographSpanIndex, default_index_path
+from core.page_text_store import PageTextStore, extract_pdf_pages, pdf_fingerprint
+
+def build_monograph_spans(pdf_path, index_path):
+    """
+    Quét toàn bộ Dược thư một lần, ghi vị trí (trang, offset) bắt đầu/kết thúc của từng chuyên luận
+    để Backend/api chỉ parse và gửi Gemini đúng đoạn chuyên luận của thuốc
+    """
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+
+    # Offset tính trên text của store (build_page_text_store.py) - cùng extractor pypdf
+    store = PageTextStore.open_for(pdf_path)
+    if store is not None:
+        print(f"📖 Đọc text {len(store)} trang từ store: {store.store_path}")
+        pages = (store.get(page_index) for page_index in range(len(store)))
+    else:
+        print(f"📖 Chưa có store text trang, trích xuất trực tiếp từ: {pdf_path}")
+        pages = extract_pdf_pages(pdf_path)
+
+    start = time.time()
+    index = MonographSpanIndex.from_pages(pages, source_fingerprint=pdf_fingerprint(pdf_path))
+    index.save(index_path)
+    multi_page = sum(1 for span in index.spans if span.end_page > span.start_page)
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT trong {time.time() - start:.1f}s: {len(index)} chuyên luận ({multi_page} chuyên luận trải qua nhiều trang)")
+    print(f"📂 Index tại: {index_path}")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+INDEX_FILE = os.getenv('MONOGRAPH_SPANS_PATH', default_index_path(PDF_FILE))
+
+if __name__ == "__main__":
+    build_monograph_spans(PDF_FILE, INDEX_FILE)
@@ -0,0 +1,79 @@
+import os
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.drug_catalog import DrugCatalog
+from core.monograph_spans import MonographSpanIndex
+from core.monograph_table import MonographTable, default_table_path, parse_monograph_details, read_monograph_text
+from core.page_offset_map import PageOffsetMap
+from core.page_text_store import PageTextStore, extract_pdf_pages, pdf_fingerprint
+
+def build_monograph_table(csv_path, pdf_path, table_path):
+    """
+    Parse một lần mọi chuyên luận trong danh mục (thành phần, chỉ định, chống chỉ định, liều dùng,
+    cách dùng) và ghi thành bảng tra theo monograph_id, để /api/scan không phải parse PDF trong request.
+    Chạy lại khi thay PDF/CSV (sau build_page_text_store.py, build_monograph_spans.py và
+    calibrate_page_offsets.py nếu dùng).
+    """
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+    if not os.path.exists(csv_path):
+        print(f"❌ Không tìm thấy file CSV tại: {csv_path}")
+        return
+
+    catalog = DrugCatalog.from_csv(csv_path)
+    print(f"📋 {len(catalog)} thuốc, {catalog.monograph_count} chuyên luận")
+
+    # Ưu tiên text đã trích xuất sẵn (cùng extractor pypdf với Backend/api)
+    store = PageTextStore.open_for(pdf_path)
+    if store is not None:
+        print(f"📖 Đọc text {len(store)} trang từ store: {store.store_path}")
+        pages = [store.get(page_index) for page_index in range(len(store))]
+    else:
+        print(f"📖 Chưa có store text trang, trích xuất trực tiếp từ: {pdf_path}")
+        pages = list(extract_pdf_pages(pdf_path))
+
+    page_map = PageOffsetMap.open_for(pdf_path)
+    if page_map is not None:
+        print(f"🗺️ Dùng bản đồ trang sách -> PDF đã hiệu chỉnh ({len(page_map)} đoạn)")
+    else:
+        print("⚠️ Chưa hiệu chỉnh bản đồ trang (calibrate_page_offsets.py), dùng độ lệch mặc định")
+        page_map = PageOffsetMap.constant()
+
+    spans = MonographSpanIndex.open_for(pdf_path)
+    if spans is not None:
+        print(f"📑 Dùng vị trí {len(spans)} chuyên luận (chỉ parse đúng đoạn chuyên luận)")
+
+    start = time.time()
+    stats = {'parsed': 0, 'span': 0, 'empty': 0}
+
+    def rows():
+        for record in catalog.iter_monographs():
+            span = None
+            if spans is not None and record.ingredient:
+                span = spans.find(record.ingredient, page_map.to_pdf_index(record.page))
+            text = read_monograph_text(record.page, pages.__getitem__, len(pages), span, page_map)
+            if not text:
+                stats['empty'] += 1
+                continue
+            stats['parsed'] += 1
+            stats['span'] += span is not None
+            yield record.monograph_id, record.page, record.ingredient, parse_monograph_details(text)
+
+    count = MonographTable.build(table_path, rows(), source_fingerprint=pdf_fingerprint(pdf_path))
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT trong {time.time() - start:.1f}s: {count} chuyên luận "
+          f"({stats['span']} theo vị trí chuyên luận, {stats['empty']} trang không có text/ngoài phạm vi)")
+    print(f"📂 Bảng tại: {table_path}")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(SCRIPT_DIR, "drug_database_refined.csv")
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+TABLE_FILE = os.getenv('MONOGRAPH_TABLE_PATH', default_table_path(PDF_FILE))
+
+if __name__ == "__main__":
+    build_monograph_table(CSV_FILE, PDF_FILE, TABLE_FILE)
@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_search_index import PageSearchIndex, default_index_path
+from core.page_text_store import PageTextStore, extract_pdf_pages, pdf_fingerprint
+
+def build_page_search_index(pdf_path, index_path):
+    """
+    Dựng (hoặc cập nhật) index tìm kiếm BM25 cho text các trang Dược thư.
+    Chạy lại sau khi thay file PDF: chỉ các trang có text thay đổi được index lại.
+    """
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+
+    # Ưu tiên text đã trích xuất sẵn (build_page_text_store.py), không có thì trích xuất trực tiếp
+    store = PageTextStore.open_for(pdf_path)
+    if store is not None:
+        print(f"📖 Đọc text {len(store)} trang từ store: {store.store_path}")
+        pages = (store.get(page_index) for page_index in range(len(store)))
+    else:
+        print(f"📖 Chưa có store text trang, trích xuất trực tiếp từ: {pdf_path}")
+        pages = extract_pdf_pages(pdf_path)
+
+    start = time.time()
+    stats = PageSearchIndex.update(index_path, pages, source_fingerprint=pdf_fingerprint(pdf_path))
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT trong {time.time() - start:.1f}s: thêm {stats['added']}, cập nhật {stats['updated']}, "
+          f"xóa {stats['removed']}, giữ nguyên {stats['unchanged']} trang")
+    print(f"📂 Index tại: {index_path}")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+INDEX_FILE = os.getenv('PAGE_SEARCH_INDEX_PATH', default_index_path(PDF_FILE))
+
+if __name__ == "__main__":
+    build_page_search_index(PDF_FILE, INDEX_FILE)
@@ -0,0 +1,32 @@
+import os
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_text_store import PageTextStore, default_store_path
+
+def build_page_text_store(pdf_path, store_path):
+    """
+    Trích xuất text mọi trang của Dược thư một lần vào store SQLite,
+    để Backend/api đọc text trang mà không phải gọi pypdf ở mỗi request
+    """
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+
+    print(f"📖 Đang trích xuất text từ: {pdf_path}")
+    start = time.time()
+    store = PageTextStore.build(pdf_path, store_path)
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT! Đã lưu {len(store)} trang trong {time.time() - start:.1f}s")
+    print(f"📂 Store tại: {store_path}")
+    store.close()
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+STORE_FILE = os.getenv('PAGE_TEXT_STORE_PATH', default_store_path(PDF_FILE))
+
+if __name__ == "__main__":
+    build_page_text_store(PDF_FILE, STORE_FILE)
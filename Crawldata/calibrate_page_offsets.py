@@ -0,0 +1,67 @@
+import os
+import sys
+import time
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.drug_catalog import DrugCatalog
+from core.monograph_spans import MonographSpanIndex, find_titles
+from core.page_offset_map import MAX_SHIFT, PageOffsetMap, default_map_path, locate_title_pages
+from core.page_text_store import PageTextStore, extract_pdf_pages, pdf_fingerprint
+
+def calibrate_page_offsets(csv_path, pdf_path, map_path):
+    """
+    Hiệu chỉnh bản đồ trang sách -> trang PDF cho cả cuốn Dược thư: lấy mẫu mọi chuyên luận trong
+    danh mục, tìm trang PDF thật của tiêu đề chuyên luận quanh trang sách, khớp thành các đoạn có
+    cùng độ lệch rồi lưu lại. Backend/api và các script crawl đọc bản đồ thay vì tự dò offset.
+    Chạy lại khi thay PDF/CSV (sau build_page_text_store.py / build_monograph_spans.py nếu dùng).
+    """
+    if not os.path.exists(pdf_path):
+        print(f"❌ Không tìm thấy file PDF tại: {pdf_path}")
+        return
+    if not os.path.exists(csv_path):
+        print(f"❌ Không tìm thấy file CSV tại: {csv_path}")
+        return
+
+    catalog = DrugCatalog.from_csv(csv_path)
+    monographs = [(record.page, record.ingredient) for record in catalog.iter_monographs()]
+    print(f"📋 Lấy mẫu {len(monographs)} chuyên luận trong danh mục")
+
+    start = time.time()
+    # Tiêu đề chuyên luận: có sẵn trong span index, không thì quét text các trang một lần
+    spans = MonographSpanIndex.open_for(pdf_path)
+    if spans is not None:
+        print(f"📑 Dùng tiêu đề {len(spans)} chuyên luận từ span index")
+        titles = [(span.title, span.start_page) for span in spans.spans]
+    else:
+        store = PageTextStore.open_for(pdf_path)
+        if store is not None:
+            print(f"📖 Đọc text {len(store)} trang từ store: {store.store_path}")
+            pages = (store.get(page_index) for page_index in range(len(store)))
+        else:
+            print(f"📖 Chưa có store text trang, trích xuất trực tiếp từ: {pdf_path}")
+            pages = extract_pdf_pages(pdf_path)
+        titles = [(title, page_index) for title, page_index, _ in find_titles(pages)]
+
+    samples = locate_title_pages(titles, monographs, MAX_SHIFT)
+    if not samples:
+        print(f"⚠️ Không tìm thấy tiêu đề chuyên luận nào trong ±{MAX_SHIFT} trang. Không ghi bản đồ.")
+        return
+
+    page_map = PageOffsetMap.fit(samples, source_fingerprint=pdf_fingerprint(pdf_path))
+    page_map.save(map_path)
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT trong {time.time() - start:.1f}s: {len(samples)}/{len(monographs)} chuyên luận tìm được trang, "
+          f"{page_map.outlier_count} mẫu lệch khỏi bản đồ")
+    for first_book_page, delta in page_map.segments:
+        print(f"   Từ trang sách {first_book_page}: trang PDF (index từ 0) = trang sách {delta:+d}")
+    print(f"📂 Bản đồ tại: {map_path}")
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(SCRIPT_DIR, "drug_database_refined.csv")
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+MAP_FILE = os.getenv('PAGE_OFFSET_MAP_PATH', default_map_path(PDF_FILE))
+
+if __name__ == "__main__":
+    calibrate_page_offsets(CSV_FILE, PDF_FILE, MAP_FILE)
@@ -2,6 +2,11 @@ import pandas as pd
 from pypdf import PdfReader
 import re
 import os
+import sys
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_offset_map import PageOffsetMap
 
 def find_optimal_offset(pdf_reader, csv_df):
     """
@@ -40,14 +45,26 @@ def find_optimal_offset(pdf_reader, csv_df):
     print("⚠️ Không dò thấy tự động. Sẽ dùng offset mặc định = 0.")
     return 0
 
+def load_page_map(pdf_path, reader, df):
+    """
+    Bản đồ trang sách -> trang PDF đã hiệu chỉnh cho cả cuốn (calibrate_page_offsets.py).
+    Chưa có (hoặc PDF đã đổi) thì dò offset bằng thuốc mẫu như trước, dùng chung cho cả cuốn.
+    """
+    page_map = PageOffsetMap.open_for(pdf_path)
+    if page_map is not None:
+        print(f"🗺️ Dùng bản đồ trang đã hiệu chỉnh ({len(page_map)} đoạn, không cần dò offset)")
+        return page_map
+    print("⚠️ Chưa có bản đồ trang (chạy calibrate_page_offsets.py để khỏi dò lại mỗi lần)")
+    return PageOffsetMap.constant(find_optimal_offset(reader, df))
+
 def enrich_drug_data(csv_input, pdf_path, csv_output):
     print("⏳ Đang nạp dữ liệu...")
     df = pd.read_csv(csv_input)
     reader = PdfReader(pdf_path)
     
-    # --- BƯỚC 1: TỰ ĐỘNG TÍNH OFFSET ---
-    # Thay vì điền tay, code sẽ tự đi tìm
-    PDF_OFFSET = find_optimal_offset(reader, df)
+    # --- BƯỚC 1: BẢN ĐỒ ĐỘ LỆCH TRANG ---
+    # Thay vì điền tay, đọc bản đồ đã hiệu chỉnh (không có thì code tự đi tìm)
+    page_map = load_page_map(pdf_path, reader, df)
     
     # --- BƯỚC 2: QUÉT DỮ LIỆU ---
     df['Category'] = "Chưa phân loại"  # Cột mới
@@ -55,7 +72,7 @@ def enrich_drug_data(csv_input, pdf_path, csv_output):
     # Regex tìm dòng "Loại thuốc" hoặc "Nhóm dược lý"
     category_pattern = re.compile(r'(Loại thuốc|Nhóm dược lý|Nhóm thuốc)[:\.]\s*(.*)', re.IGNORECASE)
 
-    print(f"🚀 Bắt đầu làm giàu dữ liệu với Offset = {PDF_OFFSET}...")
+    print(f"🚀 Bắt đầu làm giàu dữ liệu với bản đồ trang {page_map}...")
     
     success_count = 0
     
@@ -64,9 +81,8 @@ def enrich_drug_data(csv_input, pdf_path, csv_output):
     for index, row in df.iloc[0:100].iterrows(): 
         page_num_book = int(row['PageNumber'])
         
-        # Công thức: Trang PDF thực = Trang sách + Offset
-        # (pypdf tính từ 0 nên đôi khi cần -1 hoặc không, tùy vào kết quả dò ở trên)
-        pdf_page_index = page_num_book + PDF_OFFSET
+        # Công thức: Trang PDF thực (pypdf tính từ 0) = Trang sách + độ lệch của đoạn chứa trang đó
+        pdf_page_index = page_map.to_pdf_index(page_num_book)
 
         try:
             if 0 <= pdf_page_index < len(reader.pages):
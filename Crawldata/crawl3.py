@@ -2,6 +2,11 @@ import pandas as pd
 from pypdf import PdfReader
 import re
 import os
+import sys
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_offset_map import PageOffsetMap
 
 def find_optimal_offset(pdf_reader, csv_df):
     """
@@ -49,6 +54,18 @@ def find_optimal_offset(pdf_reader, csv_df):
     print("⚠️ Không dò thấy tự động. Dùng offset mặc định = -1.")
     return -1
 
+def load_page_map(pdf_path, reader, df):
+    """
+    Bản đồ trang sách -> trang PDF đã hiệu chỉnh cho cả cuốn (calibrate_page_offsets.py).
+    Chưa có (hoặc PDF đã đổi) thì dò offset bằng thuốc mẫu như trước, dùng chung cho cả cuốn.
+    """
+    page_map = PageOffsetMap.open_for(pdf_path)
+    if page_map is not None:
+        print(f"🗺️ Dùng bản đồ trang đã hiệu chỉnh ({len(page_map)} đoạn, không cần dò offset)")
+        return page_map
+    print("⚠️ Chưa có bản đồ trang (chạy calibrate_page_offsets.py để khỏi dò lại mỗi lần)")
+    return PageOffsetMap.constant(find_optimal_offset(reader, df))
+
 def clean_text(text):
     """Hàm làm sạch văn bản: Bỏ dấu ngoặc kép, dấu chấm cuối câu"""
     if not text: return "Chưa phân loại"
@@ -63,8 +80,8 @@ def enrich_drug_data(csv_input, pdf_path, csv_output):
     df = pd.read_csv(csv_input)
     reader = PdfReader(pdf_path)
     
-    # --- BƯỚC 1: TỰ ĐỘNG TÍNH OFFSET ---
-    PDF_OFFSET = find_optimal_offset(reader, df)
+    # --- BƯỚC 1: BẢN ĐỒ ĐỘ LỆCH TRANG (đã hiệu chỉnh, không có thì tự dò) ---
+    page_map = load_page_map(pdf_path, reader, df)
     
     # --- BƯỚC 2: QUÉT DỮ LIỆU ---
     df['Category'] = "Chưa phân loại"
@@ -79,7 +96,7 @@ def enrich_drug_data(csv_input, pdf_path, csv_output):
     # Duyệt qua TOÀN BỘ danh sách thuốc
     for index, row in df.iterrows(): 
         page_num_book = int(row['PageNumber'])
-        pdf_page_index = page_num_book + PDF_OFFSET
+        pdf_page_index = page_map.to_pdf_index(page_num_book)
 
         # In tiến độ mỗi 500 thuốc để biết code còn chạy
         if index % 500 == 0:
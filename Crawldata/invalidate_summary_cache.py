@@ -0,0 +1,43 @@
+import argparse
+import os
+import sys
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.summary_cache import SummaryCache, default_cache_path
+
+def invalidate_summary_cache(cache_path, monograph_ids=None, prompt_version=None, expired_only=False):
+    """
+    Xóa kết quả tổng hợp Gemini trong summary cache: theo chuyên luận, theo phiên bản prompt,
+    chỉ các entry hết hạn, hoặc toàn bộ (không truyền gì)
+    """
+    if not os.path.exists(cache_path):
+        print(f"❌ Không tìm thấy summary cache tại: {cache_path}")
+        return
+    cache = SummaryCache.open(cache_path)
+    if cache is None or cache.read_only:
+        print(f"❌ Không ghi được summary cache: {cache_path}")
+        return
+
+    before = len(cache)
+    if expired_only:
+        deleted = cache.purge_expired()
+    elif monograph_ids:
+        deleted = sum(cache.invalidate(monograph_id, prompt_version) for monograph_id in monograph_ids)
+    else:
+        deleted = cache.invalidate(prompt_version=prompt_version)
+    print(f"🧹 Đã xóa {deleted}/{before} kết quả, còn lại {len(cache)}")
+    cache.close()
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+CACHE_FILE = os.getenv('SUMMARY_CACHE_PATH', default_cache_path(PDF_FILE))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Xóa kết quả tổng hợp Gemini trong summary cache")
+    parser.add_argument('monograph_ids', nargs='*', help='ID chuyên luận (vd: 329:cefaclor); bỏ trống = tất cả')
+    parser.add_argument('--prompt-version', help='Chỉ xóa entry của phiên bản prompt này')
+    parser.add_argument('--expired', action='store_true', help='Chỉ xóa các entry đã hết hạn (TTL)')
+    args = parser.parse_args()
+    invalidate_summary_cache(CACHE_FILE, args.monograph_ids, args.prompt_version, args.expired)
@@ -0,0 +1,190 @@
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.drug_catalog import DrugCatalog
+from core.drug_summarizer import PROMPT_VERSION, has_source_text, summarize_monograph
+from core.lazy_pdf import LazyPdf
+from core.llm_client import LLM_CLIENTS, create_llm_client
+from core.monograph_spans import MonographSpanIndex
+from core.monograph_table import MonographTable, read_monograph_text
+from core.page_offset_map import PageOffsetMap
+from core.page_text_store import PageTextStore
+from core.rate_limiter import TokenBucket
+from core.summary_cache import SummaryCache, default_cache_path
+
+def iter_otc_monographs(catalog):
+    """
+    Biệt dược OTC đầu tiên của mỗi chuyên luận - đại diện cho chuyên luận khi tổng hợp
+    (chuyên luận chỉ có thuốc kê đơn bị bỏ qua: /api/scan chặn thuốc kê đơn trước khi tổng hợp)
+    """
+    seen = set()
+    for record in catalog.records:
+        if record.is_prescription or record.monograph_id is None or record.monograph_id in seen:
+            continue
+        seen.add(record.monograph_id)
+        yield record
+
+def open_source_text(pdf_path):
+    """
+    Hàm trả về text chuyên luận của một thuốc, giống hệt get_structured_details của Backend/api
+    (bảng chuyên luận nếu có, không thì span/trang PDF qua bản đồ trang) để khóa summary cache khớp
+    """
+    table = MonographTable.open_for(pdf_path)
+    store = PageTextStore.open_for(pdf_path)
+    pdf = LazyPdf(pdf_path) if store is None and os.path.exists(pdf_path) else None
+    spans = MonographSpanIndex.open_for(pdf_path)
+    page_map = PageOffsetMap.open_for(pdf_path) or PageOffsetMap.constant()
+    get_page_text = store.get if store is not None else (pdf.page_text if pdf is not None else None)
+    page_count = len(store) if store is not None else (len(pdf) if pdf is not None else 0)
+
+    def source_text(record):
+        if table is not None:
+            details = table.get(record.monograph_id)
+            if details is not None:
+                return details['full_text']
+        if get_page_text is None:
+            return ''
+        span = None
+        if spans is not None and record.ingredient:
+            span = spans.find(record.ingredient, page_map.to_pdf_index(record.page))
+        return read_monograph_text(record.page, get_page_text, page_count, span, page_map)
+
+    return source_text
+
+def summarize_with_retries(client, bucket, record, text, retries, backoff):
+    """
+    Tổng hợp một chuyên luận, thử lại (backoff lũy thừa + jitter) khi lỗi hoặc kết quả rỗng
+
+    Returns:
+        tuple: (summary, số lần gọi)
+
+    Raises:
+        RuntimeError: Vẫn lỗi sau `retries` lần thử lại
+    """
+    subject = record.ingredient or record.name
+    error = None
+    for attempt in range(1, retries + 2):
+        bucket.acquire()
+        try:
+            summary = summarize_monograph(client, text, subject, record)
+            if summary.get('usage') or summary.get('notes'):
+                return summary, attempt
+            error = 'empty summary'
+        except Exception as e:
+            error = e
+        if attempt <= retries:
+            time.sleep(backoff * 2 ** (attempt - 1) * (1 + random.random()))
+    raise RuntimeError(f"{record.monograph_id}: {error}")
+
+def presummarize_monographs(csv_path, pdf_path, cache_path, client_name, concurrency, rate, retries,
+                            backoff=2.0, limit=None, force=False, stub_latency=0.0):
+    """
+    Tổng hợp trước (offline) cách dùng/lưu ý của mọi chuyên luận OTC trong danh mục vào summary cache,
+    để /api/scan không còn chờ LLM cho thuốc đã biết.
+
+    Checkpoint/resume: mỗi kết quả được ghi ngay vào summary cache (SQLite); chạy lại (kể cả sau khi
+    dừng giữa chừng bằng Ctrl+C) thì bỏ qua các chuyên luận đã có kết quả còn hạn.
+    """
+    if not os.path.exists(csv_path):
+        print(f"❌ Không tìm thấy file CSV tại: {csv_path}")
+        return
+    cache = SummaryCache.open(cache_path)
+    if cache is None or cache.read_only:
+        print(f"❌ Không ghi được summary cache: {cache_path}")
+        return
+    client_options = {'latency': stub_latency} if client_name == 'stub' else {}
+    try:
+        # Client dùng chung cho mọi luồng: semaphore của client cho phép đúng `concurrency` lần gọi đồng thời
+        client = create_llm_client(client_name, max_concurrency=concurrency, **client_options)
+    except ValueError as e:
+        print(f"❌ {e}")
+        return
+
+    catalog = DrugCatalog.from_csv(csv_path)
+    source_text = open_source_text(pdf_path)
+
+    # Bước 1: text nguồn của các chuyên luận chưa có kết quả (tuần tự, chỉ đọc SQLite/trang PDF)
+    jobs = []
+    stats = {'total': 0, 'cached': 0, 'no_text': 0}
+    for record in iter_otc_monographs(catalog):
+        stats['total'] += 1
+        text = source_text(record)
+        if not has_source_text(text):
+            stats['no_text'] += 1
+            continue
+        if not force and cache.get(record.monograph_id, text, PROMPT_VERSION) is not None:
+            stats['cached'] += 1
+            continue
+        jobs.append((record, text))
+    if limit is not None:
+        jobs = jobs[:limit]
+    print(f"📋 {stats['total']} chuyên luận OTC: {stats['cached']} đã có kết quả, "
+          f"{stats['no_text']} không có text, {len(jobs)} cần tổng hợp "
+          f"(client={client_name}, {concurrency} luồng, {rate} request/s, prompt v{PROMPT_VERSION})")
+    if not jobs:
+        return
+
+    # Bước 2: gọi LLM song song (giới hạn số luồng + token bucket), ghi kết quả ngay khi xong
+    bucket = TokenBucket(rate)
+    start = time.time()
+    done = calls = 0
+    failed = []
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    try:
+        futures = {executor.submit(summarize_with_retries, client, bucket, record, text, retries, backoff): (record, text)
+                   for record, text in jobs}
+        for future in as_completed(futures):
+            record, text = futures[future]
+            try:
+                summary, attempts = future.result()
+            except RuntimeError as e:
+                failed.append(record.monograph_id)
+                print(f"⚠️ Bỏ qua sau {retries + 1} lần thử: {e}")
+                calls += retries + 1
+                continue
+            cache.put(record.monograph_id, text, PROMPT_VERSION, summary)
+            done += 1
+            calls += attempts
+            if done % 25 == 0:
+                print(f"   ...Đã tổng hợp {done}/{len(jobs)} chuyên luận ({time.time() - start:.1f}s)")
+    except KeyboardInterrupt:
+        print("⏸️ Đã dừng. Kết quả đã tổng hợp được giữ lại, chạy lại để tiếp tục.")
+        executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    executor.shutdown()
+
+    elapsed = time.time() - start
+    print("-" * 30)
+    print(f"🎉 HOÀN TẤT trong {elapsed:.1f}s: {done} chuyên luận đã tổng hợp, {len(failed)} lỗi, "
+          f"{calls} lần gọi LLM, tổng thời gian chờ rate limit của các luồng {bucket.waited_seconds:.1f}s")
+    if failed:
+        print(f"🔴 Lỗi (chạy lại để thử tiếp): {', '.join(failed[:10])}{' ...' if len(failed) > 10 else ''}")
+    print(f"📊 LLM client: {client.stats()}")
+    print(f"📂 Summary cache: {cache_path} ({len(cache)} kết quả)")
+    cache.close()
+
+# --- CẤU HÌNH ---
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(SCRIPT_DIR, "drug_database_refined.csv")
+PDF_FILE = os.path.join(SCRIPT_DIR, "duoc-thu-quoc-gia-viet-nam-2018.pdf")
+CACHE_FILE = os.getenv('SUMMARY_CACHE_PATH', default_cache_path(PDF_FILE))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tổng hợp trước cách dùng/lưu ý của mọi chuyên luận OTC vào summary cache")
+    parser.add_argument('--client', default=os.getenv('LLM_CLIENT', 'gemini'), choices=sorted(LLM_CLIENTS),
+                        help="LLM client ('stub' = model giả lập, không gọi mạng)")
+    parser.add_argument('--concurrency', type=int, default=4, help='Số request LLM song song')
+    parser.add_argument('--rate', type=float, default=1.0, help='Số request LLM tối đa mỗi giây (token bucket)')
+    parser.add_argument('--retries', type=int, default=3, help='Số lần thử lại mỗi chuyên luận')
+    parser.add_argument('--limit', type=int, help='Chỉ tổng hợp N chuyên luận (chạy thử)')
+    parser.add_argument('--force', action='store_true', help='Tổng hợp lại cả chuyên luận đã có kết quả')
+    parser.add_argument('--stub-latency', type=float, default=0.0, help='Độ trễ (giây) mỗi lần gọi của client stub')
+    args = parser.parse_args()
+    presummarize_monographs(CSV_FILE, PDF_FILE, CACHE_FILE, args.client, args.concurrency, args.rate, args.retries,
+                            limit=args.limit, force=args.force, stub_latency=args.stub_latency)
@@ -2,6 +2,11 @@ import pandas as pd
 from pypdf import PdfReader
 import re
 import os
+import sys
+
+# Package core/ nằm ở thư mục gốc của project
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')))
+from core.page_offset_map import PageOffsetMap
 
 def find_optimal_offset(pdf_reader, csv_df):
     """
@@ -30,6 +35,18 @@ def find_optimal_offset(pdf_reader, csv_df):
         except: continue
     return -1
 
+def load_page_map(pdf_path, reader, df):
+    """
+    Bản đồ trang sách -> trang PDF đã hiệu chỉnh cho cả cuốn (calibrate_page_offsets.py).
+    Chưa có (hoặc PDF đã đổi) thì dò offset bằng thuốc mẫu như trước, dùng chung cho cả cuốn.
+    """
+    page_map = PageOffsetMap.open_for(pdf_path)
+    if page_map is not None:
+        print(f"🗺️ Dùng bản đồ trang đã hiệu chỉnh ({len(page_map)} đoạn, không cần dò offset)")
+        return page_map
+    print("⚠️ Chưa có bản đồ trang (chạy calibrate_page_offsets.py để khỏi dò lại mỗi lần)")
+    return PageOffsetMap.constant(find_optimal_offset(reader, df))
+
 def check_prescription_status(text):
     """
     Hàm kiểm tra xem thuốc có phải thuốc kê đơn/đặc trị không.
@@ -57,9 +74,9 @@ def update_safety_data(csv_input, pdf_path, csv_output):
     df = pd.read_csv(csv_input)
     reader = PdfReader(pdf_path)
     
-    # 1. Tự động tính Offset
-    PDF_OFFSET = find_optimal_offset(reader, df)
-    print(f"🎯 Offset xác định: {PDF_OFFSET}")
+    # 1. Bản đồ độ lệch trang (đã hiệu chỉnh, không có thì tự dò Offset)
+    page_map = load_page_map(pdf_path, reader, df)
+    print(f"🎯 Bản đồ trang: {page_map}")
     
     # 2. Tạo cột mới
     # Mặc định là False (An toàn), nếu tìm thấy từ khóa sẽ bật lên True
@@ -71,7 +88,7 @@ def update_safety_data(csv_input, pdf_path, csv_output):
     
     for index, row in df.iterrows():
         page_num_book = int(row['PageNumber'])
-        pdf_page_index = page_num_book + PDF_OFFSET
+        pdf_page_index = page_map.to_pdf_index(page_num_book)
 
         if index % 1000 == 0:
             print(f"   ...Đã quét {index}/{len(df)} thuốc")
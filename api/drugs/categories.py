@@ -0,0 +1,42 @@
+from http.server import BaseHTTPRequestHandler
+import json
+from api.utils import get_drug_catalog
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            # Danh sách danh mục được tính sẵn khi load catalog
+            catalog = get_drug_catalog()
+            categories = catalog.categories if catalog else ()
+            response = {
+                'categories': list(categories),
+                'count': len(categories)
+            }
+            
+            # Send response
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+            self.wfile.write(json.dumps(response).encode())
+            
+        except Exception as e:
+            error_response = {
+                'error': 'Internal server error',
+                'message': str(e)
+            }
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_response).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
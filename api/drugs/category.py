@@ -0,0 +1,40 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import json
+from api.utils import get_drug_catalog, send_drug_listing
+from core.drug_catalog import DrugCatalog
+
+class handler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        try:
+            # Parse query parameters
+            query_params = parse_qs(urlparse(self.path).query)
+            query = query_params.get('q', [''])[0]
+            
+            if not query:
+                self.send_error(400, 'Query parameter required')
+                return
+            
+            # Thuốc theo danh mục (theo thứ tự CSV), phân trang bằng cursor
+            catalog = get_drug_catalog() or DrugCatalog.empty()
+            send_drug_listing(self, query_params,
+                              lambda after_row: catalog.iter_by_category(query, after_row))
+            
+        except Exception as e:
+            error_response = {
+                'error': 'Internal server error',
+                'message': str(e)
+            }
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_response).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
@@ -1,7 +1,8 @@
 from http.server import BaseHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 import json
-from api.utils import get_drug_database
+from api.utils import get_drug_catalog, send_drug_listing
+from core.drug_catalog import DrugCatalog
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
@@ -15,21 +16,26 @@ class handler(BaseHTTPRequestHandler):
                 self.send_error(400, 'Query parameter required')
                 return
             
-            drug_db = get_drug_database()
+            catalog = get_drug_catalog()
+            mode = query_params.get('mode', [''])[0]
             
-            if drug_db is None or drug_db.empty:
-                response = {'drugs': []}
-            else:
-                # Search
-                query_lower = query.lower()
-                results = drug_db[drug_db['DrugName'].str.lower().str.contains(query_lower, na=False)]
-                
-                # Limit results
-                results = results.head(20)
-                
+            if mode == 'autocomplete':
+                # Gợi ý khi đang gõ (prefix index)
+                try:
+                    limit = min(max(int(query_params.get('limit', ['10'])[0]), 1), 50)
+                except ValueError:
+                    self.send_error(400, 'Invalid limit')
+                    return
                 response = {
-                    'drugs': results.to_dict('records')
+                    'query': query,
+                    'suggestions': catalog.autocomplete(query, limit=limit) if catalog else []
                 }
+            else:
+                # Search (substring theo tên, không phân biệt dấu, qua index), phân trang bằng cursor
+                catalog = catalog or DrugCatalog.empty()
+                send_drug_listing(self, query_params,
+                                  lambda after_row: catalog.iter_names_containing(query, after_row))
+                return
             
             # Send response
             self.send_response(200)
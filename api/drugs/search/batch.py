@@ -0,0 +1,72 @@
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+import json
+from api.utils import get_drug_catalog
+from core.drug_catalog import DrugCatalog, MAX_BATCH_SIZE
+
+class handler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        try:
+            # Parse request body
+            content_length = int(self.headers.get('Content-Length', 0))
+            try:
+                payload = json.loads(self.rfile.read(content_length) or b'null')
+            except ValueError:
+                payload = None
+            
+            names = payload.get('names') if isinstance(payload, dict) else None
+            if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+                self.send_error(400, 'Body must be JSON with a "names" list of strings')
+                return
+            if len(names) > MAX_BATCH_SIZE:
+                self.send_error(400, f'Too many names (max {MAX_BATCH_SIZE})')
+                return
+            
+            try:
+                threshold = float(payload.get('threshold', 0.6))
+            except (TypeError, ValueError):
+                threshold = -1
+            if not 0 <= threshold <= 1:
+                self.send_error(400, 'Invalid threshold')
+                return
+            
+            catalog = get_drug_catalog() or DrugCatalog.empty()
+            results = catalog.match_batch(names, threshold=threshold)
+            
+            query_params = parse_qs(urlparse(self.path).query)
+            wants_ndjson = (query_params.get('format', [''])[0] == 'ndjson'
+                            or 'application/x-ndjson' in self.headers.get('Accept', ''))
+            
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/x-ndjson' if wants_ndjson else 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+            self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+            self.end_headers()
+            
+            if wants_ndjson:
+                # Ghi từng kết quả ngay khi có (mỗi dòng một JSON)
+                for result in results:
+                    self.wfile.write((json.dumps(result, ensure_ascii=False) + '\n').encode())
+            else:
+                results = list(results)
+                self.wfile.write(json.dumps({'results': results, 'count': len(results)}).encode())
+            
+        except Exception as e:
+            error_response = {
+                'error': 'Internal server error',
+                'message': str(e)
+            }
+            self.send_response(500)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Access-Control-Allow-Origin', '*')
+            self.end_headers()
+            self.wfile.write(json.dumps(error_response).encode())
+    
+    def do_OPTIONS(self):
+        self.send_response(200)
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.send_header('Access-Control-Allow-Methods', 'POST, OPTIONS')
+        self.send_header('Access-Control-Allow-Headers', 'Content-Type')
+        self.end_headers()
+        return
@@ -1,15 +1,16 @@
 from http.server import BaseHTTPRequestHandler
 import json
-from api.utils import get_drug_database
+from api.utils import get_cache_stats, get_drug_catalog
 
 class handler(BaseHTTPRequestHandler):
     def do_GET(self):
-        drug_db = get_drug_database()
+        catalog = get_drug_catalog()
         
         response = {
             'status': 'ok',
             'message': 'Backend API is running',
-            'drugs_loaded': len(drug_db) if drug_db is not None and not drug_db.empty else 0
+            'drugs_loaded': len(catalog),
+            'cache': get_cache_stats()
         }
         
         self.send_response(200)
@@ -5,12 +5,12 @@ from api.utils import (
     decode_base64_image,
     preprocess_image,
     extract_text_from_image,
+    get_drug_catalog,
+    ocr_match_cache,
     search_drug_in_database,
-    extract_drug_details_from_pdf,
-    generate_recommendations,
-    summarize_drug_info_with_gemini
+    get_monograph_details
 )
-import pandas as pd
+from core.ocr_resolver import OCR_COMMON_WORDS, confident_candidate, resolve_ocr_regions
 
 class handler(BaseHTTPRequestHandler):
     def do_OPTIONS(self):
@@ -50,7 +50,7 @@ class handler(BaseHTTPRequestHandler):
             processed_image = preprocess_image(image_array)
             
             # Trích xuất text từ ảnh (OCR) - dùng ảnh gốc
-            extracted_text, all_ocr_texts = extract_text_from_image(image_array)
+            extracted_text, all_ocr_texts, ocr_regions = extract_text_from_image(image_array)
             
             if not extracted_text:
                 response = {
@@ -63,20 +63,31 @@ class handler(BaseHTTPRequestHandler):
             else:
                 print(f"📝 Text nhận diện được: {extracted_text}")
                 
-                # Search in database
-                drug_info = search_drug_in_database(extracted_text)
+                # Chấm điểm tất cả region OCR với catalog trong một lượt
+                ocr_candidates = resolve_ocr_regions(get_drug_catalog(), ocr_regions, ignore_words=OCR_COMMON_WORDS,
+                                                     match_cache=ocr_match_cache)
+                # Chỉ tin resolver khi đủ chắc chắn (khớp tốt, bỏ xa thuốc thứ hai)
+                best = confident_candidate(ocr_candidates)
+                if best is not None:
+                    drug_info = best.record
+                else:
+                    # Search in database
+                    drug_info = search_drug_in_database(extracted_text)
+                ocr_alternatives = [candidate.to_dict() for candidate in ocr_candidates
+                                    if drug_info is None or candidate.record.name_key != drug_info.name_key]
                 
-                if drug_info:
+                if drug_info is None:
+                    # Không tìm thấy trong database
+                    response = {
+                        'success': False,
+                        'message': 'Không tìm thấy thông tin thuốc trong database',
+                        'extracted_text': extracted_text,
+                        'all_ocr_texts': all_ocr_texts or [],
+                        'ocr_alternatives': ocr_alternatives
+                    }
+                    status_code = 404
+                elif drug_info.is_prescription:
                     # KIỂM TRA AN TOÀN: Nếu là thuốc kê đơn (Is_Prescription = True), chặn lại
-                    is_prescription = drug_info.get('Is_Prescription', False)
-                
-                # Chuyển đổi giá trị boolean từ CSV
-                if isinstance(is_prescription, str):
-                    is_prescription = is_prescription.lower() in ['true', '1', 'yes']
-                elif pd.isna(is_prescription):
-                    is_prescription = False
-                
-                if is_prescription:
                     response = {
                         'success': False,
                         'error': 'PRESCRIPTION_REQUIRED',
@@ -84,42 +95,26 @@ class handler(BaseHTTPRequestHandler):
                         'drug_name': drug_info.get('DrugName', ''),
                         'active_ingredient': drug_info.get('ActiveIngredient', ''),
                         'category': drug_info.get('Category', ''),
-                        'extracted_text': extracted_text
+                        'extracted_text': extracted_text,
+                        'ocr_alternatives': ocr_alternatives
                     }
                     status_code = 403  # 403 Forbidden
                 else:
                     # Nếu là thuốc OTC, tiếp tục tra cứu thông tin chi tiết từ PDF
+                    # (đọc trang + Gemini + khuyến nghị được tính một lần cho mỗi chuyên luận)
                     page_number = drug_info.get('PageNumber', '')
-                    pdf_details = {}
-                    
-                    if page_number:
-                        pdf_details = extract_drug_details_from_pdf(page_number)
-                        
-                        # Sử dụng Gemini để tổng hợp thông tin từ PDF
-                        drug_name = drug_info.get('DrugName', '')
-                        pdf_full_text = pdf_details.get('full_text', '')
-                        
-                        if pdf_full_text:
-                            # Tổng hợp với Gemini: cách dùng + lưu ý
-                            gemini_summary = summarize_drug_info_with_gemini(pdf_full_text, drug_name, drug_info)
-                            
-                            # Cập nhật usage và thêm notes
-                            if gemini_summary.get('usage'):
-                                pdf_details['usage'] = gemini_summary['usage']
-                            if gemini_summary.get('notes'):
-                                pdf_details['notes'] = gemini_summary['notes']
-                    
-                    # Tạo khuyến nghị
-                    recommendations = generate_recommendations(drug_info, pdf_details)
+                    pdf_details, recommendations = get_monograph_details(drug_info)
                     
                     response = {
                         'success': True,
                         'drug_name': drug_info.get('DrugName', ''),
                         'active_ingredient': drug_info.get('ActiveIngredient', ''),
                         'page_number': str(page_number),
+                        'monograph_id': drug_info.monograph_id,
                         'category': drug_info.get('Category', ''),
                         'extracted_text': extracted_text,
                         'all_ocr_texts': all_ocr_texts or [],  # Trả về tất cả text OCR
+                        'ocr_alternatives': ocr_alternatives,  # Thuốc khác có thể khớp (runners-up)
                         'rx_status': 'OTC',
                         'composition': pdf_details.get('composition', ''),
                         'indications': pdf_details.get('indications', ''),
@@ -129,15 +124,6 @@ class handler(BaseHTTPRequestHandler):
                         'recommendations': recommendations  # Khuyến nghị
                     }
                     status_code = 200
-                else:
-                    # Không tìm thấy trong database
-                    response = {
-                        'success': False,
-                        'message': 'Không tìm thấy thông tin thuốc trong database',
-                        'extracted_text': extracted_text,
-                        'all_ocr_texts': all_ocr_texts or []
-                    }
-                    status_code = 404
             
             # Send response
             self.send_response(status_code)
@@ -4,13 +4,29 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
-import pandas as pd
-import re
+import importlib.util
+import json
+from core.drug_summarizer import PROMPT_VERSION as SUMMARY_PROMPT_VERSION, has_source_text, no_info_summary, summarize_monograph
+from core.drug_catalog import DrugCatalog
+from core.ocr_resolver import OCRRegion
+from core.lazy_pdf import LazyPdf
+from core.llm_client import client_from_env
+from core.monograph_table import MonographTable, default_table_path, parse_monograph_details, read_monograph_text
+from core.monograph_spans import MonographSpanIndex, default_index_path as default_spans_path
+from core.page_offset_map import PageOffsetMap, default_map_path
+from core.page_text_cache import page_text_source, shared_page_text_cache
+from core.page_text_store import PageTextStore, default_store_path
+from core.pagination import DEFAULT_PAGE_SIZE, decode_cursor, paginate, parse_limit
+from core.result_cache import ResultCache
+from core.single_flight import SingleFlight
+from core.summary_cache import SummaryCache, default_cache_path as default_summary_cache_path, source_hash
+from core.text_utils import normalize_key
+# Chỉ kiểm tra package có cài chưa; GeminiClient tự import khi gọi lần đầu
 try:
-    import google.generativeai as genai
-    GEMINI_AVAILABLE = True
-except ImportError:
+    GEMINI_AVAILABLE = importlib.util.find_spec('google.generativeai') is not None
+except ModuleNotFoundError:
     GEMINI_AVAILABLE = False
+if not GEMINI_AVAILABLE:
     print("⚠️ google-generativeai không được cài đặt, Gemini sẽ không hoạt động")
 
 # Fix cho Pillow 10.0+ không còn Image.ANTIALIAS
@@ -19,15 +35,53 @@ if not hasattr(Image, 'ANTIALIAS'):
     Image.ANTIALIAS = Image.LANCZOS
 
 # Load drug database và PDF (cached)
-_drug_db = None
+_drug_catalog = None  # DrugCatalog (load một lần, bất biến)
 _drug_db_path = None
 _pdf_reader = None
 _pdf_path = None
+_page_text_store = None  # PageTextStore (None = trích xuất trực tiếp từ PDF)
+_page_text_store_checked = False
+_page_offset_map = None  # PageOffsetMap (đã hiệu chỉnh hoặc độ lệch mặc định)
+_monograph_spans = None  # MonographSpanIndex (None = parse cả trang)
+_monograph_spans_checked = False
+_monograph_table = None  # MonographTable (None = parse PDF trong request)
+_monograph_table_checked = False
+_summary_cache = None  # SummaryCache (None = luôn gọi Gemini)
+_summary_cache_checked = False
+_llm_client = None  # LLMClient dùng lại giữa các request (None = chưa cấu hình GEMINI_API_KEY)
+_llm_client_checked = False
 _ocr_reader = None  # EasyOCR reader (cache để không load lại mỗi lần)
 
-def get_drug_database():
-    """Load và cache drug database"""
-    global _drug_db, _drug_db_path
+# Cache kết quả (sống theo instance serverless, thuốc phổ biến được scan lặp lại nhiều lần)
+CACHE_TTL_SECONDS = int(os.getenv('RESULT_CACHE_TTL', 3600))
+drug_lookup_cache = ResultCache(maxsize=int(os.getenv('DRUG_CACHE_SIZE', 2048)),
+                                ttl=CACHE_TTL_SECONDS, name='drug_lookup')
+ocr_match_cache = ResultCache(maxsize=int(os.getenv('OCR_MATCH_CACHE_SIZE', 4096)),
+                              ttl=CACHE_TTL_SECONDS, name='ocr_match')
+pdf_details_cache = ResultCache(maxsize=int(os.getenv('PDF_DETAILS_CACHE_SIZE', 512)),
+                                ttl=CACHE_TTL_SECONDS, name='pdf_details')
+# Chi tiết PDF + tổng hợp Gemini + khuyến nghị theo chuyên luận (nhiều biệt dược dùng chung một chuyên luận)
+monograph_cache = ResultCache(maxsize=int(os.getenv('MONOGRAPH_CACHE_SIZE', 1024)),
+                              ttl=CACHE_TTL_SECONDS, name='monograph')
+# Gộp các lần tổng hợp đồng thời cho cùng chuyên luận thành một lần gọi Gemini
+summary_flight = SingleFlight('summary')
+
+def get_cache_stats():
+    """Thống kê hit/miss/eviction của các cache kết quả, summary cache và LLM client (số token prompt)"""
+    return {
+        'drug_lookup': drug_lookup_cache.stats(),
+        'ocr_match': ocr_match_cache.stats(),
+        'pdf_details': pdf_details_cache.stats(),
+        'monograph': monograph_cache.stats(),
+        'page_text': shared_page_text_cache.stats(),
+        'summary': _summary_cache.stats() if _summary_cache is not None else None,
+        'llm': _llm_client.stats() if _llm_client is not None else None,
+        'summary_flight': summary_flight.stats()
+    }
+
+def get_drug_catalog():
+    """Load và cache drug catalog (kèm các index tìm kiếm)"""
+    global _drug_catalog, _drug_db_path
     
     # Get path relative to project root
     if _drug_db_path is None:
@@ -43,40 +97,52 @@ def get_drug_database():
                 _drug_db_path = path
                 break
     
-    if _drug_db is None and _drug_db_path and os.path.exists(_drug_db_path):
+    if _drug_catalog is None and _drug_db_path and os.path.exists(_drug_db_path):
         try:
-            _drug_db = pd.read_csv(_drug_db_path)
-            print(f"✅ Loaded {len(_drug_db)} drugs from database")
+            _drug_catalog = DrugCatalog.from_csv(_drug_db_path)
+            print(f"✅ Loaded {len(_drug_catalog)} drugs from database")
         except Exception as e:
             print(f"⚠️ Error loading database: {e}")
-            _drug_db = pd.DataFrame()
-    elif _drug_db is None:
-        _drug_db = pd.DataFrame()
+            _drug_catalog = DrugCatalog.empty()
+    elif _drug_catalog is None:
+        _drug_catalog = DrugCatalog.empty()
+    else:
+        return _drug_catalog
+    
+    # Catalog vừa được load: kết quả tra cứu cũ (nếu có) không còn đúng
+    drug_lookup_cache.clear()
+    ocr_match_cache.clear()
+    monograph_cache.clear()
     
-    return _drug_db
+    return _drug_catalog
+
+def _pdf_candidate_paths():
+    """Các vị trí có thể có PDF dược thư (local / Vercel lambda)"""
+    return [
+        os.path.join(os.path.dirname(__file__), '..', 'Crawldata', 'duoc-thu-quoc-gia-viet-nam-2018.pdf'),
+        os.path.join(os.getcwd(), 'Crawldata', 'duoc-thu-quoc-gia-viet-nam-2018.pdf'),
+        '/var/task/Crawldata/duoc-thu-quoc-gia-viet-nam-2018.pdf',  # Vercel lambda path
+    ]
 
 def get_pdf_reader():
-    """Load và cache PDF reader"""
+    """Load và cache PDF reader (LazyPdf)"""
     global _pdf_reader, _pdf_path
     
     if _pdf_path is None:
         # Try different possible paths
-        possible_paths = [
-            os.path.join(os.path.dirname(__file__), '..', 'Crawldata', 'duoc-thu-quoc-gia-viet-nam-2018.pdf'),
-            os.path.join(os.getcwd(), 'Crawldata', 'duoc-thu-quoc-gia-viet-nam-2018.pdf'),
-            '/var/task/Crawldata/duoc-thu-quoc-gia-viet-nam-2018.pdf',  # Vercel lambda path
-        ]
-        
-        for path in possible_paths:
+        for path in _pdf_candidate_paths():
             if os.path.exists(path):
                 _pdf_path = path
                 break
     
     if _pdf_reader is None and _pdf_path and os.path.exists(_pdf_path):
         try:
-            from pypdf import PdfReader
-            _pdf_reader = PdfReader(_pdf_path)
-            print(f"✅ Loaded PDF with {len(_pdf_reader.pages)} pages")
+            # Memory-map + bảng vị trí trang: không đọc cả file vào RAM của mỗi instance
+            _pdf_reader = LazyPdf(_pdf_path)
+            print(f"✅ Opened PDF with {len(_pdf_reader)} pages (lazy)")
+            shared_page_text_cache.clear(page_text_source(_pdf_path, 'pypdf'))
+            pdf_details_cache.clear()
+            monograph_cache.clear()
         except Exception as e:
             print(f"⚠️ Error loading PDF: {e}")
             _pdf_reader = None
@@ -85,6 +151,163 @@ def get_pdf_reader():
     
     return _pdf_reader
 
+def get_page_text_store():
+    """
+    Load và cache store text trang PDF đã trích xuất sẵn (Crawldata/build_page_text_store.py)
+    
+    Store được dùng cả khi deploy không kèm file PDF; không có store thì trả về None.
+    """
+    global _page_text_store, _page_text_store_checked
+    
+    if not _page_text_store_checked:
+        _page_text_store_checked = True
+        env_path = os.getenv('PAGE_TEXT_STORE_PATH')
+        for pdf_path in _pdf_candidate_paths():
+            _page_text_store = PageTextStore.open_for(pdf_path, env_path or default_store_path(pdf_path))
+            if _page_text_store is not None:
+                print(f"✅ Loaded text of {len(_page_text_store)} PDF pages from store")
+                pdf_details_cache.clear()
+                monograph_cache.clear()
+                break
+    
+    return _page_text_store
+
+def get_page_offset_map():
+    """Load và cache bản đồ trang sách -> trang PDF (Crawldata/calibrate_page_offsets.py), không có thì độ lệch mặc định"""
+    global _page_offset_map
+    
+    if _page_offset_map is None:
+        env_path = os.getenv('PAGE_OFFSET_MAP_PATH')
+        page_map = None
+        for pdf_path in _pdf_candidate_paths():
+            page_map = PageOffsetMap.open_for(pdf_path, env_path or default_map_path(pdf_path))
+            if page_map is not None:
+                print(f"✅ Loaded page offset map ({len(page_map)} segments)")
+                break
+        _page_offset_map = page_map or PageOffsetMap.constant()
+    
+    return _page_offset_map
+
+def book_page_to_pdf_index(page_number):
+    """Index trang PDF (từ 0) của trang sách trong CSV, None nếu số trang không hợp lệ"""
+    try:
+        return get_page_offset_map().to_pdf_index(page_number)
+    except (TypeError, ValueError):
+        return None
+
+def get_llm_client():
+    """
+    Tạo một lần và cache LLM client (Gemini hoặc LLM_CLIENT=stub để load test không cần mạng)
+    
+    Lambda warm giữ client giữa các request: model Gemini chỉ được xác định một lần.
+    """
+    global _llm_client, _llm_client_checked
+    
+    if not _llm_client_checked:
+        _llm_client_checked = True
+        if os.getenv('LLM_CLIENT', 'gemini') == 'gemini' and not GEMINI_AVAILABLE:
+            return None
+        try:
+            _llm_client = client_from_env()
+        except ValueError as e:
+            print(f"⚠️ Không tạo được LLM client: {e}")
+        if _llm_client is not None:
+            print(f"✅ LLM client: {_llm_client.name}")
+    
+    return _llm_client
+
+def get_summary_cache():
+    """Mở và cache summary cache bền (SQLite) dùng chung với Backend, không mở được thì None"""
+    global _summary_cache, _summary_cache_checked
+    
+    if not _summary_cache_checked:
+        _summary_cache_checked = True
+        cache_path = os.getenv('SUMMARY_CACHE_PATH')
+        if not cache_path:
+            # Cạnh PDF dược thư (thư mục Crawldata đầu tiên tồn tại)
+            for pdf_path in _pdf_candidate_paths():
+                if os.path.isdir(os.path.dirname(pdf_path)):
+                    cache_path = default_summary_cache_path(pdf_path)
+                    break
+        if cache_path:
+            _summary_cache = SummaryCache.open(cache_path)
+            if _summary_cache is not None:
+                print(f"✅ Opened summary cache with {len(_summary_cache)} Gemini results")
+    
+    return _summary_cache
+
+def get_monograph_spans():
+    """Load và cache index vị trí chuyên luận (Crawldata/build_monograph_spans.py), không có thì None"""
+    global _monograph_spans, _monograph_spans_checked
+    
+    if not _monograph_spans_checked:
+        _monograph_spans_checked = True
+        env_path = os.getenv('MONOGRAPH_SPANS_PATH')
+        for pdf_path in _pdf_candidate_paths():
+            _monograph_spans = MonographSpanIndex.open_for(pdf_path, env_path or default_spans_path(pdf_path))
+            if _monograph_spans is not None:
+                print(f"✅ Loaded {len(_monograph_spans)} monograph spans")
+                pdf_details_cache.clear()
+                monograph_cache.clear()
+                break
+    
+    return _monograph_spans
+
+def get_monograph_table():
+    """Load và cache bảng chuyên luận parse sẵn (Crawldata/build_monograph_table.py), không có thì None"""
+    global _monograph_table, _monograph_table_checked
+    
+    if not _monograph_table_checked:
+        _monograph_table_checked = True
+        env_path = os.getenv('MONOGRAPH_TABLE_PATH')
+        for pdf_path in _pdf_candidate_paths():
+            _monograph_table = MonographTable.open_for(pdf_path, env_path or default_table_path(pdf_path))
+            if _monograph_table is not None:
+                print(f"✅ Loaded {len(_monograph_table)} pre-parsed monographs")
+                break
+    
+    return _monograph_table
+
+def find_monograph_span(page_number, title):
+    """Chuyên luận có tiêu đề `title` gần trang sách `page_number` (None nếu không có span index/không tìm thấy)"""
+    spans = get_monograph_spans()
+    if spans is None or not title:
+        return None
+    pdf_page_index = book_page_to_pdf_index(page_number)
+    if pdf_page_index is None:
+        return None
+    return spans.find(title, pdf_page_index)
+
+def get_pdf_page_count():
+    """Số trang PDF (0 nếu không có cả store lẫn PDF)"""
+    store = get_page_text_store()
+    if store is not None:
+        return len(store)
+    pdf_reader = get_pdf_reader()
+    return len(pdf_reader) if pdf_reader is not None else 0
+
+def get_pdf_page_text(pdf_page_index):
+    """
+    Text của trang PDF (index từ 0): đọc từ store, không có store thì trích xuất trực tiếp
+    Qua cache text trang dùng chung trong process (store có cùng text với pypdf nên chung nguồn)
+    """
+    pdf_path = _pdf_path or _pdf_candidate_paths()[0]
+    return shared_page_text_cache.get_or_load(
+        page_text_source(pdf_path, 'pypdf'),
+        pdf_page_index,
+        lambda: _read_pdf_page_text(pdf_page_index)
+    )
+
+def _read_pdf_page_text(pdf_page_index):
+    """Đọc text trang từ store hoặc pypdf (không qua cache)"""
+    store = get_page_text_store()
+    if store is not None:
+        return store.get(pdf_page_index)
+    pdf_reader = get_pdf_reader()
+    if pdf_reader is None:
+        return None
+    return pdf_reader.page_text(pdf_page_index)
+
 def decode_base64_image(base64_string):
     """Decode base64 string thành image"""
     try:
@@ -151,11 +374,11 @@ def get_ocr_reader():
     return _ocr_reader
 
 def extract_text_from_image(image_array):
-    """Trích xuất text từ ảnh sử dụng EasyOCR, trả về (selected_text, all_ocr_texts)"""
+    """Trích xuất text từ ảnh sử dụng EasyOCR, trả về (selected_text, all_ocr_texts, ocr_regions)"""
     try:
         reader = get_ocr_reader()
         if reader is None:
-            return None, []
+            return None, [], []
         
         # EasyOCR cần ảnh ở dạng numpy array (BGR hoặc RGB)
         if len(image_array.shape) == 2:
@@ -165,229 +388,120 @@ def extract_text_from_image(image_array):
         
         # Chuyển từ RGB sang BGR (OpenCV format)
         image_bgr = cv2.cvtColor(image_rgb, cv2.COLOR_RGB2BGR)
+        height, width = image_bgr.shape[:2]
         
         # OCR với EasyOCR
         results = reader.readtext(image_bgr)
         
         if not results:
-            return None, []
+            return None, [], []
         
-        # Lấy tất cả text đã nhận diện
+        # Lấy tất cả text đã nhận diện (kèm confidence/vị trí cho resolver)
         all_texts = []
+        regions = []
         for (bbox, text, confidence) in results:
             if confidence > 0.3:  # Chỉ lấy text có độ tin cậy > 30%
                 all_texts.append(text.strip())
+                regions.append(OCRRegion.from_bbox(bbox, text.strip(), confidence, width, height))
         
         if not all_texts:
-            return None, []
+            return None, [], []
         
         # Ưu tiên text dài nhất (thường là tên thuốc)
         selected_text = max(all_texts, key=len) if all_texts else ' '.join(all_texts)
         
-        # Trả về text đã chọn và danh sách tất cả text
-        return selected_text, all_texts
+        # Trả về text đã chọn, danh sách tất cả text và các region
+        return selected_text, all_texts, regions
         
     except Exception as e:
         print(f"⚠️ Lỗi OCR: {e}")
-        return None, []
+        return None, [], []
 
 def search_drug_in_database(drug_name):
-    """Tìm kiếm thuốc trong database"""
-    drug_db = get_drug_database()
+    """Tìm kiếm thuốc trong database, trả về DrugRecord hoặc None (cache theo text đã chuẩn hóa)"""
+    return drug_lookup_cache.get_or_compute(normalize_key(drug_name),
+                                            lambda: _search_drug_in_database(drug_name))
+
+def _search_drug_in_database(drug_name):
+    """Cascade tìm kiếm thật (không qua cache)"""
+    catalog = get_drug_catalog()
     
-    if drug_db is None or drug_db.empty:
+    if not catalog:
         return None
     
     # Tìm kiếm không phân biệt hoa thường
     drug_name_lower = drug_name.lower().strip()
     
     # Tìm exact match
-    exact_match = drug_db[drug_db['DrugName'].str.lower() == drug_name_lower]
-    if not exact_match.empty:
-        return exact_match.iloc[0].to_dict()
+    exact_match = catalog.get_by_name(drug_name_lower)
+    if exact_match is not None:
+        return exact_match
     
     # Tìm partial match
-    partial_match = drug_db[drug_db['DrugName'].str.lower().str.contains(drug_name_lower, na=False)]
-    if not partial_match.empty:
-        return partial_match.iloc[0].to_dict()
+    record = catalog.first_name_containing(drug_name_lower)
+    if record is not None:
+        return record
     
     # Tìm theo từ khóa
     keywords = drug_name_lower.split()
     for keyword in keywords:
         if len(keyword) > 3:  # Chỉ tìm từ có > 3 ký tự
-            keyword_match = drug_db[drug_db['DrugName'].str.lower().str.contains(keyword, na=False)]
-            if not keyword_match.empty:
-                return keyword_match.iloc[0].to_dict()
+            record = catalog.first_name_containing(keyword)
+            if record is not None:
+                return record
     
-    return None
+    # Tìm gần đúng, chấp nhận lỗi OCR (PARACETAM0L, Panad1l, ...)
+    record, _ = catalog.find_ocr_match(drug_name_lower)
+    return record
 
 def summarize_drug_info_with_gemini(pdf_text, drug_name, drug_info):
     """
     Sử dụng Gemini AI để đọc toàn bộ thông tin từ PDF và tổng hợp thành:
     - Cách dùng (usage): Dễ hiểu, ngắn gọn
     - Lưu ý (notes): Từ chống chỉ định, tương tác thuốc, tác dụng phụ
+    
+    Kết quả được lưu trong summary cache bền (SQLite, dùng chung giữa Backend và api/) theo
+    chuyên luận + hash text nguồn + phiên bản prompt; cache hit không gọi Gemini.
+    Các request đồng thời cho cùng chuyên luận chờ và dùng chung một lần tổng hợp (summary_flight).
     """
-    if not pdf_text or len(pdf_text.strip()) < 50:
+    if not has_source_text(pdf_text):
         print("⚠️ PDF text quá ngắn hoặc rỗng, không thể tổng hợp")
-        return {
-            'usage': 'Thông tin cách dùng không có trong dược thư cho thuốc này.',
-            'notes': 'Thông tin lưu ý không có trong dược thư cho thuốc này.'
-        }
+        return no_info_summary()
     
-    if not GEMINI_AVAILABLE:
-        return {'usage': '', 'notes': ''}
+    # Chỉ cache/gộp theo chuyên luận (nhiều biệt dược dùng chung một kết quả)
+    monograph_id = getattr(drug_info, 'monograph_id', None)
+    if not monograph_id:
+        return _summarize_through_cache(pdf_text, drug_name, drug_info, None)
+    summary = summary_flight.do((monograph_id, source_hash(pdf_text)),
+                                lambda: _summarize_through_cache(pdf_text, drug_name, drug_info, monograph_id))
+    return dict(summary)
+
+def _summarize_through_cache(pdf_text, drug_name, drug_info, monograph_id):
+    """Tra summary cache, miss thì gọi LLM và lưu kết quả (không gộp request)"""
+    cache = get_summary_cache() if monograph_id else None
+    if cache is not None:
+        cached = cache.get(monograph_id, pdf_text, SUMMARY_PROMPT_VERSION)
+        if cached is not None:
+            return cached
     
-    # Lấy API key từ environment variable
-    gemini_api_key = os.getenv('GEMINI_API_KEY')
-    if not gemini_api_key:
+    client = get_llm_client()
+    if client is None:
         print("⚠️ GEMINI_API_KEY không được cấu hình, trả về rỗng")
         return {'usage': '', 'notes': ''}
     
+    summary = _summarize_with_llm(pdf_text, drug_name, drug_info, client)
+    # Không lưu kết quả rỗng (lỗi gọi Gemini) để lần sau thử lại
+    if cache is not None and (summary.get('usage') or summary.get('notes')):
+        cache.put(monograph_id, pdf_text, SUMMARY_PROMPT_VERSION, summary)
+    return summary
+
+def _summarize_with_llm(pdf_text, drug_name, drug_info, client):
+    """Gọi LLM (Gemini hoặc model giả lập) và hậu xử lý kết quả JSON (không qua cache)"""
     try:
-        # Cấu hình Gemini
-        genai.configure(api_key=gemini_api_key)
-        # Sử dụng Gemini 2.0 Flash (model mới nhất, nhanh và chính xác)
-        try:
-            model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        except Exception as e:
-            print(f"⚠️ Không thể dùng gemini-2.0-flash-exp, thử gemini-2.0-flash: {e}")
-            try:
-                model = genai.GenerativeModel('gemini-2.0-flash')
-            except Exception as e2:
-                print(f"⚠️ Không thể dùng gemini-2.0-flash, thử gemini-1.5-flash: {e2}")
-                model = genai.GenerativeModel('gemini-1.5-flash')
-        
-        # Lấy thông tin bổ sung từ drug_info
-        category = drug_info.get('Category', '')
-        active_ingredient = drug_info.get('ActiveIngredient', '')
-        
-        # Giới hạn độ dài PDF text để tránh vượt quá token limit
-        # Tăng lên 4000 để có đủ context cho Gemini filter đúng thuốc
-        pdf_text_limited = pdf_text[:4000] if len(pdf_text) > 4000 else pdf_text
-        
-        # Prompt để tổng hợp thông tin - cải thiện để filter đúng thuốc và không bịa ra thông tin
-        prompt = f"""Bạn là một dược sĩ chuyên nghiệp. Hãy đọc và tổng hợp thông tin từ Dược thư Quốc gia về thuốc CỤ THỂ sau:
-
-**THUỐC CẦN TÌM:**
-- Tên thuốc: {drug_name}
-- Hoạt chất: {active_ingredient}
-- Phân loại: {category}
-
-**LƯU Ý QUAN TRỌNG - ĐỌC KỸ:**
-- Trang PDF có thể chứa thông tin của NHIỀU thuốc khác nhau
-- BẠN CHỈ ĐƯỢC tổng hợp thông tin về thuốc "{drug_name}" hoặc "{active_ingredient}"
-- BỎ QUA hoàn toàn thông tin về các thuốc khác (như Polymyxin, Polygelin, hoặc bất kỳ thuốc nào khác)
-- **QUAN TRỌNG NHẤT: NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY TRONG PDF, BẠN PHẢI TRẢ VỀ "KHÔNG CÓ TRONG DƯỢC THƯ"**
-- **TUYỆT ĐỐI KHÔNG ĐƯỢC BỊA RA, TẠO RA, HOẶC SUY ĐOÁN THÔNG TIN KHÔNG CÓ TRONG PDF**
-- **CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF, KHÔNG THÊM BẤT KỲ THÔNG TIN NÀO KHÔNG CÓ TRONG PDF**
-
-**Thông tin từ Dược thư (có thể chứa nhiều thuốc):**
-{pdf_text_limited}
-
-**YÊU CẦU:**
-1. Tổng hợp phần "CÁCH DÙNG" (usage) - CHỈ về thuốc "{drug_name}":
-   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
-   - Viết bằng ngôn ngữ đơn giản, dễ hiểu
-   - Tập trung vào: liều lượng, thời điểm uống, cách uống, tần suất
-   - Sử dụng câu ngắn gọn, rõ ràng
-   - Loại bỏ thuật ngữ y khoa phức tạp
-   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin cách dùng không có trong dược thư cho thuốc này."**
-   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
-
-2. Tổng hợp phần "LƯU Ý" (notes) - CHỈ về thuốc "{drug_name}":
-   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
-   - Từ chống chỉ định: ai không nên dùng
-   - Tương tác thuốc: không dùng cùng với thuốc gì
-   - Tác dụng phụ: cần chú ý gì
-   - Đối tượng đặc biệt: phụ nữ có thai, trẻ em, người già
-   - Bảo quản: cách bảo quản thuốc
-   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin lưu ý không có trong dược thư cho thuốc này."**
-   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
-
-**Trả về theo định dạng JSON:**
-{{
-  "usage": "Phần cách dùng (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin cách dùng không có trong dược thư cho thuốc này.' nếu không có)",
-  "notes": "Phần lưu ý (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin lưu ý không có trong dược thư cho thuốc này.' nếu không có)"
-}}
-
-**QUAN TRỌNG:**
-- Chỉ trả về JSON, không thêm text khác
-- KHÔNG được trả về thông tin của thuốc khác
-- **TUYỆT ĐỐI KHÔNG BỊA RA THÔNG TIN - CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF**
-- Nếu không tìm thấy, phải trả về message "không có trong dược thư" một cách rõ ràng"""
-        
-        response = model.generate_content(prompt)
-        result_text = response.text.strip()
-        
-        # Loại bỏ markdown code blocks nếu có
-        result_text = result_text.replace('```json', '').replace('```', '').strip()
-        
-        # Parse JSON
-        import json
-        try:
-            result = json.loads(result_text)
-            usage = result.get('usage', '').strip()
-            notes = result.get('notes', '').strip()
-            
-            # Kiểm tra xem có phải là thông báo không có thông tin không
-            # Chuẩn hóa message để đảm bảo rõ ràng
-            usage_lower = usage.lower()
-            notes_lower = notes.lower()
-            
-            # Kiểm tra các pattern cho "không có thông tin"
-            no_info_patterns = [
-                'không tìm thấy',
-                'không có trong',
-                'không có thông tin',
-                'chưa có thông tin',
-                'thiếu thông tin'
-            ]
-            
-            if any(pattern in usage_lower for pattern in no_info_patterns):
-                usage = "Thông tin cách dùng không có trong dược thư cho thuốc này."
-            
-            if any(pattern in notes_lower for pattern in no_info_patterns):
-                notes = "Thông tin lưu ý không có trong dược thư cho thuốc này."
-            
-            # Kiểm tra nếu Gemini trả về text quá ngắn hoặc không có ý nghĩa (có thể là bịa ra)
-            # Nếu usage hoặc notes quá ngắn (< 20 ký tự) và không phải là message "không có", có thể là lỗi
-            if len(usage.strip()) < 20 and not any(pattern in usage_lower for pattern in no_info_patterns):
-                print(f"⚠️ Usage quá ngắn ({len(usage)} ký tự), có thể không chính xác. Đặt lại thành 'không có'")
-                usage = "Thông tin cách dùng không có trong dược thư cho thuốc này."
-            
-            if len(notes.strip()) < 20 and not any(pattern in notes_lower for pattern in no_info_patterns):
-                print(f"⚠️ Notes quá ngắn ({len(notes)} ký tự), có thể không chính xác. Đặt lại thành 'không có'")
-                notes = "Thông tin lưu ý không có trong dược thư cho thuốc này."
-            
-            # Giới hạn độ dài
-            if len(usage) > 500:
-                usage = usage[:500] + "..."
-            if len(notes) > 600:
-                notes = notes[:600] + "..."
-            
-            print(f"✅ Đã tổng hợp thông tin với Gemini cho {drug_name}")
-            return {
-                'usage': usage,
-                'notes': notes
-            }
-        except json.JSONDecodeError:
-            # Nếu không parse được JSON, thử extract thủ công
-            print("⚠️ Không parse được JSON từ Gemini, thử extract thủ công")
-            # Tìm phần usage và notes trong text
-            usage_start = result_text.find('"usage"') or result_text.find('CÁCH DÙNG')
-            notes_start = result_text.find('"notes"') or result_text.find('LƯU Ý')
-            
-            if usage_start > -1 and notes_start > -1:
-                usage = result_text[usage_start:notes_start].replace('"usage":', '').strip('",')
-                notes = result_text[notes_start:].replace('"notes":', '').strip('",')
-                return {'usage': usage[:500], 'notes': notes[:600]}
-            else:
-                # Fallback: chia text làm 2 phần
-                parts = result_text.split('\n\n')
-                usage = parts[0] if len(parts) > 0 else ''
-                notes = parts[1] if len(parts) > 1 else ''
-                return {'usage': usage[:500], 'notes': notes[:600]}
-        
+        # Prompt + hậu xử lý dùng chung với job tổng hợp trước (core/drug_summarizer.py)
+        summary = summarize_monograph(client, pdf_text, drug_name, drug_info)
+        print(f"✅ Đã tổng hợp thông tin với Gemini cho {drug_name}")
+        return summary
     except Exception as e:
         print(f"⚠️ Lỗi khi gọi Gemini API: {e}")
         return {'usage': '', 'notes': ''}
@@ -434,65 +548,150 @@ def generate_recommendations(drug_info, pdf_details):
     
     return recommendations
 
-def extract_drug_details_from_pdf(page_number, offset=-1):
+def get_monograph_details(drug_info):
+    """
+    Chi tiết từ PDF (kèm cách dùng/lưu ý tổng hợp bởi Gemini) và khuyến nghị cho thuốc
+    
+    Được tính và cache theo chuyên luận (hoạt chất + trang), nên các biệt dược dùng chung
+    chuyên luận chỉ tốn một lần đọc trang, parse và gọi Gemini.
+    
+    Returns:
+        tuple: (pdf_details, recommendations) - bản sao, caller có thể sửa
+    """
+    monograph_id = drug_info.monograph_id
+    if monograph_id is None or (get_pdf_page_count() == 0 and get_monograph_table() is None):
+        return {}, generate_recommendations(drug_info, {})
+    
+    # Chỉ cache khi đã có text PDF và Gemini trả về kết quả (notes chỉ đến từ Gemini; lỗi thì lần sau thử lại)
+    pdf_details, recommendations = monograph_cache.get_or_compute(
+        monograph_id,
+        lambda: _build_monograph_details(drug_info),
+        should_cache=lambda result: bool(result[0].get('notes'))
+    )
+    return dict(pdf_details), list(recommendations)
+
+def _build_monograph_details(drug_info):
+    """Đọc trang PDF, tổng hợp với Gemini và tạo khuyến nghị cho chuyên luận của thuốc (không qua cache)"""
+    pdf_details = get_structured_details(drug_info)
+    pdf_full_text = pdf_details.get('full_text', '')
+    
+    if pdf_full_text:
+        # Dược thư viết theo hoạt chất, nên tổng hợp theo hoạt chất (dùng chung cho mọi biệt dược)
+        subject = drug_info.get('ActiveIngredient', '') or drug_info.get('DrugName', '')
+        gemini_summary = summarize_drug_info_with_gemini(pdf_full_text, subject, drug_info)
+        
+        # Cập nhật usage và thêm notes
+        if gemini_summary.get('usage'):
+            pdf_details['usage'] = gemini_summary['usage']
+        if gemini_summary.get('notes'):
+            pdf_details['notes'] = gemini_summary['notes']
+    
+    # Khuyến nghị dựa trên danh mục + chống chỉ định/cách dùng (giống nhau trong cùng chuyên luận)
+    return pdf_details, generate_recommendations(drug_info, pdf_details)
+
+def get_structured_details(drug_info):
+    """
+    Thành phần, chỉ định, chống chỉ định, liều dùng... của chuyên luận
+    Tra theo monograph_id trong bảng build sẵn (Crawldata/build_monograph_table.py);
+    không có bảng hoặc chuyên luận chưa có trong bảng thì đọc và parse PDF
+    """
+    table = get_monograph_table()
+    if table is not None and drug_info.monograph_id is not None:
+        try:
+            details = table.get(drug_info.monograph_id)
+            if details is not None:
+                return details
+        except Exception as e:
+            print(f"⚠️ Lỗi đọc bảng chuyên luận: {e}")
+    return extract_drug_details_from_pdf(drug_info.page, title=drug_info.get('ActiveIngredient', ''))
+
+def extract_drug_details_from_pdf(page_number, title=None):
     """
     Trích xuất thông tin chi tiết từ PDF dựa trên số trang
     Tìm thành phần, công dụng, chỉ định, chống chỉ định...
+    
+    Nếu có span index và biết tiêu đề chuyên luận (title, vd: hoạt chất) thì chỉ parse đúng
+    đoạn chuyên luận đó (kể cả khi trải qua nhiều trang); không thì parse cả trang.
+    Trang sách được đổi sang trang PDF theo bản đồ độ lệch đã hiệu chỉnh (get_page_offset_map).
+    Kết quả được cache theo chuyên luận hoặc trang PDF; trả về bản sao vì caller sửa dict
     """
-    pdf_reader = get_pdf_reader()
+    span = find_monograph_span(page_number, title)
+    key = ('span', span.start_page, span.start_offset) if span is not None else ('page', book_page_to_pdf_index(page_number))
+    # Không cache kết quả rỗng (PDF không có, lỗi đọc trang...)
+    details = pdf_details_cache.get_or_compute(
+        key,
+        lambda: _extract_drug_details_from_pdf(page_number, span),
+        should_cache=bool
+    )
+    return dict(details)
+
+def _extract_drug_details_from_pdf(page_number, span=None):
+    """Đọc và parse trang PDF hoặc đoạn chuyên luận `span` (không qua cache)"""
+    page_count = get_pdf_page_count()
     
-    if pdf_reader is None:
+    if page_count == 0:
         return {}
     
     try:
-        # Chuyển đổi số trang sách thành index PDF (pypdf đánh số từ 0)
-        pdf_page_index = int(page_number) + offset - 1
-        
-        # Đảm bảo index hợp lệ
-        if pdf_page_index < 0 or pdf_page_index >= len(pdf_reader.pages):
-            # Thử không có offset
-            pdf_page_index = int(page_number) - 1
-            if pdf_page_index < 0 or pdf_page_index >= len(pdf_reader.pages):
-                return {}
-        
-        # Đọc trang PDF
-        page = pdf_reader.pages[pdf_page_index]
-        text = page.extract_text()
-        
+        # Đúng đoạn chuyên luận nếu có span, không thì cả trang (store trích xuất sẵn hoặc pypdf)
+        text = read_monograph_text(page_number, get_pdf_page_text, page_count, span, get_page_offset_map())
         if not text:
             return {}
         
-        details = {
-            'composition': '',
-            'indications': '',
-            'contraindications': '',
-            'dosage': '',
-            'usage': '',  # Cách dùng
-            'full_text': text[:2000]  # Giới hạn để tránh quá dài
-        }
-        
-        # Regex patterns để tìm các thông tin
-        patterns = {
-            'composition': re.compile(r'(Thành phần|Thành phần chính|Hoạt chất)[:\.]\s*(.+?)(?:\n|$)', re.IGNORECASE),
-            'indications': re.compile(r'(Chỉ định|Công dụng|Tác dụng)[:\.]\s*(.+?)(?:\n|Chống chỉ định|Liều dùng|$)', re.IGNORECASE | re.DOTALL),
-            'contraindications': re.compile(r'(Chống chỉ định|Không dùng)[:\.]\s*(.+?)(?:\n|Liều dùng|Cách dùng|$)', re.IGNORECASE | re.DOTALL),
-            'dosage': re.compile(r'(Liều dùng|Cách dùng|Liều lượng|Cách sử dụng)[:\.]\s*(.+?)(?:\n|Tác dụng phụ|Lưu ý|Bảo quản|$)', re.IGNORECASE | re.DOTALL),
-            'usage': re.compile(r'(Cách dùng|Hướng dẫn sử dụng|Sử dụng)[:\.]\s*(.+?)(?:\n|Lưu ý|Tác dụng phụ|$)', re.IGNORECASE | re.DOTALL)
-        }
-        
-        # Tìm từng loại thông tin
-        for key, pattern in patterns.items():
-            match = pattern.search(text)
-            if match:
-                details[key] = match.group(2).strip()[:500]  # Giới hạn độ dài
-        
-        # Nếu không tìm thấy "usage", dùng "dosage" làm cách dùng
-        if not details['usage'] and details['dosage']:
-            details['usage'] = details['dosage']
-        
-        return details
+        # Tách các mục một lần bằng tokenizer dùng chung (giống hệt bước build bảng chuyên luận)
+        # full_text giữ nguyên để khóa summary cache khớp với Backend và job tổng hợp trước
+        # (prompt tự chọn các mục liên quan trong giới hạn token)
+        return parse_monograph_details(text)
         
     except Exception as e:
         print(f"⚠️ Lỗi đọc PDF trang {page_number}: {e}")
         return {}
 
+def send_drug_listing(handler, query_params, iter_records):
+    """
+    Gửi danh sách thuốc (theo thứ tự CSV) phân trang bằng cursor
+    - cursor: lấy từ next_cursor của trang trước
+    - limit: số thuốc mỗi trang (mặc định 20, tối đa 200)
+    - format=ndjson (hoặc Accept: application/x-ndjson): ghi mỗi dòng một thuốc,
+      không truyền limit thì ghi hết danh sách; cursor trang sau nằm trong header X-Next-Cursor
+    
+    Args:
+        handler: BaseHTTPRequestHandler đang xử lý request
+        query_params: Kết quả parse_qs của URL
+        iter_records: Hàm nhận after_row, trả về iterator DrugRecord sau dòng đó
+    """
+    wants_ndjson = (query_params.get('format', [''])[0] == 'ndjson'
+                    or 'application/x-ndjson' in handler.headers.get('Accept', ''))
+    try:
+        after_row = decode_cursor(query_params.get('cursor', [''])[0])
+        limit = parse_limit(query_params.get('limit', [''])[0],
+                            default=None if wants_ndjson else DEFAULT_PAGE_SIZE)
+    except ValueError as e:
+        handler.send_error(400, str(e))
+        return
+    
+    records = iter_records(after_row)
+    next_cursor = None
+    if limit is not None:
+        records, next_cursor = paginate(records, limit)
+    
+    handler.send_response(200)
+    handler.send_header('Content-Type', 'application/x-ndjson' if wants_ndjson else 'application/json')
+    if wants_ndjson and next_cursor:
+        handler.send_header('X-Next-Cursor', next_cursor)
+    handler.send_header('Access-Control-Allow-Origin', '*')
+    handler.send_header('Access-Control-Allow-Methods', 'GET, OPTIONS')
+    handler.send_header('Access-Control-Allow-Headers', 'Content-Type')
+    handler.send_header('Access-Control-Expose-Headers', 'X-Next-Cursor')
+    handler.end_headers()
+    
+    if wants_ndjson:
+        # Ghi từng thuốc ngay khi duyệt tới (mỗi dòng một JSON)
+        for record in records:
+            handler.wfile.write((json.dumps(record.to_dict(), ensure_ascii=False) + '\n').encode())
+    else:
+        response = {
+            'drugs': [record.to_dict() for record in records],
+            'next_cursor': next_cursor
+        }
+        handler.wfile.write(json.dumps(response).encode())
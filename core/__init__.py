@@ -0,0 +1,26 @@
+"""
+Core package - Thành phần dùng chung giữa Backend (Flask) và api/ (Vercel)
+"""
+from .drug_catalog import DrugCatalog, DrugRecord
+from .fuzzy_matcher import FuzzyMatcher
+from .lazy_pdf import LazyPdf
+from .llm_client import GeminiClient, LLMClient, StubLLMClient, client_from_env, create_llm_client
+from .monograph_spans import MonographSpanIndex
+from .monograph_table import MonographTable
+from .ocr_resolver import OCRRegion, confident_candidate, resolve_ocr_regions
+from .ocr_spell_index import OCRSpellIndex
+from .page_offset_map import PageOffsetMap
+from .page_search_index import PageSearchIndex
+from .page_text_cache import PageTextCache
+from .page_text_store import PageTextStore
+from .pdf_text_backends import PdfTextBackend, open_backend
+from .prefix_index import PrefixIndex
+from .prompt_context import build_prompt_context
+from .rate_limiter import TokenBucket
+from .result_cache import ResultCache
+from .section_tokenizer import SectionTokenizer
+from .single_flight import SingleFlight
+from .summary_cache import SummaryCache
+from .trigram_index import TrigramIndex
+
+__all__ = ['DrugCatalog', 'DrugRecord', 'FuzzyMatcher', 'GeminiClient', 'LLMClient', 'LazyPdf', 'MonographSpanIndex', 'MonographTable', 'OCRRegion', 'OCRSpellIndex', 'PageOffsetMap', 'PageSearchIndex', 'PageTextCache', 'PageTextStore', 'PdfTextBackend', 'PrefixIndex', 'ResultCache', 'SectionTokenizer', 'SingleFlight', 'StubLLMClient', 'SummaryCache', 'TokenBucket', 'TrigramIndex', 'build_prompt_context', 'client_from_env', 'confident_candidate', 'create_llm_client', 'open_backend', 'resolve_ocr_regions']
@@ -0,0 +1,421 @@
+"""
+Drug Catalog - Danh mục thuốc bất biến, load một lần từ drug_database_refined.csv
+
+Thay cho việc giữ DataFrame rồi `str.lower()` cả cột ở mỗi request:
+- Key tên thuốc/hoạt chất/danh mục đã chuẩn hóa sẵn (NFC, viết thường) kèm
+  bản bỏ dấu tiếng Việt để tìm không phân biệt dấu ("thuoc ho" khớp "thuốc ho")
+- Cột Is_Prescription đã parse thành bool thật
+- Dict index theo tên, hoạt chất, số trang để tra cứu O(1)
+- Mỗi dòng là một DrugRecord gọn (__slots__)
+"""
+import bisect
+import csv
+import heapq
+import logging
+from functools import cached_property
+from types import MappingProxyType
+
+from .fuzzy_matcher import FuzzyMatcher
+from .ocr_spell_index import OCRSpellIndex
+from .prefix_index import KIND_DRUG, PrefixIndex
+from .text_utils import fold_diacritics, fold_key, normalize_key, normalize_query
+from .trigram_index import TrigramIndex
+
+logger = logging.getLogger(__name__)
+
+CATALOG_COLUMNS = ('DrugName', 'ActiveIngredient', 'PageNumber', 'Category', 'Is_Prescription')
+# Số tên tối đa trong một lần match_batch (giới hạn cho API batch)
+MAX_BATCH_SIZE = 5000
+# Khớp lỗi OCR chỉ với một từ của tên thì cả text phải giống cả tên/hoạt chất ít nhất mức này
+MIN_OCR_NAME_SIMILARITY = 0.6
+
+
+def parse_bool(value):
+    """Parse giá trị boolean từ CSV ("True"/"False", "1"/"0", "yes"/"no")"""
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', '1', 'yes')
+    return False
+
+
+def monograph_key(ingredient, page):
+    """
+    ID chuyên luận chuẩn trong Dược thư: "<trang>:<hoạt chất bỏ dấu>" (vd: "329:cefaclor")
+
+    Nhiều biệt dược (Kukjekemocin, Kukjekemocin Dry Syrup...) dùng chung một chuyên luận
+    nên chi tiết PDF/tổng hợp chỉ cần tính một lần cho mỗi ID.
+
+    Returns:
+        str hoặc None nếu không có số trang
+    """
+    if page is None:
+        return None
+    return f"{page}:{fold_key(ingredient)}"
+
+
+def parse_page(value):
+    """Parse số trang sách, trả về None nếu không hợp lệ"""
+    try:
+        return int(str(value).strip())
+    except (TypeError, ValueError):
+        return None
+
+
+class DrugRecord:
+    """Một dòng trong danh mục thuốc (bất biến)"""
+
+    __slots__ = ('row', 'name', 'ingredient', 'page', 'category', 'is_prescription',
+                 'name_key', 'ingredient_key', 'category_key',
+                 'name_folded', 'ingredient_folded', 'category_folded', 'monograph_id')
+
+    # Map tên cột CSV -> thuộc tính, để code cũ dùng drug_info.get('DrugName') vẫn chạy
+    _COLUMN_ATTRS = {
+        'DrugName': 'name',
+        'ActiveIngredient': 'ingredient',
+        'PageNumber': 'page',
+        'Category': 'category',
+        'Is_Prescription': 'is_prescription',
+    }
+
+    def __init__(self, row, name, ingredient, page, category, is_prescription):
+        set_attr = object.__setattr__
+        set_attr(self, 'row', row)
+        set_attr(self, 'name', name)
+        set_attr(self, 'ingredient', ingredient)
+        set_attr(self, 'page', page)
+        set_attr(self, 'category', category)
+        set_attr(self, 'is_prescription', is_prescription)
+        set_attr(self, 'name_key', normalize_key(name))
+        set_attr(self, 'ingredient_key', normalize_key(ingredient))
+        set_attr(self, 'category_key', normalize_key(category))
+        # Key bỏ dấu (đ -> d, bỏ thanh điệu) - dùng cho các index tìm kiếm
+        set_attr(self, 'name_folded', fold_diacritics(self.name_key))
+        set_attr(self, 'ingredient_folded', fold_diacritics(self.ingredient_key))
+        set_attr(self, 'category_folded', fold_diacritics(self.category_key))
+        set_attr(self, 'monograph_id', monograph_key(ingredient, page))
+
+    def __setattr__(self, name, value):
+        raise AttributeError("DrugRecord is immutable")
+
+    def __delattr__(self, name):
+        raise AttributeError("DrugRecord is immutable")
+
+    def __repr__(self):
+        return f"DrugRecord(row={self.row}, name={self.name!r}, page={self.page})"
+
+    def get(self, column, default=None):
+        """Lấy giá trị theo tên cột CSV (tương thích với dict từ DataFrame)"""
+        attr = self._COLUMN_ATTRS.get(column)
+        if attr is None:
+            return default
+        value = getattr(self, attr)
+        return default if value is None else value
+
+    def to_dict(self):
+        """Chuyển thành dict theo tên cột CSV (dùng để trả JSON)"""
+        return {
+            'DrugName': self.name,
+            'ActiveIngredient': self.ingredient,
+            'PageNumber': self.page,
+            'Category': self.category,
+            'Is_Prescription': self.is_prescription,
+        }
+
+
+class DrugCatalog:
+    def __init__(self, records, source_path=None):
+        """
+        Dựng catalog từ danh sách DrugRecord (theo thứ tự dòng trong CSV)
+
+        Args:
+            records: Danh sách DrugRecord
+            source_path: Đường dẫn file CSV gốc (để log/debug)
+        """
+        self.records = tuple(records)
+        self.source_path = source_path
+
+        by_name = {}
+        by_name_folded = {}
+        by_ingredient = {}
+        by_page = {}
+        by_monograph = {}
+        by_category = {}
+        for record in self.records:
+            by_category.setdefault(record.category_key, []).append(record.row)
+            by_name.setdefault(record.name_key, []).append(record.row)
+            by_name_folded.setdefault(record.name_folded, []).append(record.row)
+            by_ingredient.setdefault(record.ingredient_key, []).append(record.row)
+            if record.page is not None:
+                by_page.setdefault(record.page, []).append(record.row)
+                by_monograph.setdefault(record.monograph_id, []).append(record.row)
+
+        self._by_name = MappingProxyType({k: tuple(v) for k, v in by_name.items()})
+        self._by_name_folded = MappingProxyType({k: tuple(v) for k, v in by_name_folded.items()})
+        self._by_ingredient = MappingProxyType({k: tuple(v) for k, v in by_ingredient.items()})
+        self._by_page = MappingProxyType({k: tuple(v) for k, v in by_page.items()})
+        self._by_monograph = MappingProxyType({k: tuple(v) for k, v in by_monograph.items()})
+
+        # Cột Rx dạng bool, cùng thứ tự với records
+        self.is_prescription = tuple(record.is_prescription for record in self.records)
+
+        # Index substring cho cascade tìm kiếm (trên key bỏ dấu, xem _iter_containing)
+        self.name_index = TrigramIndex([record.name_folded for record in self.records])
+        self.ingredient_index = TrigramIndex([record.ingredient_folded for record in self.records])
+        # Danh sách danh mục (thứ tự xuất hiện đầu tiên như unique()), tính sẵn một lần
+        self.categories = tuple(dict.fromkeys(record.category for record in self.records))
+        # Danh mục lặp lại nhiều (vài trăm giá trị / hàng nghìn dòng) nên index theo giá trị riêng biệt
+        self._category_rows = tuple(tuple(rows) for rows in by_category.values())
+        self.category_index = TrigramIndex([fold_diacritics(key) for key in by_category])
+        # Index prefix cho autocomplete (tên thuốc + hoạt chất)
+        self.prefix_index = PrefixIndex.from_catalog(self)
+
+    @classmethod
+    def from_csv(cls, csv_path):
+        """
+        Load catalog từ file CSV (DrugName, ActiveIngredient, PageNumber, Category, Is_Prescription)
+
+        Args:
+            csv_path: Đường dẫn file CSV
+
+        Returns:
+            DrugCatalog
+        """
+        records = []
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            for row, line in enumerate(reader):
+                records.append(DrugRecord(
+                    row=row,
+                    name=(line.get('DrugName') or '').strip(),
+                    ingredient=(line.get('ActiveIngredient') or '').strip(),
+                    page=parse_page(line.get('PageNumber')),
+                    category=(line.get('Category') or '').strip(),
+                    is_prescription=parse_bool(line.get('Is_Prescription')),
+                ))
+        logger.info(f"Loaded {len(records)} drugs from {csv_path}")
+        return cls(records, source_path=csv_path)
+
+    @classmethod
+    def empty(cls):
+        """Catalog rỗng (khi không load được file)"""
+        return cls([])
+
+    def __len__(self):
+        return len(self.records)
+
+    def __iter__(self):
+        return iter(self.records)
+
+    def __getitem__(self, row):
+        return self.records[row]
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def get_by_name(self, name):
+        """
+        Lấy thuốc đầu tiên có tên khớp chính xác (không phân biệt hoa thường).
+        Nếu không có tên khớp đúng dấu thì so theo key bỏ dấu.
+
+        Returns:
+            DrugRecord hoặc None
+        """
+        key = normalize_key(name)
+        rows = self._by_name.get(key) or self._by_name_folded.get(fold_diacritics(key))
+        return self.records[rows[0]] if rows else None
+
+    def _iter_containing(self, index, key_attr, text, after_row=-1):
+        """
+        Duyệt các dòng có key chứa text qua index bỏ dấu.
+
+        Query không dấu ("hoat chat") khớp cả text có dấu; query có dấu thì
+        dấu được tôn trọng (verify lại trên key gốc), nên "Urê" không khớp "ure".
+        """
+        key = normalize_key(text)
+        folded = fold_diacritics(key)
+        for row in index.iter_containing(folded, start=after_row + 1):
+            if folded == key or key in getattr(self.records[row], key_attr):
+                yield row
+
+    def first_name_containing(self, text):
+        """
+        Thuốc đầu tiên (theo thứ tự CSV) có tên chứa text, không phân biệt hoa thường
+        (và không phân biệt dấu nếu text không dấu)
+
+        Returns:
+            DrugRecord hoặc None
+        """
+        row = next(self._iter_containing(self.name_index, 'name_key', text), None)
+        return None if row is None else self.records[row]
+
+    def first_ingredient_containing(self, text):
+        """Thuốc đầu tiên có hoạt chất chứa text (quy tắc dấu như first_name_containing)"""
+        row = next(self._iter_containing(self.ingredient_index, 'ingredient_key', text), None)
+        return None if row is None else self.records[row]
+
+    def iter_names_containing(self, text, after_row=-1):
+        """
+        Duyệt (theo thứ tự CSV) các thuốc có tên chứa text (quy tắc dấu như first_name_containing)
+
+        Args:
+            after_row: Chỉ lấy các dòng sau dòng này (tiếp tục từ cursor phân trang)
+        """
+        for row in self._iter_containing(self.name_index, 'name_key', text, after_row):
+            yield self.records[row]
+
+    def find_by_ingredient(self, ingredient):
+        """Tất cả thuốc có hoạt chất khớp chính xác"""
+        return tuple(self.records[row] for row in self._by_ingredient.get(normalize_key(ingredient), ()))
+
+    def iter_by_category(self, text, after_row=-1):
+        """
+        Duyệt (theo thứ tự CSV) các thuốc có danh mục chứa text (quy tắc dấu như first_name_containing)
+
+        Args:
+            after_row: Chỉ lấy các dòng sau dòng này (tiếp tục từ cursor phân trang)
+        """
+        key = normalize_key(text)
+        folded = fold_diacritics(key)
+        matched = []
+        for position in self.category_index.iter_containing(folded):
+            category_rows = self._category_rows[position]
+            if folded == key or key in self.records[category_rows[0]].category_key:
+                # Mỗi danh mục đã sắp theo dòng: bỏ phần trước cursor rồi trộn lười (không gom cả danh sách)
+                matched.append(category_rows[bisect.bisect_right(category_rows, after_row):])
+        for row in heapq.merge(*matched):
+            yield self.records[row]
+
+    def find_by_category(self, text):
+        """Tất cả thuốc có danh mục chứa text, theo thứ tự CSV"""
+        return tuple(self.iter_by_category(text))
+
+    def find_by_page(self, page):
+        """Tất cả thuốc có chuyên luận ở trang sách `page`"""
+        page = parse_page(page)
+        return tuple(self.records[row] for row in self._by_page.get(page, ()))
+
+    def find_by_monograph(self, monograph_id):
+        """Tất cả biệt dược dùng chung chuyên luận `monograph_id` (xem monograph_key)"""
+        return tuple(self.records[row] for row in self._by_monograph.get(monograph_id, ()))
+
+    def iter_monographs(self):
+        """Biệt dược đầu tiên (theo thứ tự dòng) của mỗi chuyên luận - đại diện cho chuyên luận"""
+        for rows in self._by_monograph.values():
+            yield self.records[rows[0]]
+
+    @property
+    def monograph_count(self):
+        """Số chuyên luận riêng biệt (ít hơn nhiều so với số dòng)"""
+        return len(self._by_monograph)
+
+    @cached_property
+    def fuzzy_matcher(self):
+        """Index so khớp gần đúng (điểm 0-1) - dựng khi cần lần đầu"""
+        return FuzzyMatcher([record.name_folded for record in self.records],
+                            [record.ingredient_folded for record in self.records])
+
+    @cached_property
+    def spell_index(self):
+        """Index sửa lỗi OCR (SymSpell) - chỉ dựng khi cần lần đầu vì tốn ~1s"""
+        return OCRSpellIndex([record.name_folded for record in self.records],
+                             [record.ingredient_folded for record in self.records])
+
+    def find_ocr_match(self, text):
+        """
+        Tìm thuốc gần đúng nhất cho text OCR đọc sai ký tự (khoảng cách sửa <= 2,
+        lỗi kiểu 0/O, 1/l/I, rn/m, 5/S không tính)
+
+        Khớp chỉ với một từ của tên (vd: "Made in Korea" ~ "Zade 40") chỉ được tính khi cả text
+        cũng giống cả tên/hoạt chất, để text thường trên vỏ hộp không ra thuốc không liên quan.
+
+        Returns:
+            tuple: (DrugRecord, SpellMatch) hoặc (None, None) nếu không có
+        """
+        if not self.records or not isinstance(text, str):
+            return None, None
+        matches = self.spell_index.search(fold_key(text), limit=1)
+        if not matches:
+            return None, None
+        match = matches[0]
+        records = [self.records[row] for row in match.rows]
+        # Ưu tiên thuốc có cả tên/hoạt chất đúng bằng term (vd: "amoxicilin" -> thuốc hoạt chất
+        # amoxicilin, không phải dòng đầu tiên có từ đó như "amoxicilin va kali clavulanat")
+        for record in records:
+            if match.term in (record.name_folded, record.ingredient_folded):
+                return record, match
+        # Chỉ khớp một từ: chọn thuốc có tên/hoạt chất giống text nhất, nếu đủ giống
+        query = normalize_query(text)
+        similarity, record = max(((self.fuzzy_matcher.name_similarity(query, record.row), record)
+                                  for record in records), key=lambda item: item[0])
+        if similarity < MIN_OCR_NAME_SIMILARITY:
+            return None, None
+        return record, match
+
+    def match_batch(self, names, threshold=0.6):
+        """
+        Tìm thuốc khớp nhất cho cả danh sách tên (vd: đối chiếu danh sách tồn kho)
+
+        Các tên trùng nhau (sau chuẩn hóa) chỉ chấm điểm một lần; cận trên điểm
+        được tính theo lô qua FuzzyMatcher.search_many. Kết quả trả về dần theo
+        thứ tự đầu vào nên có thể stream ngay khi từng lô xong.
+
+        Args:
+            names: Danh sách tên thuốc
+            threshold: Điểm tối thiểu để coi là khớp (0-1)
+
+        Yields:
+            dict: index, query, match (thông tin thuốc hoặc None), score, is_prescription
+        """
+        queries = [normalize_query(name) for name in names]
+        unique_ids = {}
+        positions = [unique_ids.setdefault(query, len(unique_ids)) for query in queries]
+
+        best = []
+        scored = self.fuzzy_matcher.search_many(list(unique_ids), threshold=threshold, limit=1)
+        for index, (name, position) in enumerate(zip(names, positions)):
+            while len(best) <= position:
+                best.append(next(scored))
+            matches = best[position]
+            if matches:
+                row, score = matches[0]
+                record = self.records[row]
+                yield {
+                    'index': index,
+                    'query': name,
+                    'match': record.to_dict(),
+                    'score': score,
+                    'is_prescription': record.is_prescription,
+                }
+            else:
+                yield {
+                    'index': index,
+                    'query': name,
+                    'match': None,
+                    'score': 0.0,
+                    'is_prescription': None,
+                }
+
+    def autocomplete(self, prefix, limit=10):
+        """
+        Gợi ý tên thuốc/hoạt chất cho text đang gõ (qua prefix index)
+
+        Args:
+            prefix: Text người dùng đang gõ
+            limit: Số gợi ý tối đa
+
+        Returns:
+            list: Mỗi gợi ý gồm text, type ('drug'/'ingredient'), count (số thuốc)
+                  và drug (thông tin thuốc đầu tiên, chỉ với type 'drug')
+        """
+        suggestions = []
+        for completion in self.prefix_index.complete(prefix, limit=limit):
+            suggestion = {
+                'text': completion.text,
+                'type': completion.kind,
+                'count': len(completion.rows),
+            }
+            if completion.kind == KIND_DRUG:
+                suggestion['drug'] = self.records[completion.rows[0]].to_dict()
+            suggestions.append(suggestion)
+        return suggestions
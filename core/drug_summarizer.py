@@ -0,0 +1,191 @@
+"""
+Drug Summarizer - Tổng hợp "cách dùng" và "lưu ý" của chuyên luận bằng LLM
+
+Prompt và phần hậu xử lý kết quả JSON dùng chung cho Backend/app.py, api/utils.py
+và job tổng hợp trước (Crawldata/presummarize_monographs.py), để kết quả của
+job giống hệt kết quả tính trong request và được dùng lại qua summary cache.
+
+LLM được truyền vào dưới dạng client có hàm generate(prompt) -> str (xem
+core/llm_client.py), nên có thể chạy với model giả lập ở local/test.
+
+Text chuyên luận đưa vào prompt được chọn theo mục trong giới hạn token
+(core/prompt_context.py) thay vì cắt 4000 ký tự đầu.
+"""
+import json
+import logging
+
+from .prompt_context import DEFAULT_TOKEN_BUDGET, build_prompt_context
+
+logger = logging.getLogger(__name__)
+
+# Tăng khi đổi prompt/hậu xử lý để summary cache không trả kết quả cũ
+PROMPT_TEMPLATE_VERSION = '2'
+# Phiên bản dùng làm khóa summary cache: gồm cả ngân sách token (SUMMARY_TOKEN_BUDGET), vì đổi
+# ngân sách thì text đưa vào prompt - và kết quả tổng hợp - cũng đổi
+PROMPT_VERSION = f"{PROMPT_TEMPLATE_VERSION}-b{DEFAULT_TOKEN_BUDGET}"
+# Text ngắn hơn thì không gọi LLM (không đủ thông tin)
+MIN_SOURCE_CHARS = 50
+MAX_USAGE_LENGTH = 500
+MAX_NOTES_LENGTH = 600
+
+NO_USAGE = 'Thông tin cách dùng không có trong dược thư cho thuốc này.'
+NO_NOTES = 'Thông tin lưu ý không có trong dược thư cho thuốc này.'
+
+# Các cách LLM diễn đạt "không có thông tin"
+NO_INFO_PATTERNS = (
+    'không tìm thấy',
+    'không có trong',
+    'không có thông tin',
+    'chưa có thông tin',
+    'thiếu thông tin',
+)
+
+
+def has_source_text(pdf_text):
+    """Text chuyên luận đủ dài để tổng hợp"""
+    return bool(pdf_text) and len(pdf_text.strip()) >= MIN_SOURCE_CHARS
+
+
+def no_info_summary():
+    """Kết quả khi dược thư không có thông tin (không gọi LLM)"""
+    return {'usage': NO_USAGE, 'notes': NO_NOTES}
+
+
+def build_summary_prompt(pdf_text, drug_name, drug_info, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Prompt tổng hợp cho thuốc `drug_name` từ các mục liên quan của chuyên luận
+    (liều dùng, chống chỉ định, tương tác...), phần text không quá token_budget token
+
+    Args:
+        pdf_text: Text chuyên luận (hoặc cả trang PDF)
+        drug_name: Tên thuốc/hoạt chất cần tổng hợp
+        drug_info: DrugRecord (hoặc dict) có 'Category', 'ActiveIngredient'
+    """
+    # Lấy thông tin bổ sung từ drug_info
+    category = drug_info.get('Category', '')
+    active_ingredient = drug_info.get('ActiveIngredient', '')
+    context, _ = build_prompt_context(pdf_text, active_ingredient or drug_name, token_budget)
+
+    # Prompt để tổng hợp thông tin - cải thiện để filter đúng thuốc và không bịa ra thông tin
+    return f"""Bạn là một dược sĩ chuyên nghiệp. Hãy đọc và tổng hợp thông tin từ Dược thư Quốc gia về thuốc CỤ THỂ sau:
+
+**THUỐC CẦN TÌM:**
+- Tên thuốc: {drug_name}
+- Hoạt chất: {active_ingredient}
+- Phân loại: {category}
+
+**LƯU Ý QUAN TRỌNG - ĐỌC KỸ:**
+- Trang PDF có thể chứa thông tin của NHIỀU thuốc khác nhau
+- BẠN CHỈ ĐƯỢC tổng hợp thông tin về thuốc "{drug_name}" hoặc "{active_ingredient}"
+- BỎ QUA hoàn toàn thông tin về các thuốc khác (như Polymyxin, Polygelin, hoặc bất kỳ thuốc nào khác)
+- **QUAN TRỌNG NHẤT: NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY TRONG PDF, BẠN PHẢI TRẢ VỀ "KHÔNG CÓ TRONG DƯỢC THƯ"**
+- **TUYỆT ĐỐI KHÔNG ĐƯỢC BỊA RA, TẠO RA, HOẶC SUY ĐOÁN THÔNG TIN KHÔNG CÓ TRONG PDF**
+- **CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF, KHÔNG THÊM BẤT KỲ THÔNG TIN NÀO KHÔNG CÓ TRONG PDF**
+
+**Thông tin từ Dược thư (có thể chứa nhiều thuốc):**
+{context}
+
+**YÊU CẦU:**
+1. Tổng hợp phần "CÁCH DÙNG" (usage) - CHỈ về thuốc "{drug_name}":
+   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
+   - Viết bằng ngôn ngữ đơn giản, dễ hiểu
+   - Tập trung vào: liều lượng, thời điểm uống, cách uống, tần suất
+   - Sử dụng câu ngắn gọn, rõ ràng
+   - Loại bỏ thuật ngữ y khoa phức tạp
+   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin cách dùng không có trong dược thư cho thuốc này."**
+   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
+
+2. Tổng hợp phần "LƯU Ý" (notes) - CHỈ về thuốc "{drug_name}":
+   - **CHỈ tổng hợp thông tin CÓ THẬT trong PDF về thuốc này**
+   - Từ chống chỉ định: ai không nên dùng
+   - Tương tác thuốc: không dùng cùng với thuốc gì
+   - Tác dụng phụ: cần chú ý gì
+   - Đối tượng đặc biệt: phụ nữ có thai, trẻ em, người già
+   - Bảo quản: cách bảo quản thuốc
+   - **NẾU KHÔNG TÌM THẤY THÔNG TIN VỀ THUỐC NÀY, BẠN PHẢI VIẾT CHÍNH XÁC: "Thông tin lưu ý không có trong dược thư cho thuốc này."**
+   - **KHÔNG ĐƯỢC TẠO RA, BỊA RA, HOẶC SUY ĐOÁN THÔNG TIN**
+
+**Trả về theo định dạng JSON:**
+{{
+  "usage": "Phần cách dùng (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin cách dùng không có trong dược thư cho thuốc này.' nếu không có)",
+  "notes": "Phần lưu ý (CHỈ thông tin có thật trong PDF về {drug_name}, hoặc 'Thông tin lưu ý không có trong dược thư cho thuốc này.' nếu không có)"
+}}
+
+**QUAN TRỌNG:**
+- Chỉ trả về JSON, không thêm text khác
+- KHÔNG được trả về thông tin của thuốc khác
+- **TUYỆT ĐỐI KHÔNG BỊA RA THÔNG TIN - CHỈ TỔNG HỢP THÔNG TIN CÓ THẬT TRONG PDF**
+- Nếu không tìm thấy, phải trả về message "không có trong dược thư" một cách rõ ràng"""
+
+
+def parse_summary_response(result_text):
+    """
+    Hậu xử lý câu trả lời của LLM thành {'usage', 'notes'}
+
+    Chuẩn hóa các câu "không có thông tin", loại câu trả lời quá ngắn (có thể bịa ra),
+    giới hạn độ dài; không parse được JSON thì tách thủ công.
+    """
+    # Loại bỏ markdown code blocks nếu có
+    result_text = (result_text or '').strip().replace('```json', '').replace('```', '').strip()
+
+    try:
+        result = json.loads(result_text)
+    except json.JSONDecodeError:
+        # Nếu không parse được JSON, thử extract thủ công
+        logger.warning("Cannot parse LLM response as JSON, extracting manually")
+        usage_start = result_text.find('"usage"') or result_text.find('CÁCH DÙNG')
+        notes_start = result_text.find('"notes"') or result_text.find('LƯU Ý')
+        if usage_start > -1 and notes_start > -1:
+            usage = result_text[usage_start:notes_start].replace('"usage":', '').strip('",')
+            notes = result_text[notes_start:].replace('"notes":', '').strip('",')
+        else:
+            # Fallback: chia text làm 2 phần
+            parts = result_text.split('\n\n')
+            usage = parts[0] if len(parts) > 0 else ''
+            notes = parts[1] if len(parts) > 1 else ''
+        return {'usage': usage[:MAX_USAGE_LENGTH], 'notes': notes[:MAX_NOTES_LENGTH]}
+
+    usage = str(result.get('usage', '') or '').strip()
+    notes = str(result.get('notes', '') or '').strip()
+
+    # Chuẩn hóa message "không có thông tin" để đảm bảo rõ ràng
+    usage_no_info = any(pattern in usage.lower() for pattern in NO_INFO_PATTERNS)
+    notes_no_info = any(pattern in notes.lower() for pattern in NO_INFO_PATTERNS)
+    if usage_no_info:
+        usage = NO_USAGE
+    if notes_no_info:
+        notes = NO_NOTES
+
+    # Text quá ngắn (< 20 ký tự) mà không phải message "không có" thì có thể là bịa ra
+    if len(usage) < 20 and not usage_no_info:
+        logger.warning(f"Usage too short ({len(usage)} chars), replacing with 'no info'")
+        usage = NO_USAGE
+    if len(notes) < 20 and not notes_no_info:
+        logger.warning(f"Notes too short ({len(notes)} chars), replacing with 'no info'")
+        notes = NO_NOTES
+
+    # Giới hạn độ dài
+    if len(usage) > MAX_USAGE_LENGTH:
+        usage = usage[:MAX_USAGE_LENGTH] + "..."
+    if len(notes) > MAX_NOTES_LENGTH:
+        notes = notes[:MAX_NOTES_LENGTH] + "..."
+    return {'usage': usage, 'notes': notes}
+
+
+def summarize_monograph(client, pdf_text, drug_name, drug_info):
+    """
+    Tổng hợp cách dùng/lưu ý cho thuốc bằng LLM client (không qua cache)
+
+    Args:
+        client: Đối tượng có generate(prompt) -> str (xem core/llm_client.py)
+
+    Returns:
+        dict: {'usage', 'notes'}
+
+    Raises:
+        Exception: Lỗi từ client (mạng, quota, timeout...) - caller quyết định thử lại hay bỏ qua
+    """
+    if not has_source_text(pdf_text):
+        return no_info_summary()
+    response_text = client.generate(build_summary_prompt(pdf_text, drug_name, drug_info))
+    return parse_summary_response(response_text)
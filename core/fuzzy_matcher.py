@@ -0,0 +1,272 @@
+"""
+Fuzzy Matcher - So khớp gần đúng tên thuốc/hoạt chất trên toàn bộ danh mục
+
+Index được dựng một lần khi load:
+- Ma trận đếm ký tự (mỗi dòng là vector ký tự của một key) để tính cận trên
+  của SequenceMatcher.ratio() cho cả danh mục bằng một phép toán numpy
+- Posting list trigram để tìm các dòng chứa một từ của query (substring)
+
+Khi tìm kiếm, chỉ các dòng có cận trên đủ cao mới được tính ratio() thật,
+nên điểm trả về giống hệt cách tính cũ nhưng không phải duyệt từng dòng.
+"""
+import heapq
+import logging
+from difflib import SequenceMatcher
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Điểm cố định khi một từ của query (>= 3 ký tự) nằm trong tên thuốc/hoạt chất
+WORD_MATCH_SCORE = 0.8
+MIN_WORD_LENGTH = 3
+# Số query được tính cận trên chung trong search_many (ma trận query x dòng)
+BATCH_CHUNK_SIZE = 64
+
+
+def _trigrams(text):
+    """Tập trigram (không padding) của một chuỗi"""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class _KeyField:
+    """Index của một cột key (tên thuốc hoặc hoạt chất)"""
+
+    def __init__(self, keys, alphabet):
+        self.keys = keys
+        self.lengths = np.fromiter((len(k) for k in keys), dtype=np.int32, count=len(keys))
+
+        # Ma trận đếm ký tự: counts[row, alphabet[c]] = số lần ký tự c xuất hiện
+        self.counts = np.zeros((len(keys), len(alphabet)), dtype=np.int16)
+        for row, key in enumerate(keys):
+            for ch in key:
+                self.counts[row, alphabet[ch]] += 1
+
+        # Posting list trigram -> các dòng chứa trigram đó (đã sắp xếp)
+        postings = {}
+        for row, key in enumerate(keys):
+            for gram in _trigrams(key):
+                postings.setdefault(gram, []).append(row)
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+
+    def ratio_upper_bound(self, query_cols, query_counts, query_length):
+        """
+        Cận trên của SequenceMatcher(None, query, key).ratio() cho mọi dòng
+        (chính là quick_ratio(), tính vector hóa trên toàn bộ danh mục)
+        """
+        if query_cols.size:
+            overlap = np.minimum(self.counts[:, query_cols], query_counts).sum(axis=1)
+        else:
+            overlap = np.zeros(len(self.keys), dtype=np.int64)
+        total = self.lengths + query_length
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bound = np.where(total > 0, 2.0 * overlap / total, 1.0)
+        return bound
+
+    def ratio_upper_bounds(self, queries, alphabet):
+        """
+        Như ratio_upper_bound() nhưng cho cả lô query: trả về ma trận (query x dòng)
+
+        Dùng min(a, b) = sum_k [a >= k] * [b >= k] để biến tổng min theo ký tự
+        thành vài phép nhân ma trận (mỗi mức đếm k một phép).
+        """
+        query_counts = np.zeros((len(queries), len(alphabet)), dtype=np.int16)
+        query_lengths = np.zeros(len(queries), dtype=np.int32)
+        for i, query in enumerate(queries):
+            query_lengths[i] = len(query)
+            for ch in query:
+                col = alphabet.get(ch)
+                if col is not None:
+                    query_counts[i, col] += 1
+
+        overlap = np.zeros((len(queries), len(self.keys)), dtype=np.float32)
+        levels = min(int(query_counts.max(initial=0)), int(self.counts.max(initial=0)))
+        for k in range(1, levels + 1):
+            overlap += (query_counts >= k).astype(np.float32) @ (self.counts >= k).astype(np.float32).T
+        # Query rỗng bị bỏ qua trong search_many nên không cần xử lý total = 0 như bản đơn
+        total = np.maximum(query_lengths[:, None] + self.lengths[None, :], 1)
+        return (2.0 * overlap) / total
+
+    def rows_containing(self, word):
+        """Các dòng có key chứa `word` (word phải có >= 3 ký tự)"""
+        candidates = None
+        for gram in _trigrams(word):
+            rows = self.postings.get(gram)
+            if rows is None:
+                return np.empty(0, dtype=np.int32)
+            candidates = rows if candidates is None else np.intersect1d(candidates, rows, assume_unique=True)
+            if candidates.size == 0:
+                return candidates
+        # Bước verify: trigram khớp chưa chắc đã là substring liên tiếp
+        return np.fromiter((r for r in candidates if word in self.keys[r]), dtype=np.int32)
+
+
+class FuzzyMatcher:
+    def __init__(self, name_keys, ingredient_keys):
+        """
+        Dựng index so khớp gần đúng cho danh mục thuốc
+
+        Args:
+            name_keys: Danh sách tên thuốc đã chuẩn hóa (viết thường)
+            ingredient_keys: Danh sách hoạt chất đã chuẩn hóa, cùng thứ tự với name_keys
+        """
+        name_keys = [str(k) for k in name_keys]
+        ingredient_keys = [str(k) for k in ingredient_keys]
+        if len(name_keys) != len(ingredient_keys):
+            raise ValueError("name_keys và ingredient_keys phải có cùng số dòng")
+
+        chars = set()
+        for key in name_keys + ingredient_keys:
+            chars.update(key)
+        self.alphabet = {ch: i for i, ch in enumerate(sorted(chars))}
+
+        self.size = len(name_keys)
+        self.names = _KeyField(name_keys, self.alphabet)
+        self.ingredients = _KeyField(ingredient_keys, self.alphabet)
+        logger.info(f"Built fuzzy matcher over {self.size} rows ({len(self.alphabet)} distinct chars)")
+
+    def _query_vector(self, query):
+        """Vector ký tự của query, chỉ giữ các cột có trong alphabet"""
+        counts = {}
+        for ch in query:
+            col = self.alphabet.get(ch)
+            if col is not None:
+                counts[col] = counts.get(col, 0) + 1
+        cols = np.fromiter(counts.keys(), dtype=np.intp, count=len(counts))
+        values = np.fromiter(counts.values(), dtype=np.int16, count=len(counts))
+        return cols, values
+
+    def _word_match_mask(self, query):
+        """Mask các dòng có ít nhất một từ của query nằm trong tên thuốc hoặc hoạt chất"""
+        mask = np.zeros(self.size, dtype=bool)
+        for word in query.split():
+            if len(word) >= MIN_WORD_LENGTH:
+                mask[self.names.rows_containing(word)] = True
+                mask[self.ingredients.rows_containing(word)] = True
+        return mask
+
+    def _exact_score(self, query, row, word_matched, name_bound, ingredient_bound, floor):
+        """
+        Điểm thật của một dòng - giống hệt cách tính trong vòng lặp cũ.
+        Bỏ qua ratio() của cột nào có cận trên không vượt được điểm hiện có
+        hoặc không chạm tới `floor` (dòng có điểm < floor sẽ bị loại).
+        """
+        best = WORD_MATCH_SCORE if word_matched else 0
+        if name_bound > best and name_bound >= floor:
+            best = max(best, SequenceMatcher(None, query, self.names.keys[row]).ratio())
+        if ingredient_bound > best and ingredient_bound >= floor:
+            best = max(best, SequenceMatcher(None, query, self.ingredients.keys[row]).ratio())
+        return best
+
+    def name_similarity(self, query, row):
+        """
+        Độ giống giữa cả query và cả tên/hoạt chất của dòng (không tính điểm khớp từ 0.8)
+
+        Returns:
+            float: 1.0 nếu tên hoặc hoạt chất xuất hiện nguyên vẹn (theo từ) trong query,
+                   không thì max(ratio(query, tên), ratio(query, hoạt chất))
+        """
+        padded = f" {query} "
+        keys = (self.names.keys[row], self.ingredients.keys[row])
+        if any(key and f" {key} " in padded for key in keys):
+            return 1.0
+        return max(SequenceMatcher(None, query, key).ratio() for key in keys)
+
+    def search(self, query, threshold=0.6, limit=None, accept=None):
+        """
+        Tìm các dòng có điểm tương đồng >= threshold
+
+        Điểm của một dòng = max(ratio(query, tên), ratio(query, hoạt chất),
+        0.8 nếu một từ >= 3 ký tự của query nằm trong tên/hoạt chất).
+
+        Args:
+            query: Query đã chuẩn hóa
+            threshold: Ngưỡng điểm tối thiểu (0-1)
+            limit: Số kết quả tối đa (None = trả về tất cả)
+            accept: Hàm (query, row, score) -> bool (tùy chọn); dòng bị loại không chiếm
+                    chỗ trong top `limit` (lọc trước khi cắt, không phải sau)
+
+        Returns:
+            list: Các cặp (row, score) với score làm tròn 3 chữ số,
+                  sắp xếp giảm dần theo điểm (cùng điểm thì theo thứ tự dòng)
+        """
+        if not query or self.size == 0 or (limit is not None and limit <= 0):
+            return []
+
+        cols, values = self._query_vector(query)
+        # Cận trên điểm của mọi dòng trong một lượt tính
+        name_bound = self.names.ratio_upper_bound(cols, values, len(query))
+        ingredient_bound = self.ingredients.ratio_upper_bound(cols, values, len(query))
+        return self._rank(query, name_bound, ingredient_bound, threshold, limit, accept)
+
+    def search_many(self, queries, threshold=0.6, limit=1, chunk_size=BATCH_CHUNK_SIZE, accept=None):
+        """
+        Tìm kiếm nhiều query cùng lúc (kết quả giống hệt gọi search() từng query)
+
+        Cận trên của cả lô được tính chung: ma trận đếm ký tự của các query
+        (queries x alphabet) được so với ma trận của danh mục theo từng cột ký tự,
+        cho ra ma trận cận trên (query x dòng) bằng vài phép nhân ma trận.
+
+        Args:
+            queries: Danh sách query đã chuẩn hóa
+            threshold: Ngưỡng điểm tối thiểu (0-1)
+            limit: Số kết quả tối đa cho mỗi query
+            chunk_size: Số query mỗi lô (giới hạn bộ nhớ ma trận cận trên)
+            accept: Hàm (query, row, score) -> bool (tùy chọn, xem search())
+
+        Yields:
+            list: Kết quả của từng query (như search()), theo thứ tự đầu vào
+        """
+        for start in range(0, len(queries), chunk_size):
+            chunk = queries[start:start + chunk_size]
+            name_bounds = self.names.ratio_upper_bounds(chunk, self.alphabet)
+            ingredient_bounds = self.ingredients.ratio_upper_bounds(chunk, self.alphabet)
+            for i, query in enumerate(chunk):
+                if not query or self.size == 0 or (limit is not None and limit <= 0):
+                    yield []
+                    continue
+                yield self._rank(query, name_bounds[i], ingredient_bounds[i], threshold, limit, accept)
+
+    def _rank(self, query, name_bound, ingredient_bound, threshold, limit, accept=None):
+        """Chấm điểm thật các dòng có cận trên đủ cao, trả về top `limit` dòng được accept"""
+        word_mask = self._word_match_mask(query)
+        bound = np.maximum(name_bound, ingredient_bound)
+        bound = np.where(word_mask, np.maximum(bound, WORD_MATCH_SCORE), bound)
+
+        candidates = np.flatnonzero(bound >= threshold)
+        # Duyệt theo cận trên giảm dần (cùng cận thì theo thứ tự dòng)
+        candidates = candidates[np.lexsort((candidates, -bound[candidates]))]
+
+        if limit is None:
+            matches = []
+            for row in candidates:
+                score = self._exact_score(query, row, word_mask[row],
+                                          name_bound[row], ingredient_bound[row], threshold)
+                if score >= threshold and (accept is None or accept(query, int(row), round(score, 3))):
+                    matches.append((int(row), round(score, 3)))
+            matches.sort(key=lambda m: (-m[1], m[0]))
+            return matches
+
+        # Top-k bằng min-heap: dừng khi cận trên không thể vượt phần tử nhỏ nhất trong heap
+        heap = []
+        for row in candidates:
+            if len(heap) == limit and round(bound[row], 3) < heap[0][0]:
+                break
+            # Khi heap đã đầy, dòng phải đạt ít nhất điểm nhỏ nhất trong heap (trước khi làm tròn)
+            floor = threshold if len(heap) < limit else max(threshold, heap[0][0] - 0.001)
+            score = self._exact_score(query, row, word_mask[row],
+                                      name_bound[row], ingredient_bound[row], floor)
+            if score < threshold:
+                continue
+            entry = (round(score, 3), -int(row))
+            if len(heap) == limit and entry <= heap[0]:
+                continue
+            # Chỉ gọi accept với dòng sẽ vào heap (thường là hàm tốn kém)
+            if accept is not None and not accept(query, int(row), entry[0]):
+                continue
+            if len(heap) < limit:
+                heapq.heappush(heap, entry)
+            else:
+                heapq.heapreplace(heap, entry)
+
+        return [(-neg_row, score) for score, neg_row in sorted(heap, reverse=True)]
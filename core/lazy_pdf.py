@@ -0,0 +1,193 @@
+"""
+Lazy PDF - Đọc PDF Dược thư theo từng trang, qua memory map và bảng vị trí trang
+
+`PdfReader(path)` đọc cả file PDF vào bộ nhớ (BytesIO) của mỗi worker, rồi lần
+đầu truy cập `reader.pages` thì duyệt cả cây trang và dựng PageObject cho mọi
+trang - trong khi một request chỉ cần một trang. LazyPdf thay vào đó:
+
+- memory-map file PDF (chỉ đọc): các worker dùng chung page cache của hệ điều
+  hành, chỉ phần file thực sự được đọc mới nằm trong RAM;
+- bảng vị trí trang (page offset table): số object của từng trang, dựng một
+  lần từ cây trang rồi lưu vào "<pdf>.pageoffsets.sqlite" cạnh file PDF;
+- khi cần trang i: tra bảng lấy số object, chỉ parse đúng object trang đó (và
+  các node cha để lấy thuộc tính kế thừa như /Resources).
+
+Không mở file hay parse gì khi khởi tạo; số trang chỉ cần đọc bảng.
+"""
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+
+from .page_text_store import pdf_fingerprint
+
+logger = logging.getLogger(__name__)
+
+TABLE_SUFFIX = '.pageoffsets.sqlite'
+SCHEMA_VERSION = '1'
+
+# Thuộc tính trang có thể kế thừa từ node /Pages cha (PDF 1.7, 7.7.3.4)
+INHERITABLE_PAGE_ATTRIBUTES = ('/Resources', '/MediaBox', '/CropBox', '/Rotate')
+
+
+def default_table_path(pdf_path):
+    """Đường dẫn bảng vị trí trang mặc định, cạnh file PDF: "<pdf>.pageoffsets.sqlite" """
+    return os.path.splitext(pdf_path)[0] + TABLE_SUFFIX
+
+
+def _load_table(table_path, fingerprint):
+    """Bảng (object_number, generation) theo thứ tự trang, None nếu không có/hỏng/đã cũ"""
+    if not os.path.exists(table_path):
+        return None
+    try:
+        conn = sqlite3.connect(f"file:{table_path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            refs = conn.execute(
+                "SELECT object_number, generation FROM pages ORDER BY page_index").fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Cannot open page offset table {table_path}: {e}")
+        return None
+    if meta.get('schema_version') != SCHEMA_VERSION or (
+            fingerprint is not None and fingerprint != meta.get('source_fingerprint')):
+        logger.warning(f"Page offset table {table_path} is stale, rebuilding")
+        return None
+    return refs
+
+
+def _save_table(table_path, refs, offsets, fingerprint):
+    """Ghi bảng (file tạm rồi đổi tên); thư mục chỉ đọc (vd: serverless) thì bỏ qua"""
+    tmp_path = table_path + '.tmp'
+    try:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE pages (page_index INTEGER PRIMARY KEY, object_number INTEGER NOT NULL, "
+                         "generation INTEGER NOT NULL, byte_offset INTEGER)")
+            conn.executemany("INSERT INTO pages VALUES (?, ?, ?, ?)", [
+                (page_index, object_number, generation, offsets.get((object_number, generation)))
+                for page_index, (object_number, generation) in enumerate(refs)
+            ])
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('source_fingerprint', fingerprint or ''),
+                ('page_count', str(len(refs))),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, table_path)
+        logger.info(f"Saved page offset table {table_path} ({len(refs)} pages)")
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Cannot save page offset table {table_path}: {e}")
+
+
+class LazyPdf:
+    def __init__(self, pdf_path, table_path=None):
+        """
+        Args:
+            pdf_path: Đường dẫn PDF
+            table_path: Bảng vị trí trang (mặc định default_table_path(pdf_path));
+                        chưa có hoặc đã cũ thì dựng lại ở lần truy cập đầu tiên
+        """
+        self.pdf_path = pdf_path
+        self.table_path = table_path or default_table_path(pdf_path)
+        self._refs = None
+        self._file = None
+        self._mmap = None
+        self._reader = None
+        # PdfReader đọc tuần tự trên một stream (seek/read) nên truy cập phải tuần tự
+        self._lock = threading.RLock()
+
+    def _open_reader(self):
+        """PdfReader trên memory map của file (chỉ parse xref/trailer, chưa đụng tới trang nào)"""
+        if self._reader is None:
+            from pypdf import PdfReader
+
+            self._file = open(self.pdf_path, 'rb')
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._reader = PdfReader(self._mmap)
+        return self._reader
+
+    def _page_refs(self):
+        """(object_number, generation) của từng trang: đọc bảng, chưa có thì duyệt cây trang một lần"""
+        if self._refs is None:
+            with self._lock:
+                if self._refs is None:
+                    fingerprint = pdf_fingerprint(self.pdf_path)
+                    refs = _load_table(self.table_path, fingerprint)
+                    if refs is None:
+                        refs = self._build_refs(fingerprint)
+                    self._refs = refs
+        return self._refs
+
+    def _build_refs(self, fingerprint):
+        reader = self._open_reader()
+        refs = [(page.indirect_reference.idnum, page.indirect_reference.generation) for page in reader.pages]
+        # Vị trí byte của object trang (None nếu nằm trong object stream) - để debug/kiểm tra
+        offsets = {(idnum, generation): offset
+                   for generation, entries in reader.xref.items() for idnum, offset in entries.items()}
+        _save_table(self.table_path, refs, offsets, fingerprint)
+        # Đã duyệt cả cây trang: bỏ các trang đã dựng để không giữ chúng trong bộ nhớ
+        reader.flattened_pages = None
+        reader.resolved_objects.clear()
+        return refs
+
+    def __len__(self):
+        return len(self._page_refs())
+
+    def page(self, page_index):
+        """
+        PageObject (pypdf) của trang `page_index` (từ 0), chỉ parse object của trang đó
+
+        Raises:
+            IndexError: page_index ngoài phạm vi
+        """
+        from pypdf import PageObject
+        from pypdf.generic import IndirectObject, NameObject
+
+        refs = self._page_refs()
+        if page_index < 0 or page_index >= len(refs):
+            raise IndexError(f"Page index {page_index} out of range (0-{len(refs) - 1})")
+        object_number, generation = refs[page_index]
+        with self._lock:
+            reader = self._open_reader()
+            page = PageObject(reader, IndirectObject(object_number, generation, reader))
+            page.update(page.indirect_reference.get_object())
+            # Thuộc tính kế thừa từ các node /Pages cha (node gần nhất được ưu tiên)
+            missing = [attr for attr in INHERITABLE_PAGE_ATTRIBUTES if attr not in page]
+            parent = page.get('/Parent')
+            while missing and parent is not None:
+                node = parent.get_object()
+                for attr in list(missing):
+                    if attr in node:
+                        page[NameObject(attr)] = node[attr]
+                        missing.remove(attr)
+                parent = node.get('/Parent')
+        return page
+
+    def page_text(self, page_index):
+        """Text của trang bằng pypdf (cùng kết quả với PdfReader(path).pages[i].extract_text())"""
+        with self._lock:
+            return self.page(page_index).extract_text()
+
+    def release(self):
+        """Bỏ cache các object đã parse (trang, content stream, font...) - dùng khi duyệt nhiều trang"""
+        with self._lock:
+            if self._reader is not None:
+                self._reader.resolved_objects.clear()
+
+    def close(self):
+        with self._lock:
+            self._reader = None
+            if self._mmap is not None:
+                self._mmap.close()
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
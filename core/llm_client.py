@@ -0,0 +1,296 @@
+"""
+LLM Client - Lớp gọi LLM dùng lâu dài, có thể thay thế (Gemini thật hoặc model giả lập ở local)
+
+Mọi client có cùng interface generate(prompt) -> str (text trả lời). Phần
+prompt/hậu xử lý nằm ở core/drug_summarizer.py, nên job tổng hợp trước
+(Crawldata/presummarize_monographs.py) và test có thể chạy với StubLLMClient
+- không cần mạng hay API key.
+
+Client được tạo một lần cho cả process (client_from_env) thay vì mỗi request:
+- Gemini: genai.configure một lần, model chạy được được xác định ở lần gọi
+  đầu rồi giữ lại (cùng GenerativeModel, dùng lại kết nối của nó) - không dò
+  lại chuỗi model dự phòng mỗi request. google-generativeai 0.3.x không nhận
+  request_options, nên timeout được áp bằng cách chạy lời gọi trong thread
+  pool riêng của client và chờ kết quả tối đa timeout giây;
+- mỗi lần gọi có timeout, và semaphore giới hạn số lần gọi đồng thời (vượt
+  quá thì chờ tối đa bằng timeout rồi báo TimeoutError);
+- LLM_CLIENT=stub: model giả lập xác định (deterministic), có độ trễ giả lập,
+  để load test /api/scan mà không cần mạng.
+
+Số token prompt của từng lần gọi được ghi lại (ước tính, và số Gemini báo
+về trong usage_metadata nếu có) để đo chi phí/độ trễ theo kích thước prompt.
+"""
+import concurrent.futures
+import json
+import logging
+import os
+import re
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Thứ tự model thử ở lần gọi đầu (model không tồn tại/không dùng được thì thử model sau)
+GEMINI_MODELS = ('gemini-2.0-flash-exp', 'gemini-2.0-flash', 'gemini-1.5-flash')
+DEFAULT_TIMEOUT_SECONDS = float(os.getenv('LLM_TIMEOUT', 30))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 8))
+# Số ký tự trung bình mỗi token với text tiếng Việt có dấu (ước tính, không cần gọi API đếm token)
+CHARS_PER_TOKEN = 3
+
+
+def estimate_tokens(text):
+    """Số token ước tính của text (làm tròn lên)"""
+    return -(-len(text or '') // CHARS_PER_TOKEN)
+
+
+class LLMClient:
+    """Interface chung (timeout, semaphore, thống kê); lớp con cài đặt _generate"""
+
+    name = None
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT_SECONDS, max_concurrency=DEFAULT_MAX_CONCURRENCY):
+        """
+        Args:
+            timeout: Thời gian tối đa (giây) của một lần gọi, kể cả thời gian chờ semaphore
+            max_concurrency: Số lần gọi đồng thời tối đa
+        """
+        if max_concurrency <= 0:
+            raise ValueError("max_concurrency phải > 0")
+        self.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._stats_lock = threading.Lock()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+        self.in_flight = 0
+        self.total_seconds = 0.0
+        self.prompt_tokens = 0
+        self.max_prompt_tokens = 0
+
+    def generate(self, prompt):
+        """
+        Text trả lời của LLM cho prompt
+
+        Raises:
+            TimeoutError: Chờ semaphore quá timeout (quá nhiều lần gọi đồng thời) hoặc gọi quá timeout
+            Exception: Lỗi gọi model (mạng, quota...)
+        """
+        if not self._semaphore.acquire(timeout=self.timeout):
+            with self._stats_lock:
+                self.rejected += 1
+            raise TimeoutError(f"LLM client busy: {self.max_concurrency} calls in flight for {self.timeout}s")
+        start = time.monotonic()
+        prompt_tokens = estimate_tokens(prompt)
+        with self._stats_lock:
+            self.calls += 1
+            self.in_flight += 1
+            self.prompt_tokens += prompt_tokens
+            self.max_prompt_tokens = max(self.max_prompt_tokens, prompt_tokens)
+        try:
+            return self._generate(prompt)
+        except Exception:
+            with self._stats_lock:
+                self.failures += 1
+            raise
+        finally:
+            elapsed = time.monotonic() - start
+            with self._stats_lock:
+                self.in_flight -= 1
+                self.total_seconds += elapsed
+            self._semaphore.release()
+            logger.debug(f"{self.name} call: ~{prompt_tokens} prompt tokens, {elapsed:.2f}s")
+
+    def _generate(self, prompt):
+        raise NotImplementedError
+
+    def stats(self):
+        """Thống kê số lần gọi/lỗi/thời gian để theo dõi tải LLM"""
+        with self._stats_lock:
+            return {
+                'client': self.name,
+                'calls': self.calls,
+                'failures': self.failures,
+                'rejected': self.rejected,
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'avg_seconds': round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+                'prompt_tokens': self.prompt_tokens,
+                'avg_prompt_tokens': round(self.prompt_tokens / self.calls) if self.calls else 0,
+                'max_prompt_tokens': self.max_prompt_tokens,
+            }
+
+
+class GeminiClient(LLMClient):
+    """Google Gemini qua google.generativeai, model được xác định một lần rồi dùng lại"""
+
+    name = 'gemini'
+
+    def __init__(self, api_key, models=GEMINI_MODELS, **kwargs):
+        """
+        Args:
+            api_key: GEMINI_API_KEY
+            models: Tên model theo thứ tự ưu tiên
+        """
+        super().__init__(**kwargs)
+        self.api_key = api_key
+        self.models = tuple(models)
+        self.model_name = None
+        self._model = None
+        self._configured = False
+        self._resolve_lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix='gemini')
+        # Số token prompt Gemini báo về (usage_metadata), để đối chiếu với số ước tính
+        self.reported_prompt_tokens = 0
+
+    def _text(self, response):
+        """Text trả lời, ghi lại số token prompt Gemini tính cho lần gọi"""
+        usage = getattr(response, 'usage_metadata', None)
+        prompt_tokens = getattr(usage, 'prompt_token_count', None)
+        if prompt_tokens:
+            with self._stats_lock:
+                self.reported_prompt_tokens += prompt_tokens
+        return response.text
+
+    def _call(self, model, prompt):
+        """
+        Gọi model.generate_content trong thread pool, chờ tối đa timeout giây
+
+        Lời gọi quá hạn vẫn chạy nốt trong thread của pool (không huỷ được), nhưng
+        caller không phải chờ nó.
+
+        Raises:
+            TimeoutError: Model không trả lời trong timeout giây
+        """
+        future = self._executor.submit(model.generate_content, prompt)
+        try:
+            response = future.result(timeout=self.timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"Gemini call exceeded {self.timeout}s")
+        return self._text(response)
+
+    def _generate(self, prompt):
+        model = self._model
+        if model is None:
+            return self._generate_resolving(prompt)
+        return self._call(model, prompt)
+
+    def _generate_resolving(self, prompt):
+        """Lần gọi đầu: thử lần lượt các model, giữ lại model đầu tiên trả lời được"""
+        import google.generativeai as genai
+
+        with self._resolve_lock:
+            if self._model is not None:
+                model = self._model
+            else:
+                if not self._configured:
+                    genai.configure(api_key=self.api_key)
+                    self._configured = True
+                for position, model_name in enumerate(self.models):
+                    try:
+                        model = genai.GenerativeModel(model_name)
+                        text = self._call(model, prompt)
+                    except Exception as e:
+                        # Model không tồn tại, không có quyền, quá hạn... - thử model sau
+                        if position + 1 == len(self.models):
+                            raise
+                        logger.warning(f"Cannot use {model_name}, trying {self.models[position + 1]}: {e}")
+                        continue
+                    self._model, self.model_name = model, model_name
+                    logger.info(f"Using Gemini model {model_name}")
+                    return text
+        return self._call(model, prompt)
+
+    def stats(self):
+        stats = super().stats()
+        stats['model'] = self.model_name
+        stats['reported_prompt_tokens'] = self.reported_prompt_tokens
+        return stats
+
+
+class StubLLMClient(LLMClient):
+    """
+    Model giả lập, trả lời xác định (deterministic) theo tên thuốc trong prompt
+
+    Dùng cho test, chạy thử job và load test /api/scan mà không gọi mạng; có thể giả lập
+    độ trễ (quá timeout thì báo TimeoutError như model thật) và lỗi định kỳ để kiểm tra
+    retry, rate limit.
+    """
+
+    name = 'stub'
+
+    _DRUG_NAME = re.compile(r'- Tên thuốc: (.*)')
+
+    def __init__(self, latency=0.0, fail_every=0, **kwargs):
+        """
+        Args:
+            latency: Thời gian (giây) mỗi lần gọi
+            fail_every: Cứ mỗi fail_every lần gọi thì raise một lần (0 = không lỗi)
+        """
+        super().__init__(**kwargs)
+        self.latency = latency
+        self.fail_every = fail_every
+        self._call_number = 0
+        self._lock = threading.Lock()
+
+    def _generate(self, prompt):
+        with self._lock:
+            self._call_number += 1
+            call = self._call_number
+        if self.latency:
+            if self.timeout is not None and self.latency > self.timeout:
+                time.sleep(self.timeout)
+                raise TimeoutError(f"Stub LLM call {call} exceeded {self.timeout}s")
+            time.sleep(self.latency)
+        if self.fail_every and call % self.fail_every == 0:
+            raise RuntimeError(f"Stub LLM failure on call {call}")
+        match = self._DRUG_NAME.search(prompt)
+        drug_name = match.group(1).strip() if match else 'thuốc'
+        return json.dumps({
+            'usage': f"Dùng {drug_name} theo đúng liều ghi trong dược thư, uống sau bữa ăn.",
+            'notes': f"Không dùng {drug_name} khi có tiền sử dị ứng với thành phần của thuốc.",
+        }, ensure_ascii=False)
+
+
+LLM_CLIENTS = {
+    GeminiClient.name: GeminiClient,
+    StubLLMClient.name: StubLLMClient,
+}
+
+
+def create_llm_client(name, **kwargs):
+    """
+    Tạo LLM client theo tên ('gemini' lấy API key từ GEMINI_API_KEY nếu không truyền)
+
+    Raises:
+        ValueError: Tên không có trong LLM_CLIENTS hoặc thiếu API key cho Gemini
+    """
+    client_class = LLM_CLIENTS.get(name)
+    if client_class is None:
+        raise ValueError(f"Unknown LLM client {name!r}, expected one of {sorted(LLM_CLIENTS)}")
+    if client_class is GeminiClient:
+        kwargs.setdefault('api_key', os.getenv('GEMINI_API_KEY'))
+        if not kwargs['api_key']:
+            raise ValueError("GEMINI_API_KEY is not configured")
+    return client_class(**kwargs)
+
+
+def client_from_env():
+    """
+    LLM client dùng chung cho cả process, cấu hình theo biến môi trường:
+    LLM_CLIENT ('gemini' mặc định, 'stub' = model giả lập), GEMINI_API_KEY, LLM_TIMEOUT,
+    LLM_MAX_CONCURRENCY, LLM_STUB_LATENCY (giây, chỉ cho stub)
+
+    Returns:
+        LLMClient hoặc None (Gemini nhưng chưa cấu hình GEMINI_API_KEY)
+
+    Raises:
+        ValueError: LLM_CLIENT không có trong LLM_CLIENTS
+    """
+    name = os.getenv('LLM_CLIENT', GeminiClient.name)
+    if name == GeminiClient.name and not os.getenv('GEMINI_API_KEY'):
+        return None
+    options = {'latency': float(os.getenv('LLM_STUB_LATENCY', 0))} if name == StubLLMClient.name else {}
+    return create_llm_client(name, **options)
@@ -0,0 +1,242 @@
+"""
+Monograph Spans - Vị trí bắt đầu/kết thúc của từng chuyên luận trong PDF Dược thư
+
+Một trang PDF thường chứa phần cuối chuyên luận trước và phần đầu chuyên luận
+sau, còn một chuyên luận dài có thể trải qua nhiều trang. Index này quét text
+toàn bộ PDF một lần (build step, xem Crawldata/build_monograph_spans.py) và
+ghi lại mỗi chuyên luận từ dòng tiêu đề tới tiêu đề kế tiếp dưới dạng
+(start_page, start_offset, end_page, end_offset) - offset là vị trí ký tự
+trong text trang (cùng extractor với page text store).
+
+Dòng tiêu đề: dòng ngắn viết hoa toàn bộ (vd: "CEFACLOR"), ngay sau đó (trong
+vài dòng) là "Tên chung quốc tế" / "Mã ATC" / "Loại thuốc" như mọi chuyên luận
+trong Dược thư. Nhờ điều kiện này, tiêu đề chạy ở đầu trang không bị nhận nhầm.
+"""
+import bisect
+import logging
+import os
+import sqlite3
+
+from .page_text_store import pdf_fingerprint
+from .text_utils import fold_key
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.spans.sqlite'
+SCHEMA_VERSION = '1'
+
+# Dòng mở đầu chuyên luận, ngay sau tiêu đề (đã bỏ dấu, viết thường)
+TITLE_FOLLOWERS = ('ten chung quoc te', 'ma atc', 'loai thuoc')
+# Số dòng (không rỗng) sau tiêu đề được xét để tìm TITLE_FOLLOWERS
+TITLE_LOOKAHEAD = 3
+MAX_TITLE_LENGTH = 80
+# Khoảng cách tối đa (số trang) giữa trang dự kiến và chuyên luận tìm được
+MAX_PAGE_DISTANCE = 30
+
+
+def default_index_path(pdf_path):
+    """Đường dẫn index mặc định, cạnh file PDF: "<pdf>.spans.sqlite" """
+    return os.path.splitext(pdf_path)[0] + INDEX_SUFFIX
+
+
+def _is_title_line(line):
+    """Dòng ngắn, có chữ và viết hoa toàn bộ"""
+    return 1 < len(line) <= MAX_TITLE_LENGTH and line == line.upper() and line != line.lower()
+
+
+def find_titles(pages):
+    """
+    Tìm các dòng tiêu đề chuyên luận trong text các trang
+
+    Args:
+        pages: Iterable text từng trang theo thứ tự (index từ 0)
+
+    Returns:
+        list: (title, page_index, offset) theo thứ tự xuất hiện
+    """
+    # Duyệt các dòng của cả tài liệu như một dòng chảy (tiêu đề ở cuối trang, dòng kế ở trang sau)
+    lines = []  # (stripped line, page_index, offset của dòng)
+    for page_index, text in enumerate(pages):
+        offset = 0
+        for raw in (text or '').split('\n'):
+            stripped = raw.strip()
+            if stripped:
+                lines.append((stripped, page_index, offset + raw.index(stripped[0])))
+            offset += len(raw) + 1
+
+    titles = []
+    for position, (line, page_index, offset) in enumerate(lines):
+        if not _is_title_line(line):
+            continue
+        for next_line, _, _ in lines[position + 1:position + 1 + TITLE_LOOKAHEAD]:
+            if fold_key(next_line).startswith(TITLE_FOLLOWERS):
+                titles.append((line, page_index, offset))
+                break
+            if _is_title_line(next_line):
+                # Dòng viết hoa kế tiếp mới là tiêu đề (dòng này là tiêu đề chạy đầu trang...)
+                break
+    return titles
+
+
+class MonographSpan:
+    """Một chuyên luận: tiêu đề và vị trí [start, end) trong text các trang"""
+
+    __slots__ = ('title', 'title_key', 'start_page', 'start_offset', 'end_page', 'end_offset')
+
+    def __init__(self, title, start_page, start_offset, end_page, end_offset):
+        self.title = title
+        self.title_key = fold_key(title)
+        self.start_page = start_page
+        self.start_offset = start_offset
+        self.end_page = end_page
+        # None = tới hết trang end_page
+        self.end_offset = end_offset
+
+    def __repr__(self):
+        return (f"MonographSpan({self.title!r}, {self.start_page}:{self.start_offset}"
+                f" -> {self.end_page}:{self.end_offset})")
+
+    def extract(self, get_page_text):
+        """
+        Ghép text của chuyên luận từ các trang
+
+        Args:
+            get_page_text: Hàm nhận index trang, trả về text trang (vd: get_pdf_page_text)
+        """
+        parts = []
+        for page_index in range(self.start_page, self.end_page + 1):
+            text = get_page_text(page_index) or ''
+            start = self.start_offset if page_index == self.start_page else 0
+            end = self.end_offset if page_index == self.end_page else None
+            parts.append(text[start:end])
+        return '\n'.join(part.strip('\n') for part in parts).strip()
+
+
+class MonographSpanIndex:
+    def __init__(self, spans, source_fingerprint=None):
+        """
+        Args:
+            spans: Danh sách MonographSpan theo thứ tự trong PDF
+            source_fingerprint: Dấu vân tay PDF nguồn
+        """
+        self.spans = tuple(spans)
+        self.source_fingerprint = source_fingerprint
+        by_title = {}
+        for span in self.spans:
+            by_title.setdefault(span.title_key, []).append(span)
+        self._by_title = by_title
+        self._starts = [(span.start_page, span.start_offset) for span in self.spans]
+
+    @classmethod
+    def from_pages(cls, pages, source_fingerprint=None):
+        """Dựng index từ text các trang (chuyên luận kéo dài tới tiêu đề kế tiếp / hết tài liệu)"""
+        pages = list(pages)
+        titles = find_titles(pages)
+        spans = []
+        for position, (title, page_index, offset) in enumerate(titles):
+            if position + 1 < len(titles):
+                _, end_page, end_offset = titles[position + 1]
+                if end_offset == 0 and end_page > page_index:
+                    # Tiêu đề kế tiếp ở đầu trang: chuyên luận kết thúc ở hết trang trước
+                    end_page, end_offset = end_page - 1, None
+            else:
+                end_page, end_offset = len(pages) - 1, None
+            spans.append(MonographSpan(title, page_index, offset, end_page, end_offset))
+        logger.info(f"Found {len(spans)} monographs in {len(pages)} pages")
+        return cls(spans, source_fingerprint)
+
+    def save(self, index_path):
+        """Ghi index ra SQLite (file tạm rồi đổi tên)"""
+        tmp_path = index_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE spans (title TEXT NOT NULL, start_page INTEGER NOT NULL, "
+                         "start_offset INTEGER NOT NULL, end_page INTEGER NOT NULL, end_offset INTEGER)")
+            conn.executemany("INSERT INTO spans VALUES (?, ?, ?, ?, ?)", [
+                (span.title, span.start_page, span.start_offset, span.end_page, span.end_offset)
+                for span in self.spans
+            ])
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('source_fingerprint', self.source_fingerprint or ''),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, index_path)
+        logger.info(f"Saved {len(self.spans)} monograph spans to {index_path}")
+
+    @classmethod
+    def load(cls, index_path):
+        """Đọc index từ SQLite (toàn bộ vào bộ nhớ - vài nghìn dòng)"""
+        conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get('schema_version') != SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"schema {meta.get('schema_version')}, expected {SCHEMA_VERSION}")
+            rows = conn.execute("SELECT title, start_page, start_offset, end_page, end_offset "
+                                "FROM spans ORDER BY start_page, start_offset").fetchall()
+        finally:
+            conn.close()
+        return cls([MonographSpan(*row) for row in rows], meta.get('source_fingerprint'))
+
+    @classmethod
+    def open_for(cls, pdf_path, index_path=None):
+        """
+        Load index của PDF nếu có và còn khớp với PDF (PDF không có thì vẫn dùng index)
+
+        Returns:
+            MonographSpanIndex hoặc None (không có index, index hỏng hoặc đã cũ)
+        """
+        index_path = index_path or default_index_path(pdf_path)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            index = cls.load(index_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open monograph span index {index_path}: {e}")
+            return None
+        fingerprint = pdf_fingerprint(pdf_path)
+        if fingerprint is not None and fingerprint != index.source_fingerprint:
+            logger.warning(f"Monograph span index {index_path} is stale for {pdf_path}, rebuild it")
+            return None
+        return index
+
+    def find(self, title, page_index):
+        """
+        Chuyên luận có tiêu đề khớp `title` (vd: hoạt chất) gần trang `page_index` nhất
+
+        Returns:
+            MonographSpan hoặc None
+        """
+        key = fold_key(title)
+        candidates = self._by_title.get(key)
+        if not candidates and key:
+            # Hoạt chất kèm tên muối/dạng ("Cetirizin hydroclorid") - tiêu đề là một phần của nó hoặc ngược lại
+            low = bisect.bisect_left(self._starts, (page_index - MAX_PAGE_DISTANCE, 0))
+            high = bisect.bisect_right(self._starts, (page_index + MAX_PAGE_DISTANCE + 1, 0))
+            candidates = [span for span in self.spans[low:high]
+                          if span.title_key in key or key in span.title_key]
+        if not candidates:
+            return None
+        best = min(candidates, key=lambda span: self._page_distance(span, page_index))
+        if self._page_distance(best, page_index) > MAX_PAGE_DISTANCE:
+            return None
+        return best
+
+    @staticmethod
+    def _page_distance(span, page_index):
+        if span.start_page <= page_index <= span.end_page:
+            return 0
+        return min(abs(span.start_page - page_index), abs(span.end_page - page_index))
+
+    def at(self, page_index, offset=0):
+        """Chuyên luận chứa vị trí (page_index, offset), None nếu trước chuyên luận đầu tiên"""
+        position = bisect.bisect_right(self._starts, (page_index, offset)) - 1
+        return self.spans[position] if position >= 0 else None
+
+    def __len__(self):
+        return len(self.spans)
@@ -0,0 +1,198 @@
+"""
+Monograph Table - Các trường có cấu trúc của từng chuyên luận, parse sẵn vào SQLite
+
+Thành phần, chỉ định, chống chỉ định, liều dùng, cách dùng được parse một lần
+cho mọi chuyên luận trong danh mục (build step, xem
+Crawldata/build_monograph_table.py) và ghi thành bảng có cột riêng cho từng
+trường, khóa chính là monograph_id (xem drug_catalog.monograph_key). Khi có
+bảng, /api/scan chỉ tra theo khóa - không còn đọc trang PDF hay parse trong
+request.
+
+Request và build dùng chung read_monograph_text/parse_monograph_details nên
+kết quả tra bảng giống hệt parse trực tiếp. Bảng ghi kèm dấu vân tay PDF nguồn
+và phiên bản parser; đổi một trong hai thì bảng bị coi là cũ.
+"""
+import logging
+import os
+import sqlite3
+import threading
+
+from .page_offset_map import PageOffsetMap
+from .page_text_store import pdf_fingerprint
+from .section_tokenizer import find_sections
+
+logger = logging.getLogger(__name__)
+
+TABLE_SUFFIX = '.monographs.sqlite'
+SCHEMA_VERSION = '1'
+# Tăng khi đổi cách parse (tiêu đề mục, giới hạn độ dài...) để bảng cũ bị dựng lại
+PARSER_VERSION = '1'
+
+DETAIL_FIELDS = ('composition', 'indications', 'contraindications', 'dosage', 'usage')
+MAX_FIELD_LENGTH = 500
+_DEFAULT_PAGE_MAP = PageOffsetMap.constant()
+
+
+def default_table_path(pdf_path):
+    """Đường dẫn bảng mặc định, cạnh file PDF: "<pdf>.monographs.sqlite" """
+    return os.path.splitext(pdf_path)[0] + TABLE_SUFFIX
+
+
+def read_monograph_text(page_number, get_page_text, page_count, span=None, page_map=None):
+    """
+    Text của chuyên luận: đúng đoạn `span` nếu có, không thì cả trang sách `page_number`
+
+    Args:
+        page_number: Số trang sách (trong CSV)
+        get_page_text: Hàm nhận index trang PDF, trả về text trang
+        page_count: Số trang PDF
+        span: MonographSpan (xem monograph_spans) hoặc None
+        page_map: PageOffsetMap đã hiệu chỉnh (None = độ lệch mặc định, xem page_offset_map)
+
+    Returns:
+        str: Text ('' nếu trang ngoài phạm vi)
+
+    Raises:
+        ValueError: page_number không phải số
+    """
+    if span is not None:
+        # Ghép từ các trang nếu chuyên luận trải qua nhiều trang
+        return span.extract(get_page_text)
+
+    # Chuyển số trang sách thành index PDF (đánh số từ 0) theo bản đồ độ lệch
+    pdf_page_index = (page_map or _DEFAULT_PAGE_MAP).to_pdf_index(page_number)
+    if pdf_page_index < 0 or pdf_page_index >= page_count:
+        return ''
+    return get_page_text(pdf_page_index) or ''
+
+
+def parse_monograph_details(text):
+    """
+    Tách các trường có cấu trúc từ text chuyên luận (hoặc cả trang)
+
+    Returns:
+        dict: DETAIL_FIELDS (tối đa MAX_FIELD_LENGTH ký tự) + 'full_text'
+    """
+    sections = find_sections(text)
+    details = {field: sections.get(field, '')[:MAX_FIELD_LENGTH] for field in DETAIL_FIELDS}
+
+    # Không có mục "Cách dùng" thì dùng "Liều dùng" và ngược lại
+    if not details['usage'] and details['dosage']:
+        details['usage'] = details['dosage']
+    elif not details['dosage'] and details['usage']:
+        details['dosage'] = details['usage']
+
+    details['full_text'] = text
+    return details
+
+
+class MonographTable:
+    def __init__(self, table_path):
+        """
+        Mở bảng đã dựng (chỉ đọc)
+
+        Args:
+            table_path: Đường dẫn file SQLite
+
+        Raises:
+            sqlite3.Error: File không phải bảng hợp lệ
+        """
+        self.table_path = table_path
+        self._conn = sqlite3.connect(f"file:{table_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.schema_version = meta.get('schema_version')
+        self.parser_version = meta.get('parser_version')
+        self.source_fingerprint = meta.get('source_fingerprint')
+        self.monograph_count = int(meta.get('monograph_count', 0))
+
+    @staticmethod
+    def build(table_path, rows, source_fingerprint=None):
+        """
+        Ghi bảng từ các chuyên luận đã parse (file tạm rồi đổi tên)
+
+        Args:
+            table_path: Đường dẫn file SQLite
+            rows: Iterable (monograph_id, page_number, title, details) - details từ parse_monograph_details
+            source_fingerprint: Dấu vân tay PDF nguồn (xem pdf_fingerprint)
+
+        Returns:
+            int: Số chuyên luận đã ghi
+        """
+        tmp_path = table_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE monographs (monograph_id TEXT PRIMARY KEY, page_number INTEGER, "
+                         "title TEXT NOT NULL, "
+                         + ', '.join(f"{field} TEXT NOT NULL" for field in DETAIL_FIELDS)
+                         + ", full_text TEXT NOT NULL)")
+            placeholders = ', '.join('?' * (len(DETAIL_FIELDS) + 4))
+            count = 0
+            for monograph_id, page_number, title, details in rows:
+                conn.execute(f"INSERT OR REPLACE INTO monographs VALUES ({placeholders})", (
+                    monograph_id, page_number, title or '',
+                    *(details.get(field, '') for field in DETAIL_FIELDS),
+                    details.get('full_text', ''),
+                ))
+                count += 1
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('parser_version', PARSER_VERSION),
+                ('source_fingerprint', source_fingerprint or ''),
+                ('monograph_count', str(count)),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, table_path)
+        logger.info(f"Built monograph table {table_path} ({count} monographs)")
+        return count
+
+    @classmethod
+    def open_for(cls, pdf_path, table_path=None):
+        """
+        Mở bảng của PDF nếu có và còn khớp với PDF + parser hiện tại (PDF không có thì vẫn dùng bảng)
+
+        Returns:
+            MonographTable hoặc None (không có bảng, bảng hỏng hoặc đã cũ)
+        """
+        table_path = table_path or default_table_path(pdf_path)
+        if not os.path.exists(table_path):
+            return None
+        try:
+            table = cls(table_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open monograph table {table_path}: {e}")
+            return None
+        fingerprint = pdf_fingerprint(pdf_path)
+        if (table.schema_version != SCHEMA_VERSION or table.parser_version != PARSER_VERSION
+                or (fingerprint is not None and fingerprint != table.source_fingerprint)):
+            logger.warning(f"Monograph table {table_path} is stale for {pdf_path}, rebuild it")
+            table.close()
+            return None
+        return table
+
+    def get(self, monograph_id):
+        """
+        Các trường đã parse của chuyên luận
+
+        Returns:
+            dict: DETAIL_FIELDS + 'full_text' (bản mới mỗi lần gọi), None nếu không có trong bảng
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(DETAIL_FIELDS)}, full_text FROM monographs WHERE monograph_id = ?",
+                (monograph_id,)).fetchone()
+        if row is None:
+            return None
+        return dict(zip(DETAIL_FIELDS + ('full_text',), row))
+
+    def __len__(self):
+        return self.monograph_count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,265 @@
+"""
+OCR Resolver - Chọn thuốc từ tất cả text region OCR cùng lúc
+
+Thay cho việc chọn trước một text rồi thử lần lượt từng text khác (dừng ở
+kết quả đầu tiên), mọi region được chấm điểm với catalog trong một lượt:
+- Chất lượng khớp: exact tên thuốc, fuzzy (FuzzyMatcher.search_many cho cả
+  lô text) và index lỗi OCR, lấy điểm cao nhất
+- Độ tin cậy OCR của region
+- Hình học: gần tâm ảnh và chữ to thì nhiều khả năng là tên thuốc
+
+Kết quả là thuốc tốt nhất kèm các phương án dự phòng (runners-up).
+
+Text thường trên vỏ hộp ("Sản xuất tại Việt Nam", "Box of 20 tablets") hay
+khớp một từ với tên thuốc không liên quan, nên khớp một từ (fuzzy 0.8 hoặc
+index lỗi OCR theo từ) chỉ được tính khi cả text cũng giống cả tên thuốc; và
+caller chỉ tin kết quả resolver khi confident_candidate() đạt ngưỡng, không thì
+tra theo cách cũ (search_drug_in_database).
+"""
+import logging
+
+from .fuzzy_matcher import WORD_MATCH_SCORE
+from .text_utils import normalize_query
+
+logger = logging.getLogger(__name__)
+
+# Trọng số điểm tổng hợp
+MATCH_WEIGHT = 0.6
+CONFIDENCE_WEIGHT = 0.25
+GEOMETRY_WEIGHT = 0.15
+
+# Diện tích (tỉ lệ so với ảnh) được coi là chữ to tối đa - thường là tên thuốc trên hộp
+LARGE_TEXT_AREA = 0.05
+# Điểm khớp tối thiểu để một region được xét
+MIN_MATCH_SCORE = 0.6
+# Khớp một từ chỉ được tính khi cả text giống cả tên/hoạt chất ít nhất mức này (FuzzyMatcher.name_similarity)
+MIN_NAME_SIMILARITY = 0.6
+# Ngưỡng để tin thuốc tốt nhất mà không tra lại: điểm khớp và khoảng cách điểm với thuốc thứ hai
+CONFIDENT_MATCH_SCORE = 0.85
+CONFIDENT_MARGIN = 0.05
+# Điểm khớp khi text chỉ khác tên thuốc bởi lỗi OCR (trừ 0.1 cho mỗi lỗi khác)
+OCR_SPELL_SCORE = 0.95
+OCR_SPELL_WORD_SCORE = 0.8
+# Số thuốc tối đa lấy từ fuzzy cho mỗi region
+MATCHES_PER_REGION = 3
+MIN_REGION_LENGTH = 3
+
+MATCH_EXACT = 'exact'
+MATCH_FUZZY = 'fuzzy'
+MATCH_OCR_SPELL = 'ocr_spell'
+
+# Từ thông thường trên vỏ hộp (không phải tên thuốc), viết thường
+OCR_COMMON_WORDS = frozenset({
+    'arthritis', 'pain', 'relief', 'fever', 'reducer', 'temporary', 'minor',
+    'tablets', 'caplets', 'mg', 'each', 'extended', 'release', 'acetaminophen',
+    'ibuprofen', 'aspirin', 'do', 'not', 'use', 'with', 'other', 'medicines',
+    'containing', 'to', 'open', 'push', 'turn', 'cap', 'warnings', 'directions',
+    'store', 'at', 'room', 'temperature', 'keep', 'out', 'of', 'reach', 'children',
+    'active', 'ingredient', 'inactive', 'ingredients', 'see', 'package', 'insert'
+})
+
+
+class OCRRegion:
+    """Một text region OCR kèm độ tin cậy và vị trí trong ảnh"""
+
+    __slots__ = ('text', 'confidence', 'center_distance', 'area')
+
+    def __init__(self, text, confidence, center_distance=0.5, area=0.0):
+        """
+        Args:
+            text: Text đã nhận diện
+            confidence: Độ tin cậy OCR (0-1)
+            center_distance: Khoảng cách tới tâm ảnh, chuẩn hóa 0-1
+            area: Diện tích bounding box / diện tích ảnh
+        """
+        self.text = text
+        self.confidence = confidence
+        self.center_distance = center_distance
+        self.area = area
+
+    @classmethod
+    def from_bbox(cls, bbox, text, confidence, width, height):
+        """Dựng region từ kết quả EasyOCR (bbox 4 điểm) và kích thước ảnh"""
+        x_coords = [point[0] for point in bbox]
+        y_coords = [point[1] for point in bbox]
+        center_x = sum(x_coords) / len(x_coords)
+        center_y = sum(y_coords) / len(y_coords)
+        half_diagonal = ((width / 2) ** 2 + (height / 2) ** 2) ** 0.5
+        distance = ((center_x - width / 2) ** 2 + (center_y - height / 2) ** 2) ** 0.5
+        area = (max(x_coords) - min(x_coords)) * (max(y_coords) - min(y_coords))
+        return cls(
+            text,
+            float(confidence),
+            distance / half_diagonal if half_diagonal else 0.5,
+            area / (width * height) if width and height else 0.0,
+        )
+
+    def geometry_score(self):
+        """Điểm vị trí/kích thước (0-1): gần tâm và chữ to được ưu tiên"""
+        centrality = 1 - min(max(self.center_distance, 0.0), 1.0)
+        size = min(self.area / LARGE_TEXT_AREA, 1.0)
+        return centrality * 0.5 + size * 0.5
+
+
+class OCRCandidate:
+    """Một thuốc ứng viên và region OCR dẫn tới nó"""
+
+    __slots__ = ('record', 'region', 'match_score', 'method', 'score')
+
+    def __init__(self, record, region, match_score, method):
+        self.record = record
+        self.region = region
+        self.match_score = match_score
+        self.method = method
+        self.score = round(
+            match_score * MATCH_WEIGHT
+            + region.confidence * CONFIDENCE_WEIGHT
+            + region.geometry_score() * GEOMETRY_WEIGHT,
+            3,
+        )
+
+    def to_dict(self):
+        """Thông tin gọn để trả về client (danh sách phương án)"""
+        return {
+            'drug_name': self.record.name,
+            'active_ingredient': self.record.ingredient,
+            'is_prescription': self.record.is_prescription,
+            'ocr_text': self.region.text,
+            'match': self.method,
+            'match_score': self.match_score,
+            'score': self.score,
+        }
+
+
+def _is_number_like(text):
+    """Text chỉ gồm số/đơn vị (vd: "2,5mg", "10x 10~") thì không phải tên thuốc"""
+    stripped = text.replace(' ', '').replace('.', '').replace(',', '').replace('%', '')
+    stripped = stripped.replace('x', '').replace('~', '').replace('mg', '')
+    return stripped.isdigit()
+
+
+def _match_region_texts(catalog, queries, texts):
+    """
+    Chất lượng khớp của từng text với catalog
+
+    Returns:
+        list: Với mỗi text, danh sách (row, match_score, method)
+    """
+    results = []
+    matcher = catalog.fuzzy_matcher
+
+    def accept(query, row, score):
+        # Điểm khớp từ (một từ của text nằm trong tên): "Viên nén bao phim" ~ "Nenvofam" - bỏ
+        # nếu cả text không giống cả tên. Lọc trong lúc xếp hạng để khớp từ bị bỏ không chiếm
+        # chỗ của thuốc đúng ("Amoxicilin 500mg": hàng trăm tên chứa "amoxicilin")
+        return score != WORD_MATCH_SCORE or matcher.name_similarity(query, row) >= MIN_NAME_SIMILARITY
+
+    # Một lượt fuzzy cho tất cả text (cận trên tính chung theo lô)
+    fuzzy_results = matcher.search_many(queries, threshold=MIN_MATCH_SCORE, limit=MATCHES_PER_REGION,
+                                        accept=accept)
+    for query, text, matches in zip(queries, texts, fuzzy_results):
+        scored = []
+        exact = catalog.get_by_name(query)
+        if exact is not None:
+            scored.append((exact.row, 1.0, MATCH_EXACT))
+        for row, score in matches:
+            scored.append((row, score, MATCH_FUZZY))
+        if exact is None:
+            # Index lỗi OCR (0/O, 1/l, rn/m...): "Panad0l" gần như khớp chính xác "Panadol"
+            record, match = catalog.find_ocr_match(text)
+            if record is not None:
+                # Chỉ khớp một từ trong tên (vd: "Extra") thì điểm như khớp từ của fuzzy
+                # (find_ocr_match đã bỏ khớp một từ khi cả text không giống cả tên)
+                full = match.term in (record.name_folded, record.ingredient_folded)
+                base = OCR_SPELL_SCORE if full else OCR_SPELL_WORD_SCORE
+                scored.append((record.row, round(base - 0.1 * match.distance, 3), MATCH_OCR_SPELL))
+        results.append(tuple(scored))
+    return results
+
+
+def resolve_ocr_regions(catalog, regions, limit=5, ignore_words=None, match_cache=None):
+    """
+    Chấm điểm mọi region OCR với catalog và xếp hạng các thuốc ứng viên
+
+    Args:
+        catalog: DrugCatalog
+        regions: Danh sách OCRRegion
+        limit: Số thuốc tối đa trả về (tốt nhất + runners-up)
+        ignore_words: Tập từ viết thường không phải tên thuốc ("tablets", "mg"...);
+                      region chỉ gồm các từ này bị bỏ qua
+        match_cache: ResultCache (tùy chọn) lưu kết quả khớp theo text đã chuẩn hóa,
+                     để text lặp lại (thuốc phổ biến) không phải chấm điểm lại
+
+    Returns:
+        list: Các OCRCandidate (mỗi tên thuốc một lần), điểm giảm dần
+    """
+    if not catalog or not regions:
+        return []
+    ignore_words = ignore_words or set()
+
+    usable = []
+    for region in regions:
+        query = normalize_query(region.text)
+        if len(query) < MIN_REGION_LENGTH or _is_number_like(query):
+            continue
+        words = [word for word in query.split() if len(word) > 2]
+        if words and all(word in ignore_words for word in words):
+            continue
+        usable.append((region, query))
+    if not usable:
+        return []
+
+    # Lấy kết quả khớp từ cache, chỉ chấm điểm (theo lô) các text chưa có
+    matched = {}
+    pending = {}
+    for region, query in usable:
+        if query in matched or query in pending:
+            continue
+        cached = match_cache.get(query) if match_cache is not None else None
+        if cached is not None:
+            matched[query] = cached
+        else:
+            pending[query] = region.text
+    if pending:
+        scored = _match_region_texts(catalog, list(pending), list(pending.values()))
+        for query, matches in zip(pending, scored):
+            matched[query] = matches
+            if match_cache is not None:
+                match_cache.set(query, matches)
+
+    best = {}
+    for region, query in usable:
+        for row, match_score, method in matched[query]:
+            record = catalog[row]
+            candidate = OCRCandidate(record, region, match_score, method)
+            current = best.get(record.name_key)
+            if current is None or candidate.score > current.score:
+                best[record.name_key] = candidate
+
+    ranked = sorted(best.values(), key=lambda c: (-c.score, -c.match_score, c.record.row))
+    logger.info(f"Resolved {len(usable)} OCR regions into {len(ranked)} drug candidates")
+    return ranked[:limit]
+
+
+def confident_candidate(candidates, min_match=CONFIDENT_MATCH_SCORE, margin=CONFIDENT_MARGIN):
+    """
+    Thuốc tốt nhất nếu đủ chắc chắn để dùng ngay (không tra lại bằng cách cũ)
+
+    Args:
+        candidates: Kết quả resolve_ocr_regions (điểm giảm dần)
+        min_match: Điểm khớp tối thiểu của thuốc tốt nhất
+        margin: Khoảng cách điểm tổng tối thiểu với thuốc thứ hai
+
+    Returns:
+        OCRCandidate hoặc None
+    """
+    if not candidates or candidates[0].match_score < min_match:
+        return None
+    best = candidates[0]
+    if len(candidates) > 1:
+        runner_up = candidates[1]
+        # Khớp chính xác tên thuốc thắng tên gần giống ("Trixone" / "Trixonex") dù điểm sát nhau
+        exact_wins = best.method == MATCH_EXACT and runner_up.method != MATCH_EXACT
+        if not exact_wins and best.score - runner_up.score < margin:
+            return None
+    return best
@@ -0,0 +1,231 @@
+"""
+OCR Spell Index - Tìm tên thuốc gần đúng khi OCR đọc sai ký tự
+
+Text OCR kiểu "PARACETAM0L", "Panad1l" không khớp exact/substring nên trượt
+mọi bước tìm kiếm. Index này dựa trên SymSpell (từ điển các biến thể xóa ký
+tự, dựng sẵn khi load) để lấy các tên trong khoảng cách sửa <= 2 mà không
+phải so với từng dòng của catalog.
+
+Mô hình chi phí có tính đến lỗi OCR hay gặp: trước khi so sánh, cả query và
+tên trong catalog đều được "gập" các ký tự dễ nhầm về cùng một dạng
+(0/o, 1/l/i/|, 5/s, rn/m) nên những lỗi đó có chi phí 0. Khoảng cách thô
+(chưa gập) chỉ dùng để xếp hạng khi bằng điểm.
+"""
+import logging
+import re
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_DISTANCE = 2
+# Chỉ sinh biến thể xóa trên PREFIX_LENGTH ký tự đầu (kỹ thuật prefix của SymSpell)
+PREFIX_LENGTH = 7
+# Term ngắn hơn ngưỡng này chỉ cho phép sai 1 ký tự (tránh khớp bừa)
+SHORT_TERM_LENGTH = 5
+MIN_TERM_LENGTH = 4
+
+# Các nhóm ký tự OCR hay nhầm -> dạng chuẩn
+_OCR_MULTI_CHAR = (('rn', 'm'),)
+_OCR_CHAR_MAP = str.maketrans({
+    '0': 'o',
+    '1': 'l', 'i': 'l', '|': 'l', '!': 'l',
+    '5': 's',
+})
+_TOKEN_SPLIT = re.compile(r'[^\w]+')
+
+
+def fold_ocr_confusions(text):
+    """Gập các ký tự OCR dễ nhầm về cùng một dạng (text đã viết thường)"""
+    for source, target in _OCR_MULTI_CHAR:
+        text = text.replace(source, target)
+    return text.translate(_OCR_CHAR_MAP)
+
+
+def _tokens(text):
+    return [token for token in _TOKEN_SPLIT.split(text) if token]
+
+
+def _deletes(term, max_distance):
+    """Tất cả biến thể của term khi xóa tối đa max_distance ký tự (chỉ trên prefix)"""
+    term = term[:PREFIX_LENGTH]
+    results = {term}
+    frontier = {term}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for word in frontier:
+            if len(word) <= 1:
+                continue
+            for i in range(len(word)):
+                next_frontier.add(word[:i] + word[i + 1:])
+        results |= next_frontier
+        frontier = next_frontier
+    return results
+
+
+def edit_distance(a, b, max_distance):
+    """
+    Khoảng cách Damerau-Levenshtein (optimal string alignment) giữa a và b
+
+    Chỉ tính trong dải rộng 2 * max_distance + 1 quanh đường chéo và dừng sớm
+    khi cả một hàng đã vượt ngưỡng, nên chi phí ~O(len * max_distance).
+
+    Returns:
+        int: Khoảng cách, hoặc max_distance + 1 nếu vượt ngưỡng
+    """
+    if a == b:
+        return 0
+    len_a, len_b = len(a), len(b)
+    if abs(len_a - len_b) > max_distance:
+        return max_distance + 1
+    over = max_distance + 1
+    previous_previous = None
+    previous = [j if j <= max_distance else over for j in range(len_b + 1)]
+    for i in range(1, len_a + 1):
+        current = [over] * (len_b + 1)
+        if i <= max_distance:
+            current[0] = i
+        ch_a = a[i - 1]
+        low = max(1, i - max_distance)
+        high = min(len_b, i + max_distance)
+        row_min = current[0]
+        for j in range(low, high + 1):
+            ch_b = b[j - 1]
+            value = previous[j - 1] if ch_a == ch_b else previous[j - 1] + 1
+            if previous[j] + 1 < value:
+                value = previous[j] + 1
+            if current[j - 1] + 1 < value:
+                value = current[j - 1] + 1
+            if i > 1 and j > 1 and ch_a == b[j - 2] and a[i - 2] == ch_b:
+                if previous_previous[j - 2] + 1 < value:
+                    value = previous_previous[j - 2] + 1
+            if value > over:
+                value = over
+            current[j] = value
+            if value < row_min:
+                row_min = value
+        if row_min > max_distance:
+            return over
+        previous_previous, previous = previous, current
+    return previous[len_b] if previous[len_b] <= max_distance else over
+
+
+class SpellMatch:
+    """Một kết quả tìm gần đúng"""
+
+    __slots__ = ('term', 'distance', 'raw_distance', 'is_name', 'rows')
+
+    def __init__(self, term, distance, raw_distance, is_name, rows):
+        self.term = term
+        self.distance = distance
+        self.raw_distance = raw_distance
+        self.is_name = is_name
+        self.rows = rows
+
+    def __repr__(self):
+        return f"SpellMatch(term={self.term!r}, distance={self.distance}, rows={len(self.rows)})"
+
+
+class OCRSpellIndex:
+    def __init__(self, name_keys, ingredient_keys, max_distance=DEFAULT_MAX_DISTANCE):
+        """
+        Dựng từ điển SymSpell từ key tên thuốc và hoạt chất
+
+        Mỗi key được index cả nguyên chuỗi lẫn từng từ (>= 4 ký tự) bên trong,
+        để OCR chỉ đọc được tên thương mại ("Panad1l") vẫn tìm ra "Panadol 500".
+
+        Args:
+            name_keys: Tên thuốc đã chuẩn hóa, theo thứ tự dòng catalog
+            ingredient_keys: Hoạt chất đã chuẩn hóa, cùng thứ tự
+            max_distance: Khoảng cách sửa tối đa hỗ trợ
+        """
+        self.max_distance = max_distance
+
+        # term (đã gập) -> [term gốc, có phải tên thuốc, các dòng]
+        terms = {}
+        for keys, is_name in ((name_keys, True), (ingredient_keys, False)):
+            for row, key in enumerate(keys):
+                if not key:
+                    continue
+                candidates = {key}
+                candidates.update(token for token in _tokens(key) if len(token) >= MIN_TERM_LENGTH)
+                for term in candidates:
+                    folded = fold_ocr_confusions(term)
+                    entry = terms.get(folded)
+                    if entry is None:
+                        entry = terms[folded] = [term, is_name, []]
+                    elif is_name and not entry[1]:
+                        entry[0], entry[1] = term, True
+                    if not entry[2] or entry[2][-1] != row:
+                        entry[2].append(row)
+
+        self._terms = []
+        self._deletes = {}
+        for folded, (term, is_name, rows) in terms.items():
+            term_id = len(self._terms)
+            self._terms.append((folded, term, is_name, tuple(sorted(set(rows)))))
+            for variant in _deletes(folded, max_distance):
+                self._deletes.setdefault(variant, []).append(term_id)
+
+        logger.info(f"Built OCR spell index: {len(self._terms)} terms, {len(self._deletes)} delete variants")
+
+    def _allowed_distance(self, folded, max_distance):
+        if len(folded) <= SHORT_TERM_LENGTH:
+            return min(max_distance, 1)
+        return max_distance
+
+    def lookup(self, text, max_distance=None, limit=5):
+        """
+        Tìm các term trong catalog gần với text nhất
+
+        Args:
+            text: Text OCR (một tên hoặc một từ)
+            max_distance: Khoảng cách sửa tối đa (mặc định theo index, tối đa 2)
+            limit: Số kết quả tối đa
+
+        Returns:
+            list: Các SpellMatch, sắp xếp theo (khoảng cách sau khi gập lỗi OCR,
+                  khoảng cách thô, ưu tiên tên thuốc, thứ tự dòng)
+        """
+        raw = ' '.join(text.strip().lower().split())
+        if len(raw) < MIN_TERM_LENGTH:
+            return []
+        folded = fold_ocr_confusions(raw)
+        if max_distance is None:
+            max_distance = self.max_distance
+        max_distance = self._allowed_distance(folded, min(max_distance, self.max_distance))
+
+        seen = set()
+        matches = []
+        for variant in _deletes(folded, max_distance):
+            for term_id in self._deletes.get(variant, ()):
+                if term_id in seen:
+                    continue
+                seen.add(term_id)
+                term_folded, term, is_name, rows = self._terms[term_id]
+                allowed = self._allowed_distance(term_folded, max_distance)
+                if abs(len(term_folded) - len(folded)) > allowed:
+                    continue
+                distance = edit_distance(folded, term_folded, allowed)
+                if distance > allowed:
+                    continue
+                raw_distance = edit_distance(raw, term, max(len(raw), len(term)))
+                matches.append(SpellMatch(term, distance, raw_distance, is_name, rows))
+
+        matches.sort(key=lambda m: (m.distance, m.raw_distance, not m.is_name, m.rows[0]))
+        return matches[:limit]
+
+    def search(self, text, limit=5):
+        """
+        Tìm gần đúng cho cả chuỗi OCR, nếu không có thì thử từng từ trong chuỗi
+
+        Returns:
+            list: Các SpellMatch (xem lookup)
+        """
+        matches = self.lookup(text, limit=limit)
+        if matches:
+            return matches
+        for token in sorted(_tokens(text.lower()), key=len, reverse=True):
+            if len(token) >= MIN_TERM_LENGTH:
+                matches = self.lookup(token, limit=limit)
+                if matches:
+                    return matches
+        return []
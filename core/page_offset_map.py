@@ -0,0 +1,219 @@
+"""
+Page Offset Map - Bảng chuyển số trang sách (trong CSV) sang index trang PDF
+
+Số trang trong CSV là số in trên sách; trang PDF bị lệch vì trang bìa, mục
+lục, phụ lục chèn giữa sách... và độ lệch không nhất thiết giống nhau trên
+cả cuốn. Trước đây runtime cộng cứng offset -1 (sai thì thử lại không offset),
+còn mỗi script crawl tự dò lại offset bằng một thuốc mẫu duy nhất.
+
+Bản đồ ở đây được "hiệu chỉnh" một lần (Crawldata/calibrate_page_offsets.py):
+lấy mẫu mọi chuyên luận trong danh mục, tìm trang PDF thật của tiêu đề chuyên
+luận gần trang sách tương ứng, rồi khớp thành các đoạn liên tiếp có cùng độ
+lệch (piecewise constant):
+
+    index PDF = trang sách + delta của đoạn chứa trang sách đó
+
+Bản đồ ghi ra "<pdf>.bookpages.sqlite" kèm dấu vân tay PDF nguồn; Backend/api
+và các script crawl chỉ đọc bản đồ, không dò lại.
+"""
+import bisect
+import logging
+import os
+import sqlite3
+
+from .page_text_store import pdf_fingerprint
+from .text_utils import fold_key
+
+logger = logging.getLogger(__name__)
+
+MAP_SUFFIX = '.bookpages.sqlite'
+SCHEMA_VERSION = '1'
+
+# Độ lệch khi chưa hiệu chỉnh: giống runtime cũ (trang sách + offset -1, rồi -1 vì index từ 0)
+DEFAULT_DELTA = -2
+# Độ lệch tối đa (số trang) được xét khi tìm tiêu đề chuyên luận quanh trang sách
+MAX_SHIFT = 60
+# Cửa sổ trung vị (số mẫu liên tiếp) để bỏ các mẫu khớp nhầm trước khi chia đoạn
+SMOOTHING_WINDOW = 5
+# Đoạn có ít mẫu hơn thì coi là nhiễu, gộp vào đoạn trước
+MIN_SEGMENT_SAMPLES = 3
+# Tiêu đề ngắn hơn thì không so khớp một phần (tránh "SAT" khớp mọi hoạt chất có "sat")
+MIN_PARTIAL_TITLE_LENGTH = 4
+
+
+def default_map_path(pdf_path):
+    """Đường dẫn bản đồ mặc định, cạnh file PDF: "<pdf>.bookpages.sqlite" """
+    return os.path.splitext(pdf_path)[0] + MAP_SUFFIX
+
+
+def locate_title_pages(titles, monographs, max_shift=MAX_SHIFT):
+    """
+    Trang PDF thật của từng chuyên luận mẫu, theo tiêu đề chuyên luận
+
+    Args:
+        titles: Iterable (title, page_index) - vd: find_titles() hoặc các span của MonographSpanIndex
+        monographs: Iterable (book_page, ingredient) - vd: DrugCatalog.iter_monographs()
+        max_shift: Chỉ xét tiêu đề trong khoảng trang sách ± max_shift
+
+    Returns:
+        list: (book_page, page_index) - bỏ qua chuyên luận không tìm thấy hoặc khớp nhiều chỗ
+    """
+    by_key = {}
+    for title, page_index in titles:
+        by_key.setdefault(fold_key(title), []).append(page_index)
+    partial_keys = [key for key in by_key if len(key) >= MIN_PARTIAL_TITLE_LENGTH]
+
+    samples = []
+    for book_page, ingredient in monographs:
+        key = fold_key(ingredient)
+        if book_page is None or not key:
+            continue
+        pages = by_key.get(key)
+        if not pages:
+            # Hoạt chất kèm tên muối/dạng ("Cetirizin hydroclorid") - tiêu đề là một phần của nó hoặc ngược lại
+            pages = [page_index for title_key in partial_keys if title_key in key or key in title_key
+                     for page_index in by_key[title_key]]
+        candidates = {page_index for page_index in pages if abs(page_index - book_page) <= max_shift}
+        if len(candidates) == 1:
+            samples.append((book_page, candidates.pop()))
+    return samples
+
+
+class PageOffsetMap:
+    def __init__(self, segments, source_fingerprint=None, sample_count=0, outlier_count=0):
+        """
+        Args:
+            segments: Danh sách (first_book_page, delta) tăng dần theo trang; trang sách
+                      trước đoạn đầu tiên dùng delta của đoạn đầu tiên
+            source_fingerprint: Dấu vân tay PDF nguồn
+            sample_count: Số chuyên luận mẫu dùng để hiệu chỉnh (0 = bản đồ mặc định)
+            outlier_count: Số mẫu lệch khỏi bản đồ đã khớp
+        """
+        segments = sorted(segments) or [(0, DEFAULT_DELTA)]
+        self.segments = tuple((int(start), int(delta)) for start, delta in segments)
+        self.source_fingerprint = source_fingerprint
+        self.sample_count = sample_count
+        self.outlier_count = outlier_count
+        self._starts = [start for start, _ in self.segments]
+
+    @classmethod
+    def constant(cls, delta=DEFAULT_DELTA):
+        """Bản đồ một đoạn, cùng độ lệch cho cả cuốn (khi chưa hiệu chỉnh)"""
+        return cls([(0, delta)])
+
+    @classmethod
+    def fit(cls, samples, source_fingerprint=None):
+        """
+        Khớp bản đồ từng đoạn từ các mẫu (trang sách, index PDF thật)
+
+        Độ lệch của các mẫu (theo thứ tự trang) được lọc trung vị để bỏ mẫu khớp nhầm,
+        rồi chia đoạn mỗi khi độ lệch đổi; đoạn ít hơn MIN_SEGMENT_SAMPLES mẫu bị gộp.
+
+        Returns:
+            PageOffsetMap (bản đồ mặc định nếu không có mẫu nào)
+        """
+        samples = sorted(set(samples))
+        if not samples:
+            return cls([], source_fingerprint)
+        deltas = [page_index - book_page for book_page, page_index in samples]
+        radius = SMOOTHING_WINDOW // 2
+        smoothed = []
+        for position in range(len(deltas)):
+            window = sorted(deltas[max(0, position - radius):position + radius + 1])
+            smoothed.append(window[len(window) // 2])
+
+        runs = []  # [first_book_page, delta, số mẫu]
+        for (book_page, _), delta in zip(samples, smoothed):
+            if runs and runs[-1][1] == delta:
+                runs[-1][2] += 1
+            else:
+                runs.append([book_page, delta, 1])
+        # Đoạn quá ít mẫu là nhiễu: gộp vào đoạn trước (đoạn đầu thì vào đoạn sau)
+        segments = [run for run in runs if run[2] >= MIN_SEGMENT_SAMPLES] or [max(runs, key=lambda run: run[2])]
+        merged = []
+        for start, delta, _ in segments:
+            if not merged or merged[-1][1] != delta:
+                merged.append((start, delta))
+        page_map = cls(merged, source_fingerprint, sample_count=len(samples))
+        page_map.outlier_count = sum(1 for book_page, page_index in samples
+                                     if page_map.to_pdf_index(book_page) != page_index)
+        return page_map
+
+    def delta(self, book_page):
+        """Độ lệch áp dụng cho trang sách `book_page`"""
+        position = bisect.bisect_right(self._starts, book_page) - 1
+        return self.segments[max(position, 0)][1]
+
+    def to_pdf_index(self, book_page):
+        """
+        Index trang PDF (từ 0) của trang sách `book_page`
+
+        Raises:
+            ValueError: book_page không phải số
+        """
+        book_page = int(book_page)
+        return book_page + self.delta(book_page)
+
+    def save(self, map_path):
+        """Ghi bản đồ ra SQLite (file tạm rồi đổi tên)"""
+        tmp_path = map_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE segments (first_book_page INTEGER PRIMARY KEY, delta INTEGER NOT NULL)")
+            conn.executemany("INSERT INTO segments VALUES (?, ?)", self.segments)
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('source_fingerprint', self.source_fingerprint or ''),
+                ('sample_count', str(self.sample_count)),
+                ('outlier_count', str(self.outlier_count)),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, map_path)
+        logger.info(f"Saved page offset map {map_path} ({len(self.segments)} segments)")
+
+    @classmethod
+    def load(cls, map_path):
+        """Đọc bản đồ từ SQLite"""
+        conn = sqlite3.connect(f"file:{map_path}?mode=ro", uri=True)
+        try:
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get('schema_version') != SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"schema {meta.get('schema_version')}, expected {SCHEMA_VERSION}")
+            segments = conn.execute("SELECT first_book_page, delta FROM segments ORDER BY first_book_page").fetchall()
+        finally:
+            conn.close()
+        return cls(segments, meta.get('source_fingerprint'), int(meta.get('sample_count', 0)),
+                   int(meta.get('outlier_count', 0)))
+
+    @classmethod
+    def open_for(cls, pdf_path, map_path=None):
+        """
+        Load bản đồ của PDF nếu có và còn khớp với PDF (PDF không có thì vẫn dùng bản đồ)
+
+        Returns:
+            PageOffsetMap hoặc None (chưa hiệu chỉnh, bản đồ hỏng hoặc đã cũ)
+        """
+        map_path = map_path or default_map_path(pdf_path)
+        if not os.path.exists(map_path):
+            return None
+        try:
+            page_map = cls.load(map_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open page offset map {map_path}: {e}")
+            return None
+        fingerprint = pdf_fingerprint(pdf_path)
+        if fingerprint is not None and fingerprint != page_map.source_fingerprint:
+            logger.warning(f"Page offset map {map_path} is stale for {pdf_path}, recalibrate it")
+            return None
+        return page_map
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __repr__(self):
+        return f"PageOffsetMap({list(self.segments)!r})"
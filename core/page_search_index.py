@@ -0,0 +1,298 @@
+"""
+Page Search Index - Index toàn văn (BM25) cho text các trang PDF Dược thư
+
+Thay cho việc `extract_text()` cả ~1700 trang rồi tìm substring ở mỗi query:
+index đảo ngược lưu trong SQLite, mỗi term trỏ tới các trang chứa nó kèm tần
+suất. Query chỉ đọc posting list của các term trong query rồi xếp hạng BM25.
+
+Tách từ kiểu tiếng Việt: text được bỏ dấu (fold_key) rồi tách thành âm tiết;
+ngoài âm tiết còn index cặp âm tiết liền nhau ("chong chi dinh" -> "chong_chi",
+"chi_dinh") vì từ tiếng Việt thường gồm nhiều âm tiết, nên trang chứa đúng
+cụm từ được xếp trên trang chỉ chứa rời rạc từng âm tiết.
+
+Index lưu hash text của từng trang: khi PDF nguồn đổi, update() chỉ index lại
+các trang có text thay đổi.
+"""
+import hashlib
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter
+
+from .page_text_store import pdf_fingerprint
+from .text_utils import fold_diacritics, fold_key
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.search.sqlite'
+SCHEMA_VERSION = '1'
+
+# Tham số BM25
+BM25_K1 = 1.5
+BM25_B = 0.75
+# Độ dài snippet (ký tự mỗi bên quanh dòng khớp nhiều term nhất)
+SNIPPET_CONTEXT = 100
+
+_TOKEN = re.compile(r'\w+')
+_BIGRAM_JOINER = '_'
+
+
+def default_index_path(pdf_path):
+    """Đường dẫn index mặc định, cạnh file PDF: "<pdf>.search.sqlite" """
+    return os.path.splitext(pdf_path)[0] + INDEX_SUFFIX
+
+
+def tokenize(text):
+    """
+    Tách text thành các âm tiết đã bỏ dấu, viết thường
+
+    "Chống chỉ định" -> ["chong", "chi", "dinh"]
+    """
+    return _TOKEN.findall(fold_key(text))
+
+
+def index_terms(tokens):
+    """Các term được index: âm tiết + cặp âm tiết liền nhau"""
+    terms = list(tokens)
+    terms.extend(a + _BIGRAM_JOINER + b for a, b in zip(tokens, tokens[1:]))
+    return terms
+
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def _fold_chars(text):
+    """
+    Bỏ dấu + viết thường từng ký tự, giữ nguyên độ dài
+
+    Để vị trí tìm được trên text đã bỏ dấu cũng là vị trí trên text gốc (dùng cho highlight).
+    """
+    folded = []
+    for ch in text:
+        fch = fold_diacritics(ch.lower())
+        folded.append(fch if len(fch) == 1 else ch)
+    return ''.join(folded)
+
+
+def make_snippet(text, tokens, context=SNIPPET_CONTEXT):
+    """
+    Đoạn text quanh dòng khớp nhiều term của query nhất, kèm vị trí cần highlight
+
+    Args:
+        text: Text của trang
+        tokens: Âm tiết của query (đã tokenize)
+
+    Returns:
+        tuple: (snippet, highlights) - highlights là list [start, end] trong snippet
+    """
+    if not text:
+        return '', []
+    folded = _fold_chars(text)
+    wanted = set(tokens)
+    pattern = re.compile(r'\b(?:' + '|'.join(re.escape(t) for t in sorted(wanted, key=len, reverse=True)) + r')\b') \
+        if wanted else None
+
+    # Dòng có nhiều âm tiết khác nhau của query nhất (dòng đầu tiên nếu hòa)
+    best_start, best_end, best_hits = 0, 0, -1
+    position = 0
+    for line in folded.split('\n'):
+        hits = len(wanted.intersection(_TOKEN.findall(line)))
+        if hits > best_hits:
+            best_start, best_end, best_hits = position, position + len(line), hits
+        position += len(line) + 1
+
+    start = max(0, best_start - context)
+    end = min(len(text), best_end + context)
+    snippet = text[start:end]
+    highlights = []
+    if pattern is not None:
+        highlights = [[m.start(), m.end()] for m in pattern.finditer(folded[start:end])]
+
+    if start > 0:
+        snippet = '...' + snippet
+        highlights = [[s + 3, e + 3] for s, e in highlights]
+    if end < len(text):
+        snippet = snippet + '...'
+    return snippet, highlights
+
+
+class PageSearchIndex:
+    def __init__(self, index_path):
+        """
+        Mở index đã dựng (chỉ đọc)
+
+        Args:
+            index_path: Đường dẫn file SQLite
+
+        Raises:
+            sqlite3.Error: File không phải index hợp lệ
+        """
+        self.index_path = index_path
+        self._conn = sqlite3.connect(f"file:{index_path}?mode=ro", uri=True, check_same_thread=False)
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.schema_version = meta.get('schema_version')
+        self.source_fingerprint = meta.get('source_fingerprint')
+        # Độ dài (số term) từng trang, giữ trong bộ nhớ để chấm BM25
+        self._lengths = dict(self._conn.execute("SELECT page_index, length FROM docs"))
+        self.page_count = len(self._lengths)
+        self.avg_length = (sum(self._lengths.values()) / self.page_count) if self.page_count else 0.0
+
+    @staticmethod
+    def update(index_path, pages, source_fingerprint=None):
+        """
+        Dựng mới hoặc cập nhật index từ text các trang
+
+        Chỉ các trang có text đổi (so hash) mới bị index lại; trang không còn trong
+        PDF bị xóa. Cả lần cập nhật nằm trong một transaction.
+
+        Args:
+            index_path: Đường dẫn file SQLite (tạo mới nếu chưa có)
+            pages: Iterable text từng trang theo thứ tự (index từ 0)
+            source_fingerprint: Dấu vân tay PDF nguồn (xem pdf_fingerprint)
+
+        Returns:
+            dict: Số trang added / updated / removed / unchanged
+        """
+        conn = sqlite3.connect(index_path)
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE IF NOT EXISTS docs ("
+                         "page_index INTEGER PRIMARY KEY, length INTEGER NOT NULL, "
+                         "hash TEXT NOT NULL, text TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS postings ("
+                         "term TEXT NOT NULL, page_index INTEGER NOT NULL, tf INTEGER NOT NULL, "
+                         "PRIMARY KEY (term, page_index)) WITHOUT ROWID")
+            conn.execute("CREATE INDEX IF NOT EXISTS postings_page ON postings (page_index)")
+            meta = dict(conn.execute("SELECT key, value FROM meta"))
+            if meta.get('schema_version') not in (None, SCHEMA_VERSION):
+                # Schema cũ: index lại từ đầu
+                conn.execute("DELETE FROM docs")
+                conn.execute("DELETE FROM postings")
+            hashes = dict(conn.execute("SELECT page_index, hash FROM docs"))
+
+            stats = {'added': 0, 'updated': 0, 'removed': 0, 'unchanged': 0}
+            page_count = 0
+            for page_index, text in enumerate(pages):
+                page_count += 1
+                text = text or ''
+                digest = _text_hash(text)
+                old = hashes.get(page_index)
+                if old == digest:
+                    stats['unchanged'] += 1
+                    continue
+                if old is not None:
+                    conn.execute("DELETE FROM postings WHERE page_index = ?", (page_index,))
+                    stats['updated'] += 1
+                else:
+                    stats['added'] += 1
+                tokens = tokenize(text)
+                counts = Counter(index_terms(tokens))
+                conn.executemany("INSERT INTO postings VALUES (?, ?, ?)",
+                                 ((term, page_index, tf) for term, tf in counts.items()))
+                conn.execute("INSERT OR REPLACE INTO docs VALUES (?, ?, ?, ?)",
+                             (page_index, len(tokens), digest, text))
+
+            stale = [index for index in hashes if index >= page_count]
+            for page_index in stale:
+                conn.execute("DELETE FROM postings WHERE page_index = ?", (page_index,))
+                conn.execute("DELETE FROM docs WHERE page_index = ?", (page_index,))
+            stats['removed'] = len(stale)
+
+            conn.executemany("INSERT OR REPLACE INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('source_fingerprint', source_fingerprint or ''),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        logger.info(f"Updated page search index {index_path}: {stats}")
+        return stats
+
+    @classmethod
+    def open_for(cls, pdf_path, index_path=None):
+        """
+        Mở index của PDF nếu có và còn khớp với PDF
+
+        Returns:
+            PageSearchIndex hoặc None (không có index, index hỏng hoặc đã cũ)
+        """
+        index_path = index_path or default_index_path(pdf_path)
+        if not os.path.exists(index_path):
+            return None
+        try:
+            index = cls(index_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open page search index {index_path}: {e}")
+            return None
+        fingerprint = pdf_fingerprint(pdf_path)
+        if index.schema_version != SCHEMA_VERSION or (
+                fingerprint is not None and fingerprint != index.source_fingerprint):
+            logger.warning(f"Page search index {index_path} is stale for {pdf_path}, rebuild it")
+            index.close()
+            return None
+        return index
+
+    def search(self, query, limit=20):
+        """
+        Tìm các trang liên quan tới query, xếp hạng BM25
+
+        Args:
+            query: Text cần tìm (có dấu hay không dấu đều được)
+            limit: Số trang tối đa
+
+        Returns:
+            list: Dict {'page_number', 'score', 'snippet', 'highlights'}, điểm giảm dần
+        """
+        tokens = tokenize(query)
+        terms = set(index_terms(tokens))
+        if not terms or not self.page_count:
+            return []
+
+        placeholders = ','.join('?' * len(terms))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT term, page_index, tf FROM postings WHERE term IN ({placeholders})",
+                tuple(terms)).fetchall()
+
+        postings = {}
+        for term, page_index, tf in rows:
+            postings.setdefault(term, []).append((page_index, tf))
+
+        scores = {}
+        for term, entries in postings.items():
+            df = len(entries)
+            idf = math.log(1 + (self.page_count - df + 0.5) / (df + 0.5))
+            for page_index, tf in entries:
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self._lengths[page_index] / self.avg_length)
+                scores[page_index] = scores.get(page_index, 0.0) + idf * tf * (BM25_K1 + 1) / (tf + norm)
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        if not ranked:
+            return []
+        with self._lock:
+            texts = dict(self._conn.execute(
+                f"SELECT page_index, text FROM docs WHERE page_index IN ({','.join('?' * len(ranked))})",
+                tuple(page_index for page_index, _ in ranked)).fetchall())
+
+        results = []
+        for page_index, score in ranked:
+            snippet, highlights = make_snippet(texts.get(page_index, ''), tokens)
+            results.append({
+                'page_number': page_index + 1,
+                'score': round(score, 4),
+                'snippet': snippet,
+                'highlights': highlights,
+            })
+        return results
+
+    def __len__(self):
+        return self.page_count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,119 @@
+"""
+Page Text Cache - Cache LRU giới hạn theo bộ nhớ cho text trang PDF, dùng chung trong process
+
+Backend/app.py (pypdf), api/utils.py (pypdf) và PDFExtractorService (pdfplumber)
+cùng đọc PDF Dược thư; các trang chuyên luận hay được tra được trích xuất một
+lần cho cả process thay vì mỗi request. Giới hạn theo tổng dung lượng text
+(trang dài ngắn khác nhau nhiều) chứ không theo số entry.
+
+Key gồm nguồn (đường dẫn PDF + extractor) và index trang, vì pypdf và
+pdfplumber cho text khác nhau trên cùng một trang.
+"""
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BYTES = int(os.getenv('PAGE_TEXT_CACHE_MB', 32)) * 1024 * 1024
+
+
+def _text_size(text):
+    """Dung lượng ước tính của text (UTF-8)"""
+    return len(text.encode('utf-8')) if text else 0
+
+
+def page_text_source(pdf_path, extractor):
+    """Định danh nguồn text: đường dẫn tuyệt đối của PDF + extractor ("pypdf", "pdfplumber")"""
+    return f"{os.path.abspath(pdf_path)}:{extractor}"
+
+
+class PageTextCache:
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, name='page_text'):
+        """
+        Args:
+            max_bytes: Tổng dung lượng text tối đa (vượt quá thì bỏ trang ít dùng nhất)
+            name: Tên cache (để log/thống kê)
+        """
+        if max_bytes <= 0:
+            raise ValueError("max_bytes phải > 0")
+        self.max_bytes = max_bytes
+        self.name = name
+        self._entries = OrderedDict()  # (source, page_index) -> (text, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_load(self, source, page_index, load):
+        """
+        Text của trang từ cache, chưa có thì gọi load() rồi lưu lại
+
+        Args:
+            source: Định danh nguồn text (vd: "<pdf_path>:pypdf")
+            page_index: Index trang (từ 0)
+            load: Hàm trích xuất text trang (None/rỗng thì không cache)
+        """
+        key = (source, page_index)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+
+        text = load()
+        if text:
+            self._store(key, text)
+        return text
+
+    def _store(self, key, text):
+        size = _text_size(text)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (text, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self, source=None):
+        """Xóa toàn bộ cache, hoặc chỉ các trang của một nguồn (khi PDF được load lại)"""
+        with self._lock:
+            if source is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                for key in [key for key in self._entries if key[0] == source]:
+                    self._bytes -= self._entries.pop(key)[1]
+        logger.info(f"Cleared page text cache '{self.name}'" + (f" for {source}" if source else ''))
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Thống kê để chọn giới hạn bộ nhớ theo traffic thật"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'pages': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+            }
+
+
+# Cache dùng chung cho mọi reader trong process
+shared_page_text_cache = PageTextCache()
@@ -0,0 +1,178 @@
+"""
+Page Text Store - Text từng trang của PDF Dược thư, trích xuất sẵn vào SQLite
+
+`page.extract_text()` của pypdf mất hàng chục ms mỗi trang và bị gọi lại cho
+cùng các trang suốt cả ngày. Store được dựng một lần (build step, xem
+Crawldata/build_page_text_store.py), sau đó đọc text một trang chỉ là một
+truy vấn theo khóa chính.
+
+Store ghi kèm dấu vân tay của file PDF nguồn; nếu PDF đổi thì store bị coi
+là cũ và caller quay về trích xuất trực tiếp.
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+STORE_SUFFIX = '.pages.sqlite'
+SCHEMA_VERSION = '1'
+# Số byte đầu/cuối file dùng để tính dấu vân tay (đọc cả file PDF lớn mỗi lần mở thì quá chậm)
+_FINGERPRINT_CHUNK = 1 << 20
+
+
+def default_store_path(pdf_path):
+    """Đường dẫn store mặc định, cạnh file PDF: "<pdf>.pages.sqlite" """
+    return os.path.splitext(pdf_path)[0] + STORE_SUFFIX
+
+
+def pdf_fingerprint(pdf_path):
+    """
+    Dấu vân tay của file PDF: kích thước + SHA-256 của 1MB đầu và 1MB cuối
+
+    Returns:
+        str hoặc None nếu file không tồn tại
+    """
+    try:
+        size = os.path.getsize(pdf_path)
+        digest = hashlib.sha256()
+        with open(pdf_path, 'rb') as f:
+            digest.update(f.read(_FINGERPRINT_CHUNK))
+            if size > _FINGERPRINT_CHUNK:
+                f.seek(max(size - _FINGERPRINT_CHUNK, _FINGERPRINT_CHUNK))
+                digest.update(f.read())
+    except OSError:
+        return None
+    return f"{size}:{digest.hexdigest()}"
+
+
+def extract_pdf_pages(pdf_path, backend='pypdf'):
+    """
+    Trích xuất text từng trang (mặc định pypdf - cùng extractor với Backend/app.py và api/utils.py)
+
+    Args:
+        backend: Tên backend trong core/pdf_text_backends.py
+    """
+    from .pdf_text_backends import open_backend
+
+    with open_backend(backend, pdf_path) as pdf:
+        for _, text in pdf.iter_pages():
+            yield text
+
+
+class PageTextStore:
+    def __init__(self, store_path):
+        """
+        Mở store đã dựng (chỉ đọc)
+
+        Args:
+            store_path: Đường dẫn file SQLite
+
+        Raises:
+            sqlite3.Error: File không phải store hợp lệ
+        """
+        self.store_path = store_path
+        self._conn = sqlite3.connect(f"file:{store_path}?mode=ro", uri=True, check_same_thread=False)
+        # Một connection dùng chung cho các thread của Flask, truy cập tuần tự
+        self._lock = threading.Lock()
+        meta = dict(self._conn.execute("SELECT key, value FROM meta"))
+        self.schema_version = meta.get('schema_version')
+        self.source_fingerprint = meta.get('source_fingerprint')
+        self.extractor = meta.get('extractor')
+        self.page_count = int(meta.get('page_count', 0))
+
+    @classmethod
+    def build(cls, pdf_path, store_path=None, pages=None, extractor='pypdf'):
+        """
+        Trích xuất mọi trang của PDF một lần và ghi vào store
+
+        Ghi ra file tạm rồi đổi tên, nên process đang đọc store cũ không thấy store dở dang.
+
+        Args:
+            pdf_path: Đường dẫn PDF nguồn
+            store_path: Đường dẫn store (mặc định default_store_path(pdf_path))
+            pages: Iterable text từng trang (mặc định trích xuất bằng backend `extractor`)
+            extractor: Tên backend trích xuất (core/pdf_text_backends.py), ghi vào metadata
+
+        Returns:
+            PageTextStore
+        """
+        store_path = store_path or default_store_path(pdf_path)
+        tmp_path = store_path + '.tmp'
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        if pages is None:
+            pages = extract_pdf_pages(pdf_path, extractor)
+
+        conn = sqlite3.connect(tmp_path)
+        try:
+            conn.execute("CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT)")
+            conn.execute("CREATE TABLE pages (page_index INTEGER PRIMARY KEY, text TEXT NOT NULL)")
+            page_count = 0
+            for page_index, text in enumerate(pages):
+                conn.execute("INSERT INTO pages VALUES (?, ?)", (page_index, text or ''))
+                page_count += 1
+                if page_count % 200 == 0:
+                    logger.info(f"Extracted {page_count} pages from {pdf_path}")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [
+                ('schema_version', SCHEMA_VERSION),
+                ('source_fingerprint', pdf_fingerprint(pdf_path) or ''),
+                ('extractor', extractor),
+                ('page_count', str(page_count)),
+            ])
+            conn.commit()
+        finally:
+            conn.close()
+        os.replace(tmp_path, store_path)
+        logger.info(f"Built page text store {store_path} ({page_count} pages)")
+        return cls(store_path)
+
+    @classmethod
+    def open_for(cls, pdf_path, store_path=None):
+        """
+        Mở store của PDF nếu có và còn khớp với PDF
+
+        Nếu file PDF không có (vd: deploy chỉ kèm store) thì store vẫn được dùng.
+
+        Returns:
+            PageTextStore hoặc None (không có store, store hỏng hoặc đã cũ)
+        """
+        store_path = store_path or default_store_path(pdf_path)
+        if not os.path.exists(store_path):
+            return None
+        try:
+            store = cls(store_path)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open page text store {store_path}: {e}")
+            return None
+        if store.schema_version != SCHEMA_VERSION:
+            logger.warning(f"Page text store {store_path} has schema {store.schema_version}, expected {SCHEMA_VERSION}")
+            store.close()
+            return None
+        fingerprint = pdf_fingerprint(pdf_path)
+        if fingerprint is not None and fingerprint != store.source_fingerprint:
+            logger.warning(f"Page text store {store_path} is stale for {pdf_path}, rebuild it")
+            store.close()
+            return None
+        return store
+
+    def get(self, page_index):
+        """
+        Text của trang PDF (index từ 0)
+
+        Returns:
+            str hoặc None nếu index ngoài phạm vi
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT text FROM pages WHERE page_index = ?", (page_index,)).fetchone()
+        return None if row is None else row[0]
+
+    def __len__(self):
+        return self.page_count
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
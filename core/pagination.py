@@ -0,0 +1,72 @@
+"""
+Pagination - Phân trang bằng cursor cho các danh sách thuốc (tìm kiếm, danh mục)
+
+Danh sách luôn theo thứ tự dòng trong CSV nên cursor chỉ cần nhớ dòng cuối
+cùng đã trả về: trang sau tiếp tục từ dòng kế tiếp qua index, không phải
+dựng lại (hay giữ trong bộ nhớ) toàn bộ kết quả như phân trang offset.
+Cursor được mã hóa base64 để client coi là chuỗi opaque.
+"""
+import base64
+import binascii
+from itertools import islice
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+
+_CURSOR_PREFIX = 'r:'
+
+
+def encode_cursor(row):
+    """Mã hóa dòng cuối của trang hiện tại thành cursor"""
+    raw = f"{_CURSOR_PREFIX}{row}".encode('ascii')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Giải mã cursor thành dòng cuối đã trả về
+
+    Returns:
+        int: Dòng cuối (-1 nếu không có cursor = trang đầu)
+
+    Raises:
+        ValueError: Cursor không hợp lệ
+    """
+    if not cursor:
+        return -1
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        raw = base64.urlsafe_b64decode(padded.encode('ascii')).decode('ascii')
+    except (binascii.Error, UnicodeError):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    if not raw.startswith(_CURSOR_PREFIX) or not raw[len(_CURSOR_PREFIX):].isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return int(raw[len(_CURSOR_PREFIX):])
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE, maximum=MAX_PAGE_SIZE):
+    """
+    Parse tham số limit, kẹp vào [1, maximum]
+
+    Raises:
+        ValueError: limit không phải số nguyên
+    """
+    if value is None or value == '':
+        return default
+    return min(max(int(value), 1), maximum)
+
+
+def paginate(records, limit):
+    """
+    Lấy một trang từ iterator DrugRecord (theo thứ tự dòng)
+
+    Chỉ đọc tối đa limit + 1 phần tử để biết còn trang sau hay không.
+
+    Returns:
+        tuple: (danh sách DrugRecord của trang, cursor trang sau hoặc None)
+    """
+    records = iter(records)
+    page = list(islice(records, limit))
+    has_more = next(records, None) is not None
+    next_cursor = encode_cursor(page[-1].row) if page and has_more else None
+    return page, next_cursor
@@ -0,0 +1,213 @@
+"""
+PDF Text Backends - Interface trích xuất text PDF với nhiều backend (pypdf, pdfplumber, pdfminer)
+
+Project dùng cả pypdf (Backend/app.py, api/, script Crawldata) lẫn pdfplumber
+(PDFExtractorService). Mỗi backend ở đây có cùng interface:
+
+- page_count(): số trang, lấy từ bảng vị trí trang của LazyPdf (không parse cả PDF);
+- page_text(i): text một trang;
+- iter_pages(start, stop): duyệt tuần tự, giải phóng object của các trang đã
+  lấy text - bộ nhớ bị chặn, không tăng theo số trang đã duyệt (khác với vòng
+  lặp trên `pdf.pages` của pdfplumber, nơi mỗi Page giữ cache layout của nó).
+
+Chọn backend theo tên (open_backend) để mỗi job dùng backend nhanh nhất cho nó;
+so sánh tốc độ/bộ nhớ bằng Crawldata/benchmark_pdf_backends.py.
+"""
+import logging
+import os
+
+from .lazy_pdf import LazyPdf
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BACKEND = os.getenv('PDF_TEXT_BACKEND', 'pypdf')
+# pypdf: bỏ cache object đã parse sau mỗi ngần này trang (bỏ sau từng trang thì font/resource
+# dùng chung bị parse lại liên tục, chậm ~5 lần)
+PYPDF_RELEASE_EVERY = 50
+
+
+class PdfTextBackend:
+    """Interface chung; lớp con cài đặt _read_page và _iter_texts"""
+
+    name = None
+
+    def __init__(self, pdf_path):
+        self.pdf_path = pdf_path
+        # Bảng vị trí trang dùng chung cho mọi backend để đếm trang mà không parse cả PDF
+        self._lazy_pdf = LazyPdf(pdf_path)
+
+    def page_count(self):
+        return len(self._lazy_pdf)
+
+    def page_text(self, page_index):
+        """
+        Text của trang (index từ 0)
+
+        Raises:
+            IndexError: page_index ngoài phạm vi
+        """
+        if page_index < 0 or page_index >= self.page_count():
+            raise IndexError(f"Page index {page_index} out of range (0-{self.page_count() - 1})")
+        return self._read_page(page_index) or ''
+
+    def iter_pages(self, start=0, stop=None):
+        """
+        Duyệt text các trang [start, stop) theo thứ tự, không giữ lại object của trang đã duyệt
+
+        Yields:
+            tuple: (page_index, text)
+        """
+        count = self.page_count()
+        stop = count if stop is None else min(stop, count)
+        if start >= stop:
+            return
+        yield from self._iter_texts(max(start, 0), stop)
+
+    def _read_page(self, page_index):
+        raise NotImplementedError
+
+    def _iter_texts(self, start, stop):
+        raise NotImplementedError
+
+    def close(self):
+        self._lazy_pdf.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PypdfBackend(PdfTextBackend):
+    """pypdf qua LazyPdf (mmap, parse từng trang) - cùng text với Backend/app.py và store"""
+
+    name = 'pypdf'
+
+    def _read_page(self, page_index):
+        return self._lazy_pdf.page_text(page_index)
+
+    def _iter_texts(self, start, stop):
+        for page_index in range(start, stop):
+            text = self._lazy_pdf.page_text(page_index) or ''
+            if (page_index - start + 1) % PYPDF_RELEASE_EVERY == 0:
+                # Bỏ cache object đã parse (trang, content stream, font...) của các trang vừa đọc
+                self._lazy_pdf.release()
+            yield page_index, text
+        self._lazy_pdf.release()
+
+
+class PdfplumberBackend(PdfTextBackend):
+    """pdfplumber - text theo layout (PDFExtractorService)"""
+
+    name = 'pdfplumber'
+
+    def __init__(self, pdf_path):
+        super().__init__(pdf_path)
+        self._pdf = None
+
+    def _open(self):
+        if self._pdf is None:
+            import pdfplumber
+
+            self._pdf = pdfplumber.open(self.pdf_path)
+        return self._pdf
+
+    def _read_page(self, page_index):
+        page = self._open().pages[page_index]
+        try:
+            return page.extract_text()
+        finally:
+            # Page nằm lâu dài trong pdf.pages: xóa cache layout/object sau khi lấy text
+            page.close()
+
+    def _iter_texts(self, start, stop):
+        import pdfplumber
+
+        # Mở riêng chỉ các trang cần duyệt, đóng ngay khi xong
+        with pdfplumber.open(self.pdf_path, pages=range(start + 1, stop + 1)) as pdf:
+            for page_index, page in zip(range(start, stop), pdf.pages):
+                try:
+                    yield page_index, page.extract_text() or ''
+                finally:
+                    page.close()
+
+    def close(self):
+        if self._pdf is not None:
+            self._pdf.close()
+            self._pdf = None
+        super().close()
+
+
+class PdfminerBackend(PdfTextBackend):
+    """pdfminer.six trực tiếp - text theo layout, không có lớp Page/cache của pdfplumber"""
+
+    name = 'pdfminer'
+
+    def __init__(self, pdf_path):
+        super().__init__(pdf_path)
+        self._file = None
+        self._pages = None
+        self._interpreter = None
+        self._device = None
+
+    def _open(self):
+        if self._pages is None:
+            from pdfminer.converter import PDFPageAggregator
+            from pdfminer.layout import LAParams
+            from pdfminer.pdfdocument import PDFDocument
+            from pdfminer.pdfinterp import PDFPageInterpreter, PDFResourceManager
+            from pdfminer.pdfpage import PDFPage
+            from pdfminer.pdfparser import PDFParser
+
+            self._file = open(self.pdf_path, 'rb')
+            document = PDFDocument(PDFParser(self._file))
+            resources = PDFResourceManager(caching=False)
+            self._device = PDFPageAggregator(resources, laparams=LAParams())
+            self._interpreter = PDFPageInterpreter(resources, self._device)
+            # PDFPage chỉ là dict thuộc tính trang (nhẹ); layout dựng khi cần và bỏ ngay
+            self._pages = list(PDFPage.create_pages(document))
+        return self._pages
+
+    def _layout_text(self, page):
+        from pdfminer.layout import LTTextContainer
+
+        self._interpreter.process_page(page)
+        layout = self._device.get_result()
+        return ''.join(element.get_text() for element in layout if isinstance(element, LTTextContainer))
+
+    def _read_page(self, page_index):
+        pages = self._open()
+        return self._layout_text(pages[page_index])
+
+    def _iter_texts(self, start, stop):
+        pages = self._open()
+        for page_index in range(start, stop):
+            yield page_index, self._layout_text(pages[page_index])
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._pages = None
+        super().close()
+
+
+BACKENDS = {
+    PypdfBackend.name: PypdfBackend,
+    PdfplumberBackend.name: PdfplumberBackend,
+    PdfminerBackend.name: PdfminerBackend,
+}
+
+
+def open_backend(name, pdf_path):
+    """
+    Mở backend trích xuất text theo tên
+
+    Raises:
+        ValueError: Tên backend không có trong BACKENDS
+    """
+    backend = BACKENDS.get(name or DEFAULT_BACKEND)
+    if backend is None:
+        raise ValueError(f"Unknown PDF text backend {name!r}, expected one of {sorted(BACKENDS)}")
+    return backend(pdf_path)
@@ -0,0 +1,194 @@
+"""
+Prefix Index - Gợi ý tên thuốc/hoạt chất khi người dùng đang gõ (autocomplete)
+
+Dùng mảng key đã sắp xếp + binary search (bisect) thay cho trie: tìm khoảng
+các key bắt đầu bằng prefix tốn O(log n). Prefix khớp một khoảng nhỏ thì xếp
+hạng cả khoảng đó lúc truy vấn. Prefix khớp khoảng lớn (vd: "p", "500", "inj")
+thì top gợi ý đã được xếp hạng sẵn lúc dựng index, nên chi phí truy vấn không
+tăng theo kích thước catalog:
+
+- Thứ tự xếp hạng (trừ ưu tiên khớp chính xác) không phụ thuộc prefix, nên
+  top-k của một prefix là top-k gộp từ top-k của các prefix dài hơn 1 ký tự
+  (node con) và các entry bằng đúng prefix. Chỉ node có khoảng > ngưỡng mới
+  được lưu; node con nhỏ được xếp hạng trực tiếp khi dựng.
+
+Mỗi tên được index cả theo key đầy đủ lẫn theo từng từ bên trong
+("panadol extra" -> "panadol extra", "extra"), để gõ "extra" cũng gợi ý được.
+"""
+import heapq
+import logging
+from bisect import bisect_left
+
+from .text_utils import fold_key
+
+logger = logging.getLogger(__name__)
+
+KIND_DRUG = 'drug'
+KIND_INGREDIENT = 'ingredient'
+
+# Khớp từ đầu key được ưu tiên hơn khớp từ giữa key
+_MATCH_FULL = 0
+_MATCH_TOKEN = 1
+_KIND_ORDER = {KIND_DRUG: 0, KIND_INGREDIENT: 1}
+
+# Prefix khớp nhiều hơn số entry này có top gợi ý xếp hạng sẵn (giữ PRECOMPUTED_LIMIT gợi ý)
+HEAVY_PREFIX_SIZE = 256
+PRECOMPUTED_LIMIT = 50
+# Lớn hơn mọi ký tự trong key: prefix + _KEY_END là cận trên của các key bắt đầu bằng prefix
+_KEY_END = '\U0010ffff'
+
+
+def _normalize_prefix(text):
+    """Chuẩn hóa prefix giống key trong index (viết thường, bỏ dấu, gộp khoảng trắng)"""
+    return ' '.join(fold_key(text).split())
+
+
+class Completion:
+    """Một tên (thuốc hoặc hoạt chất) có thể gợi ý, kèm các dòng trong catalog"""
+
+    __slots__ = ('key', 'text', 'kind', 'rows')
+
+    def __init__(self, key, text, kind, rows):
+        self.key = key
+        self.text = text
+        self.kind = kind
+        self.rows = rows
+
+
+class PrefixIndex:
+    def __init__(self, completions, heavy_prefix_size=HEAVY_PREFIX_SIZE):
+        """
+        Dựng index từ danh sách completion
+
+        Args:
+            completions: Danh sách (text, kind, rows) - rows là các dòng catalog có tên này
+            heavy_prefix_size: Prefix khớp nhiều hơn số entry này được xếp hạng sẵn
+        """
+        items = []
+        entries = []
+        for text, kind, rows in completions:
+            key = _normalize_prefix(text)
+            if not key:
+                continue
+            completion = Completion(key, text, kind, tuple(rows))
+            items.append(completion)
+            words = key.split(' ')
+            offset = 0
+            for position, word in enumerate(words):
+                match = _MATCH_FULL if position == 0 else _MATCH_TOKEN
+                # Hạng của entry (trừ ưu tiên khớp chính xác - phụ thuộc prefix): khớp đầu tên trước,
+                # tên thuốc trước hoạt chất, tên ngắn trước, rồi theo thứ tự catalog
+                rank = (match, _KIND_ORDER[kind], len(key), completion.rows[0])
+                entries.append((key[offset:], rank, completion))
+                offset += len(word) + 1
+
+        entries.sort(key=lambda e: e[0])
+        self._keys = [e[0] for e in entries]
+        self._entries = [(e[1], e[2]) for e in entries]
+        self.size = len(items)
+        self.heavy_prefix_size = heavy_prefix_size
+        self._heavy = {}
+        if len(self._keys) > heavy_prefix_size:
+            self._build_heavy('', 0, len(self._keys))
+        logger.info(f"Built prefix index: {self.size} names, {len(self._keys)} entries, "
+                    f"{len(self._heavy)} precomputed prefixes")
+
+    def _best_ranks(self, start, end, best=None):
+        """Hạng tốt nhất của mỗi completion trong khoảng entry [start, end): id -> (rank, completion)"""
+        best = {} if best is None else best
+        for i in range(start, end):
+            rank, completion = self._entries[i]
+            current = best.get(id(completion))
+            if current is None or rank < current[0]:
+                best[id(completion)] = (rank, completion)
+        return best
+
+    def _build_heavy(self, prefix, start, end):
+        """
+        Top PRECOMPUTED_LIMIT completion (theo hạng, không tính khớp chính xác) của khoảng
+        [start, end) = các key bắt đầu bằng prefix; lưu gợi ý của prefix nếu khoảng lớn
+
+        Returns:
+            list: Các (rank, completion) đã sắp xếp, mỗi completion một lần
+        """
+        if end - start <= self.heavy_prefix_size:
+            return heapq.nsmallest(PRECOMPUTED_LIMIT, self._best_ranks(start, end).values(),
+                                   key=lambda item: item[0])
+
+        # Các entry bằng đúng prefix đứng đầu khoảng, sau đó là từng node con (prefix + 1 ký tự)
+        depth = len(prefix)
+        i = start
+        while i < end and len(self._keys[i]) == depth:
+            i += 1
+        best = self._best_ranks(start, i)
+        exact = [completion for _, completion in sorted(best.values(), key=lambda item: item[0])
+                 if completion.key == prefix]
+        while i < end:
+            child = prefix + self._keys[i][depth]
+            child_end = bisect_left(self._keys, child + _KEY_END, i, end)
+            for rank, completion in self._build_heavy(child, i, child_end):
+                current = best.get(id(completion))
+                if current is None or rank < current[0]:
+                    best[id(completion)] = (rank, completion)
+            i = child_end
+
+        top = heapq.nsmallest(PRECOMPUTED_LIMIT, best.values(), key=lambda item: item[0])
+        # Khớp chính xác đứng đầu, rồi tới các tên còn lại theo hạng
+        suggestions = exact + [completion for _, completion in top if completion.key != prefix]
+        self._heavy[prefix] = suggestions[:PRECOMPUTED_LIMIT]
+        return top
+
+    @classmethod
+    def from_catalog(cls, catalog):
+        """Dựng index từ tên thuốc và hoạt chất trong DrugCatalog (mỗi tên một completion)"""
+        grouped = {}
+        for record in catalog:
+            for text, kind in ((record.name, KIND_DRUG), (record.ingredient, KIND_INGREDIENT)):
+                key = (_normalize_prefix(text), kind)
+                if key[0]:
+                    grouped.setdefault(key, (text, kind, []))[2].append(record.row)
+        return cls(grouped.values())
+
+    def complete(self, prefix, limit=10):
+        """
+        Gợi ý các tên bắt đầu bằng prefix (hoặc có một từ bắt đầu bằng prefix)
+
+        Thứ tự: khớp chính xác > khớp đầu tên > khớp một từ bên trong,
+        sau đó tên thuốc trước hoạt chất, tên ngắn trước, rồi theo thứ tự catalog.
+
+        Args:
+            prefix: Text người dùng đang gõ
+            limit: Số gợi ý tối đa
+
+        Returns:
+            list: Các Completion (key, text, kind, rows) đã xếp hạng
+        """
+        prefix = _normalize_prefix(prefix)
+        if not prefix or limit <= 0:
+            return []
+        suggestions = self._heavy.get(prefix)
+        if suggestions is not None and limit <= PRECOMPUTED_LIMIT:
+            return suggestions[:limit]
+        return self._rank(prefix, limit)
+
+    def _rank(self, prefix, limit):
+        """Xếp hạng mọi entry bắt đầu bằng prefix (đã chuẩn hóa), lấy limit tên đầu"""
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + _KEY_END, start)
+        candidates = []
+        for i in range(start, end):
+            rank, completion = self._entries[i]
+            candidates.append((completion.key != prefix, rank, completion))
+        candidates.sort(key=lambda c: c[:2])
+
+        results = []
+        seen = set()
+        for _, _, completion in candidates:
+            # Một tên có thể khớp nhiều lần (đầu tên và từ bên trong) - chỉ lấy một lần
+            if id(completion) in seen:
+                continue
+            seen.add(id(completion))
+            results.append(completion)
+            if len(results) >= limit:
+                break
+        return results
@@ -0,0 +1,121 @@
+"""
+Prompt Context - Chọn phần text chuyên luận đưa vào prompt tổng hợp, trong giới hạn token
+
+Thay cho việc cắt mù pdf_text[:4000]: text trang PDF thường gồm cả chuyên luận
+bên cạnh (tốn token, dễ làm LLM lẫn thuốc), còn chuyên luận dài thì bị cắt mất
+mục liều dùng nằm ở cuối. Ở đây:
+
+1. Nếu text có nhiều chuyên luận (cả trang, không có span index), chỉ giữ
+   chuyên luận có tiêu đề khớp thuốc cần tổng hợp (cùng cách nhận tiêu đề với
+   core/monograph_spans.py).
+2. Tách các mục bằng tokenizer dùng chung và chỉ lấy các mục dùng cho cách
+   dùng/lưu ý (CONTEXT_SECTIONS), theo thứ tự ưu tiên.
+3. Chia đều ngân sách token cho các mục (mục ngắn hơn phần chia thì phần dư
+   chuyển cho mục khác), mục dài bị cắt ở cuối câu - mục nào cũng có mặt.
+
+Không tách được mục nào thì dùng phần đầu text như trước (cắt theo ngân sách).
+"""
+import os
+
+from .llm_client import CHARS_PER_TOKEN
+from .monograph_spans import find_titles
+from .page_offset_map import MIN_PARTIAL_TITLE_LENGTH
+from .section_tokenizer import split_sections
+from .text_utils import fold_key
+
+DEFAULT_TOKEN_BUDGET = int(os.getenv('SUMMARY_TOKEN_BUDGET', 1200))
+
+# Mục dùng cho "cách dùng" và "lưu ý", theo thứ tự trong prompt
+CONTEXT_SECTIONS = ('dosage', 'usage', 'contraindications', 'precautions', 'interactions', 'side_effects', 'storage')
+# Mục bị cắt ngắn hơn phần này của phần được chia thì cắt cứng thay vì lùi về cuối câu
+MIN_CUT_RATIO = 0.5
+TRUNCATION_MARK = ' ...'
+
+
+def focus_monograph(text, drug_name):
+    """
+    Đoạn chuyên luận của `drug_name` trong text (từ tiêu đề tới tiêu đề kế tiếp)
+
+    Returns:
+        str: Đoạn chuyên luận, hoặc cả text nếu không tìm thấy tiêu đề khớp
+    """
+    key = fold_key(drug_name or '')
+    if not key or not text:
+        return text
+    titles = find_titles([text])
+    title_keys = [fold_key(title) for title, _, _ in titles]
+    position = title_keys.index(key) if key in title_keys else None
+    if position is None:
+        # Hoạt chất kèm tên muối ("Cetirizin hydroclorid") - tiêu đề là một phần của nó hoặc ngược lại;
+        # key ngắn thì không so khớp một phần (giống locate_title_pages)
+        position = next((i for i, title_key in enumerate(title_keys)
+                         if min(len(title_key), len(key)) >= MIN_PARTIAL_TITLE_LENGTH
+                         and (title_key in key or key in title_key)), None)
+    if position is None:
+        return text
+    end = titles[position + 1][2] if position + 1 < len(titles) else len(text)
+    return text[titles[position][2]:end]
+
+
+def _cut(text, max_chars):
+    """Cắt text còn tối đa max_chars ký tự, ưu tiên cắt ở cuối câu/dòng"""
+    if len(text) <= max_chars:
+        return text
+    # Chừa chỗ cho " ..." đánh dấu phần bị cắt
+    head = text[:max(max_chars - len(TRUNCATION_MARK), 0)]
+    end = max(head.rfind('. '), head.rfind('\n'))
+    if end >= len(head) * MIN_CUT_RATIO:
+        head = head[:end + 1]
+    return head.rstrip() + TRUNCATION_MARK
+
+
+def _allocate(lengths, budget):
+    """
+    Chia budget ký tự cho các mục: mỗi mục nhận phần bằng nhau, mục ngắn hơn thì phần dư
+    chia lại cho các mục còn lại
+
+    Returns:
+        list: Số ký tự được dùng của từng mục (cùng thứ tự với lengths)
+    """
+    allocation = [0] * len(lengths)
+    remaining = budget
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i])
+    for position, i in enumerate(order):
+        share = remaining // (len(order) - position)
+        allocation[i] = min(lengths[i], share)
+        remaining -= allocation[i]
+    return allocation
+
+
+def build_prompt_context(text, drug_name=None, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Text chuyên luận đưa vào prompt: các mục liên quan tới cách dùng/lưu ý của thuốc,
+    tổng cộng không quá token_budget token (ước tính)
+
+    Args:
+        text: Text chuyên luận (hoặc cả trang PDF)
+        drug_name: Tên hoạt chất/thuốc để chọn đúng chuyên luận trong trang
+        token_budget: Số token tối đa của phần text
+
+    Returns:
+        tuple: (context, labels) - labels là các mục đã chọn (rỗng nếu dùng phần đầu text)
+    """
+    max_chars = token_budget * CHARS_PER_TOKEN
+    text = focus_monograph(text or '', drug_name)
+
+    # Mục đầu tiên của mỗi nhãn (tiêu đề giữ nguyên như trong Dược thư)
+    found = {}
+    for label, heading, body in split_sections(text):
+        if label in CONTEXT_SECTIONS and body and label not in found:
+            found[label] = (heading, body)
+    if not found:
+        return _cut(text.strip(), max_chars), []
+
+    labels = [label for label in CONTEXT_SECTIONS if label in found]
+    headings = [f"{found[label][0]}:\n" for label in labels]
+    # Tiêu đề và dòng trống giữa các mục cũng tính vào ngân sách
+    overhead = sum(len(heading) for heading in headings) + 2 * (len(labels) - 1)
+    allocation = _allocate([len(found[label][1]) for label in labels], max(max_chars - overhead, 0))
+    selected = [(label, heading, chars) for label, heading, chars in zip(labels, headings, allocation) if chars]
+    context = '\n\n'.join(heading + _cut(found[label][1], chars) for label, heading, chars in selected)
+    return context, [label for label, _, _ in selected]
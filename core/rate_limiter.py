@@ -0,0 +1,44 @@
+"""
+Rate Limiter - Token bucket giới hạn số lần gọi API mỗi giây (dùng chung giữa các thread)
+
+Bucket chứa tối đa `capacity` token, được nạp lại đều `rate` token mỗi giây;
+mỗi lần gọi lấy một token, hết token thì chờ tới khi có. Cho phép dồn tối đa
+`capacity` lần gọi ngay lúc đầu, sau đó giữ đúng tốc độ trung bình `rate` -
+khớp với quota dạng "N request mỗi phút" của Gemini.
+"""
+import threading
+import time
+
+
+class TokenBucket:
+    def __init__(self, rate, capacity=None):
+        """
+        Args:
+            rate: Số token nạp lại mỗi giây (vd: 60 request/phút -> 1.0)
+            capacity: Số token tối đa (mặc định bằng rate, ít nhất 1)
+        """
+        if rate <= 0:
+            raise ValueError("rate phải > 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited_seconds = 0.0
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def acquire(self, tokens=1):
+        """Lấy `tokens` token, chờ (block) nếu bucket chưa đủ"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+                self.waited_seconds += wait
+            time.sleep(wait)
@@ -0,0 +1,145 @@
+"""
+Result Cache - Cache LRU có giới hạn kích thước và TTL cho kết quả tra cứu
+
+Dùng trước các bước tốn kém lặp lại cho cùng một input (tra thuốc theo text
+OCR, trích xuất chi tiết từ trang PDF). Khi dữ liệu nguồn được load lại thì
+gọi clear(): mọi entry cũ bị xóa và kết quả đang tính dở từ dữ liệu cũ sẽ
+không được ghi vào cache (nhờ số thế hệ - generation).
+
+Các lần cache miss đồng thời cho cùng một key (vd: nhiều người scan cùng một
+sản phẩm) được gộp thành một lần compute() (SingleFlight); số caller được gộp
+có trong stats() ('coalesced').
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from .single_flight import SingleFlight
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class ResultCache:
+    def __init__(self, maxsize=1024, ttl=3600, name='cache'):
+        """
+        Args:
+            maxsize: Số entry tối đa (vượt quá thì bỏ entry ít dùng nhất)
+            ttl: Thời gian sống của một entry (giây), None = không hết hạn
+            name: Tên cache (để log/thống kê)
+        """
+        if maxsize <= 0:
+            raise ValueError("maxsize phải > 0")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.name = name
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._flight = SingleFlight(name)
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key, default=None):
+        """Lấy giá trị còn hạn theo key (đánh dấu vừa dùng), không có thì trả về default"""
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def _peek(self, key):
+        """Giá trị còn hạn theo key (đã giữ lock), không tính vào thống kê"""
+        entry = self._entries.get(key)
+        if entry is not None and (entry[0] is None or entry[0] > time.monotonic()):
+            return entry[1]
+        return _MISSING
+
+    def _lookup(self, key):
+        """Tìm entry (đã giữ lock), cập nhật thống kê hit/miss"""
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, value = entry
+            if expires_at is None or expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return value
+            del self._entries[key]
+            self.expirations += 1
+        self.misses += 1
+        return _MISSING
+
+    def set(self, key, value, generation=None):
+        """
+        Ghi giá trị vào cache
+
+        Args:
+            generation: Thế hệ lúc bắt đầu tính value; nếu cache đã clear() sau đó
+                        thì bỏ qua (value được tính từ dữ liệu cũ)
+        """
+        expires_at = None if self.ttl is None else time.monotonic() + self.ttl
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute, should_cache=None):
+        """
+        Lấy từ cache, nếu chưa có thì gọi compute() rồi lưu lại
+
+        Các caller cache miss cùng key trong lúc compute() đang chạy chờ và dùng chung kết quả
+        (kể cả kết quả không được lưu, vd: Gemini lỗi) thay vì tính lại.
+
+        Args:
+            should_cache: Hàm kiểm tra kết quả có nên lưu không (mặc định lưu tất cả, kể cả None)
+        """
+        with self._lock:
+            value = self._lookup(key)
+        if value is not _MISSING:
+            return value
+        return self._flight.do(key, lambda: self._compute(key, compute, should_cache))
+
+    def _compute(self, key, compute, should_cache):
+        """Leader của single-flight: kiểm tra lại cache (leader trước có thể vừa ghi xong) rồi tính"""
+        with self._lock:
+            value = self._peek(key)
+            generation = self._generation
+        if value is not _MISSING:
+            return value
+        value = compute()
+        if should_cache is None or should_cache(value):
+            self.set(key, value, generation=generation)
+        return value
+
+    def clear(self):
+        """Xóa toàn bộ cache (gọi khi dữ liệu nguồn được load lại)"""
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+        logger.info(f"Cleared result cache '{self.name}'")
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """Thống kê để chọn kích thước cache theo traffic thật"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'coalesced': self._flight.coalesced,
+            }
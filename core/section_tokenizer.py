@@ -0,0 +1,138 @@
+"""
+Section Tokenizer - Tách text chuyên luận Dược thư thành các mục (Chỉ định, Chống chỉ định...)
+
+Dùng chung cho extract_drug_details_from_pdf (Backend/app.py, api/utils.py) và
+PDFExtractorService.parse_drug_info. Thay cho việc mỗi lần parse lại compile
+từng regex rồi quét text một lần cho mỗi mục (hoặc lặp mục × từ khóa × dòng):
+mọi tiêu đề mục được gộp thành một trie (kiểu goto của Aho-Corasick; tiêu đề
+luôn ở đầu dòng nên không cần failure link) rồi compile thành MỘT regex ở mức
+module. Regex neo vào ký tự xuống dòng nên re tìm nhanh tới đầu dòng kế tiếp,
+ở mỗi đầu dòng chỉ đi một nhánh trie - text được quét một lần và cắt thành
+các mục theo vị trí tiêu đề.
+
+Tiêu đề mục: từ khóa ở đầu dòng (có thể kèm số thứ tự/gạch đầu dòng và chú
+thích trong ngoặc như "(ADR)"), theo sau là ":" / "." hoặc hết dòng - nên câu
+trong nội dung bắt đầu bằng "Sử dụng..." không bị coi là tiêu đề. Từ khóa dài hơn được ưu tiên ("Chống chỉ định" trước
+"Chỉ định", "Tác dụng phụ" trước "Tác dụng").
+"""
+import re
+import unicodedata
+
+# Nhãn mục -> các tiêu đề (viết thường, có dấu)
+SECTION_HEADINGS = {
+    'composition': ('thành phần chính', 'thành phần', 'hoạt chất', 'active ingredient'),
+    'dosage_form': ('dạng thuốc và hàm lượng', 'dạng bào chế', 'hàm lượng', 'dosage form'),
+    'indications': ('chỉ định', 'công dụng', 'tác dụng', 'indication'),
+    'contraindications': ('chống chỉ định', 'không dùng', 'contraindication'),
+    'side_effects': ('tác dụng không mong muốn', 'tác dụng phụ', 'phản ứng có hại', 'side effect'),
+    'dosage': ('liều lượng và cách dùng', 'liều dùng', 'liều lượng', 'dosage'),
+    'usage': ('cách dùng', 'hướng dẫn sử dụng', 'cách sử dụng', 'sử dụng'),
+    'precautions': ('thận trọng', 'lưu ý', 'cảnh báo', 'precaution'),
+    'interactions': ('tương tác thuốc', 'tương tác', 'interaction'),
+    'storage': ('bảo quản', 'storage'),
+}
+
+_SPACES = re.compile(r'[\s_]+')
+
+
+def _normalize_heading(heading):
+    return _SPACES.sub(' ', heading.lower())
+
+
+def _trie_pattern(keywords):
+    """
+    Regex khớp một trong các từ khóa, dựng từ trie ký tự
+
+    Tiền tố chung chỉ xuất hiện một lần ("t(?:hành phần(?: chính)?|ác dụng...)"), nhánh
+    tiếp nối là greedy nên từ khóa dài nhất được ưu tiên.
+    """
+    trie = {}
+    for keyword in keywords:
+        node = trie
+        for ch in keyword:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def emit(node):
+        branches = [(r'[ \t_]+' if ch == ' ' else re.escape(ch)) + emit(child)
+                    for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + pattern + ')?' if '' in node else pattern
+
+    return emit(trie)
+
+
+class SectionTokenizer:
+    def __init__(self, headings=SECTION_HEADINGS):
+        """
+        Args:
+            headings: Dict nhãn mục -> tuple tiêu đề (không phân biệt hoa thường,
+                      khoảng trắng/gạch dưới giữa các từ được coi như nhau)
+        """
+        self._labels = {}
+        for label, keywords in headings.items():
+            for keyword in keywords:
+                self._labels.setdefault(_normalize_heading(keyword), label)
+        # Neo vào "\n" (split() thêm "\n" vào đầu text) thay vì ^ của MULTILINE:
+        # re tìm chuỗi literal rất nhanh, còn ^ bị thử ở mọi vị trí
+        self._pattern = re.compile(
+            r'\n[ \t•*\-–]*(?:\d+[.)][ \t]*)?(' + _trie_pattern(self._labels) + r')'
+            r'(?:[ \t]*\([^)\n]*\))?[ \t]*(?:[:.]|(?=\n))',
+            re.IGNORECASE
+        )
+
+    def split(self, text):
+        """
+        Tách text thành các mục theo thứ tự xuất hiện (một lần quét)
+
+        Returns:
+            list: (label, heading, body) - body là nội dung tới tiêu đề kế tiếp, đã strip;
+                  phần trước tiêu đề đầu tiên (nếu có) có label None
+        """
+        if not text:
+            return []
+        if not unicodedata.is_normalized('NFC', text):
+            text = unicodedata.normalize('NFC', text)
+        text = '\n' + text + '\n'
+        sections = []
+        label, heading, body_start = None, '', 0
+        for match in self._pattern.finditer(text):
+            body = text[body_start:match.start()].strip()
+            if label is not None or body:
+                sections.append((label, heading, body))
+            heading = match.group(1)
+            label = self._labels.get(heading.lower()) or self._labels[_normalize_heading(heading)]
+            body_start = match.end()
+        body = text[body_start:].strip()
+        if label is not None or body:
+            sections.append((label, heading, body))
+        return sections
+
+    def sections(self, text):
+        """
+        Nội dung mục đầu tiên của mỗi nhãn
+
+        Returns:
+            dict: label -> body (chỉ các mục có nội dung)
+        """
+        found = {}
+        for label, _, body in self.split(text):
+            if label is not None and body and label not in found:
+                found[label] = body
+        return found
+
+
+# Tokenizer dùng chung (compile một lần khi import)
+default_tokenizer = SectionTokenizer()
+
+
+def split_sections(text):
+    """Tách text bằng tokenizer mặc định (xem SectionTokenizer.split)"""
+    return default_tokenizer.split(text)
+
+
+def find_sections(text):
+    """Mục đầu tiên của mỗi nhãn bằng tokenizer mặc định (xem SectionTokenizer.sections)"""
+    return default_tokenizer.sections(text)
@@ -0,0 +1,85 @@
+"""
+Single Flight - Gộp các lần tính đồng thời cho cùng một key thành một lần tính
+
+Khi một sản phẩm phổ biến được nhiều người scan cùng lúc, mọi request đều
+cache miss cùng lúc rồi cùng đọc/parse một trang PDF và gửi cùng một prompt
+cho Gemini (thundering herd). Với SingleFlight, request đầu tiên (leader) tính,
+các request cùng key đến trong lúc đó chờ và dùng chung kết quả (hoặc lỗi) của
+leader. Không cache gì sau khi xong - cache là việc của ResultCache/SummaryCache.
+
+Lưu ý: compute() không được gọi lại do() với cùng key trên cùng thread (sẽ tự chờ mình).
+"""
+import threading
+
+
+class _Call:
+    """Một lần tính đang chạy: kết quả/lỗi được chia cho các caller đang chờ"""
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name='single_flight'):
+        """
+        Args:
+            name: Tên (để thống kê)
+        """
+        self.name = name
+        self._calls = {}  # key -> _Call đang chạy
+        self._lock = threading.Lock()
+        self.executions = 0
+        self.coalesced = 0
+
+    def do(self, key, compute):
+        """
+        Kết quả compute() cho key; nếu đang có lần tính cùng key thì chờ và dùng chung kết quả đó
+
+        Raises:
+            Exception: Lỗi của compute() (của leader, kể cả với các caller đang chờ)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executions += 1
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.value
+
+        try:
+            call.value = compute()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.value
+
+    def in_flight(self):
+        """Số key đang được tính"""
+        with self._lock:
+            return len(self._calls)
+
+    def stats(self):
+        """Số lần tính thật và số caller được gộp (không phải tính lại)"""
+        with self._lock:
+            requests = self.executions + self.coalesced
+            return {
+                'name': self.name,
+                'executions': self.executions,
+                'coalesced': self.coalesced,
+                'coalesce_rate': round(self.coalesced / requests, 4) if requests else 0.0,
+                'in_flight': len(self._calls),
+            }
@@ -0,0 +1,199 @@
+"""
+Summary Cache - Cache bền (SQLite, WAL) cho kết quả tổng hợp {usage, notes} của Gemini
+
+Mỗi lần scan thuốc OTC, summarize_drug_info_with_gemini gửi vài nghìn ký tự
+text chuyên luận cho Gemini và chờ kết quả, dù chuyên luận đó đã được tổng hợp
+hàng nghìn lần trước. Cache này lưu kết quả ra file SQLite nên:
+
+- còn nguyên sau khi restart, và dùng chung giữa Backend (Flask) và api/scan.py
+  (nhiều process cùng đọc/ghi nhờ WAL);
+- khóa là (monograph_id, hash text nguồn, phiên bản prompt): text chuyên luận
+  đổi (PDF mới, span/offset khác) hoặc prompt đổi thì entry cũ tự nhiên không
+  còn khớp;
+- entry hết hạn sau TTL; xóa chủ động bằng invalidate() (xem
+  Crawldata/invalidate_summary_cache.py).
+
+Không ghi được (vd: thư mục chỉ đọc trên serverless) thì mở chỉ đọc nếu file đã
+có sẵn, không thì không dùng cache (trả về None, caller gọi Gemini như cũ).
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+CACHE_SUFFIX = '.summaries.sqlite'
+SCHEMA_VERSION = '1'
+DEFAULT_TTL_SECONDS = int(os.getenv('SUMMARY_CACHE_TTL', 30 * 24 * 3600))
+# Chờ tối đa (giây) khi process khác đang ghi
+BUSY_TIMEOUT_SECONDS = 5
+
+
+def default_cache_path(pdf_path):
+    """Đường dẫn cache mặc định, cạnh file PDF: "<pdf>.summaries.sqlite" """
+    return os.path.splitext(pdf_path)[0] + CACHE_SUFFIX
+
+
+def source_hash(text):
+    """Hash (SHA-256) của text nguồn gửi cho Gemini"""
+    return hashlib.sha256((text or '').encode('utf-8')).hexdigest()
+
+
+class SummaryCache:
+    def __init__(self, cache_path, ttl=DEFAULT_TTL_SECONDS, read_only=False):
+        """
+        Args:
+            cache_path: Đường dẫn file SQLite (tạo mới nếu chưa có)
+            ttl: Thời gian sống của một entry (giây), None = không hết hạn
+            read_only: Chỉ đọc (file có sẵn, thư mục không ghi được)
+
+        Raises:
+            sqlite3.Error: Không mở/tạo được file
+        """
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.read_only = read_only
+        if read_only:
+            # immutable: không cần tạo file -wal/-shm cạnh DB
+            self._conn = sqlite3.connect(f"file:{cache_path}?mode=ro&immutable=1", uri=True,
+                                         check_same_thread=False)
+        else:
+            self._conn = sqlite3.connect(cache_path, timeout=BUSY_TIMEOUT_SECONDS, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS summaries (monograph_id TEXT NOT NULL, "
+                               "source_hash TEXT NOT NULL, prompt_version TEXT NOT NULL, "
+                               "usage TEXT NOT NULL, notes TEXT NOT NULL, created_at REAL NOT NULL, "
+                               "PRIMARY KEY (monograph_id, source_hash, prompt_version))")
+            self._conn.execute("INSERT OR IGNORE INTO meta VALUES ('schema_version', ?)", (SCHEMA_VERSION,))
+            self._conn.commit()
+        schema_version = self._conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()
+        if schema_version is None or schema_version[0] != SCHEMA_VERSION:
+            self._conn.close()
+            raise sqlite3.DatabaseError(f"schema {schema_version}, expected {SCHEMA_VERSION}")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+
+    @classmethod
+    def open(cls, cache_path, ttl=DEFAULT_TTL_SECONDS):
+        """
+        Mở cache để đọc/ghi; không ghi được thì mở chỉ đọc nếu file đã có
+
+        Returns:
+            SummaryCache hoặc None (không mở được)
+        """
+        try:
+            return cls(cache_path, ttl)
+        except sqlite3.Error as e:
+            if not os.path.exists(cache_path):
+                logger.warning(f"Cannot open summary cache {cache_path}: {e}")
+                return None
+            logger.warning(f"Summary cache {cache_path} is not writable ({e}), opening read-only")
+        try:
+            return cls(cache_path, ttl, read_only=True)
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot open summary cache {cache_path}: {e}")
+            return None
+
+    def _is_fresh(self, created_at, now):
+        return self.ttl is None or now - created_at < self.ttl
+
+    def get(self, monograph_id, source_text, prompt_version):
+        """
+        Kết quả đã tổng hợp cho chuyên luận với đúng text nguồn và phiên bản prompt
+
+        Returns:
+            dict: {'usage', 'notes'} (bản mới mỗi lần gọi), None nếu chưa có hoặc đã hết hạn
+        """
+        key = (monograph_id, source_hash(source_text), prompt_version)
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT usage, notes, created_at FROM summaries "
+                    "WHERE monograph_id = ? AND source_hash = ? AND prompt_version = ?", key).fetchone()
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot read summary cache {self.cache_path}: {e}")
+            row = None
+        if row is None or not self._is_fresh(row[2], time.time()):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return {'usage': row[0], 'notes': row[1]}
+
+    def put(self, monograph_id, source_text, prompt_version, summary):
+        """
+        Lưu kết quả tổng hợp (ghi đè entry cùng khóa); lỗi ghi chỉ log, không raise
+
+        Args:
+            summary: dict có 'usage' và 'notes'
+        """
+        if self.read_only:
+            return
+        row = (monograph_id, source_hash(source_text), prompt_version,
+               summary.get('usage', '') or '', summary.get('notes', '') or '', time.time())
+        try:
+            with self._lock:
+                self._conn.execute("INSERT OR REPLACE INTO summaries VALUES (?, ?, ?, ?, ?, ?)", row)
+                self._conn.commit()
+            self.writes += 1
+        except sqlite3.Error as e:
+            logger.warning(f"Cannot write summary cache {self.cache_path}: {e}")
+
+    def invalidate(self, monograph_id=None, prompt_version=None):
+        """
+        Xóa các entry của một chuyên luận và/hoặc một phiên bản prompt (không truyền gì = xóa hết)
+
+        Returns:
+            int: Số entry đã xóa
+        """
+        conditions, params = [], []
+        if monograph_id is not None:
+            conditions.append("monograph_id = ?")
+            params.append(monograph_id)
+        if prompt_version is not None:
+            conditions.append("prompt_version = ?")
+            params.append(prompt_version)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self._delete(f"DELETE FROM summaries{where}", params)
+
+    def purge_expired(self):
+        """Xóa các entry đã hết hạn, trả về số entry đã xóa"""
+        if self.ttl is None:
+            return 0
+        return self._delete("DELETE FROM summaries WHERE created_at <= ?", [time.time() - self.ttl])
+
+    def _delete(self, sql, params):
+        if self.read_only:
+            return 0
+        with self._lock:
+            deleted = self._conn.execute(sql, params).rowcount
+            self._conn.commit()
+        logger.info(f"Removed {deleted} entries from summary cache {self.cache_path}")
+        return deleted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM summaries").fetchone()[0]
+
+    def stats(self):
+        """Thống kê hit/miss (trong process này) để theo dõi số lần gọi Gemini tiết kiệm được"""
+        lookups = self.hits + self.misses
+        return {
+            'name': 'summary',
+            'path': self.cache_path,
+            'read_only': self.read_only,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'writes': self.writes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
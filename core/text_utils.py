@@ -0,0 +1,39 @@
+"""
+Text Utils - Chuẩn hóa text dùng chung cho catalog và các index tìm kiếm
+"""
+import re
+import unicodedata
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+# đ/Đ không phải chữ có dấu tổ hợp nên NFD không tách được, phải map riêng
+_LETTER_FOLDS = str.maketrans({'đ': 'd', 'Đ': 'D'})
+
+
+def normalize_key(text):
+    """Chuẩn hóa text thành key tra cứu (NFC, bỏ khoảng trắng đầu/cuối, viết thường)"""
+    if not isinstance(text, str):
+        return ''
+    return unicodedata.normalize('NFC', text).strip().lower()
+
+
+def fold_diacritics(text):
+    """
+    Bỏ dấu tiếng Việt: "Hoạt chất" -> "Hoat chat", "đau" -> "dau"
+
+    Tách ký tự thành chữ gốc + dấu (NFD), bỏ các dấu tổ hợp rồi ghép lại (NFC).
+    """
+    decomposed = unicodedata.normalize('NFD', text.translate(_LETTER_FOLDS))
+    stripped = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return unicodedata.normalize('NFC', stripped)
+
+
+def fold_key(text):
+    """Key tìm kiếm không phân biệt dấu (normalize_key + bỏ dấu)"""
+    return fold_diacritics(normalize_key(text))
+
+
+def normalize_query(text):
+    """Chuẩn hóa query cho fuzzy matching (viết thường, bỏ dấu, bỏ ký tự đặc biệt, gộp khoảng trắng)"""
+    if not isinstance(text, str):
+        return ''
+    return ' '.join(_PUNCTUATION.sub('', fold_key(text)).split())
@@ -0,0 +1,107 @@
+"""
+Trigram Index - Inverted index n-gram để tìm substring trong một cột text
+
+Thay cho `df[col].str.lower().str.contains(...)` quét toàn bộ cột: mỗi gram
+(1-3 ký tự) trỏ tới danh sách dòng chứa nó. Tìm substring = giao các posting
+list của needle rồi verify lại trên ứng viên, theo đúng thứ tự dòng gốc nên
+"dòng khớp đầu tiên" vẫn giống hệt `iloc[0]` của cách quét cũ.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+GRAM_SIZE = 3
+# Khi số ứng viên đã nhỏ hơn ngưỡng này thì verify trực tiếp, không giao tiếp nữa
+_VERIFY_THRESHOLD = 32
+
+
+def _grams(text, size):
+    """Các gram độ dài `size` của text (không trùng lặp)"""
+    return {text[i:i + size] for i in range(len(text) - size + 1)}
+
+
+class TrigramIndex:
+    def __init__(self, keys):
+        """
+        Dựng index cho một cột text đã chuẩn hóa
+
+        Args:
+            keys: Danh sách key theo thứ tự dòng (None/NaN = dòng không có giá trị)
+        """
+        self.keys = [key if isinstance(key, str) else None for key in keys]
+        self.size = len(self.keys)
+
+        # Exact match: key -> dòng đầu tiên có key đó
+        self.exact = {}
+        postings = {}
+        for row, key in enumerate(self.keys):
+            if key is None:
+                continue
+            self.exact.setdefault(key, row)
+            # Index cả gram 1-2 ký tự để needle ngắn cũng không phải quét cả cột
+            for size in range(1, GRAM_SIZE + 1):
+                for gram in _grams(key, size):
+                    postings.setdefault(gram, []).append(row)
+
+        self.postings = {gram: np.asarray(rows, dtype=np.int32) for gram, rows in postings.items()}
+        self.all_rows = np.asarray([row for row, key in enumerate(self.keys) if key is not None], dtype=np.int32)
+        logger.info(f"Built trigram index over {self.size} rows ({len(self.postings)} grams)")
+
+    def find_exact(self, needle):
+        """
+        Dòng đầu tiên có key bằng đúng needle
+
+        Returns:
+            int: Vị trí dòng, hoặc None nếu không có
+        """
+        return self.exact.get(needle)
+
+    def candidates(self, needle):
+        """
+        Ứng viên (chưa verify) cho các dòng chứa needle, sắp xếp theo thứ tự dòng
+        """
+        if not needle:
+            return self.all_rows
+
+        size = min(GRAM_SIZE, len(needle))
+        postings = []
+        for gram in _grams(needle, size):
+            rows = self.postings.get(gram)
+            if rows is None:
+                return np.empty(0, dtype=np.int32)
+            postings.append(rows)
+
+        # Giao từ posting list ngắn nhất để tập ứng viên co lại nhanh nhất
+        postings.sort(key=len)
+        candidates = postings[0]
+        for rows in postings[1:]:
+            if len(candidates) <= _VERIFY_THRESHOLD:
+                break
+            candidates = np.intersect1d(candidates, rows, assume_unique=True)
+        return candidates
+
+    def iter_containing(self, needle, start=0):
+        """
+        Duyệt (theo thứ tự dòng) các dòng có key chứa needle
+
+        Args:
+            start: Chỉ xét các dòng >= start (tiếp tục từ cursor phân trang)
+        """
+        candidates = self.candidates(needle)
+        if start > 0:
+            candidates = candidates[np.searchsorted(candidates, start):]
+        for row in candidates:
+            row = int(row)
+            if needle in self.keys[row]:
+                yield row
+
+    def find_first_containing(self, needle):
+        """
+        Dòng đầu tiên có key chứa needle (tương đương `iloc[0]` sau `str.contains`)
+
+        Returns:
+            int: Vị trí dòng, hoặc None nếu không có
+        """
+        return next(self.iter_containing(needle), None)
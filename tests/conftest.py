@@ -0,0 +1,23 @@
+"""
+Cấu hình pytest dùng chung: thêm thư mục gốc repo vào sys.path (import core)
+và fixture catalog thuốc thật từ Crawldata/drug_database_refined.csv
+"""
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+CATALOG_CSV = os.path.join(ROOT, 'Crawldata', 'drug_database_refined.csv')
+
+
+@pytest.fixture(scope='session')
+def catalog():
+    """DrugCatalog dựng từ CSV thuốc của repo (bỏ qua test nếu thiếu CSV)"""
+    if not os.path.exists(CATALOG_CSV):
+        pytest.skip(f"Missing {CATALOG_CSV}")
+    from core import DrugCatalog
+    return DrugCatalog.from_csv(CATALOG_CSV)
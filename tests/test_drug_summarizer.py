@@ -0,0 +1,53 @@
+"""Test prompt/hậu xử lý tổng hợp chuyên luận (với model giả lập)"""
+import os
+import subprocess
+import sys
+
+from core.drug_summarizer import (
+    NO_NOTES, NO_USAGE, PROMPT_VERSION, build_summary_prompt, parse_summary_response, summarize_monograph,
+)
+from core.llm_client import StubLLMClient, estimate_tokens
+from core.prompt_context import DEFAULT_TOKEN_BUDGET, build_prompt_context
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def prompt_version_with_budget(budget):
+    env = dict(os.environ, SUMMARY_TOKEN_BUDGET=str(budget))
+    output = subprocess.run([sys.executable, '-c', 'from core.drug_summarizer import PROMPT_VERSION; print(PROMPT_VERSION)'],
+                            cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return output.stdout.strip()
+
+
+def test_prompt_version_includes_the_token_budget():
+    assert PROMPT_VERSION.endswith(f"-b{DEFAULT_TOKEN_BUDGET}")
+    assert prompt_version_with_budget(800) != prompt_version_with_budget(1600)
+
+
+def test_prompt_context_respects_the_token_budget():
+    text = 'Liều lượng và cách dùng:\n' + 'Uống 1 viên mỗi ngày. ' * 500 + '\nChống chỉ định:\n' + 'Mẫn cảm. ' * 300
+    for budget in (50, 100, 1000):
+        context, labels = build_prompt_context(text, 'Paracetamol', budget)
+        assert estimate_tokens(context) <= budget
+        assert labels == ['dosage', 'contraindications']
+        assert context in build_summary_prompt(text, 'Paracetamol', {'ActiveIngredient': 'Paracetamol'},
+                                               token_budget=budget)
+
+
+def test_summarize_with_stub_client():
+    client = StubLLMClient()
+    summary = summarize_monograph(client, 'Liều dùng: uống 500 mg mỗi 6 giờ. ' * 5, 'Panadol',
+                                  {'ActiveIngredient': 'Paracetamol', 'Category': 'OTC'})
+    assert 'Panadol' in summary['usage']
+    assert client.stats()['calls'] == 1
+
+
+def test_short_source_text_skips_the_llm():
+    client = StubLLMClient()
+    assert summarize_monograph(client, 'ngắn', 'Panadol', {}) == {'usage': NO_USAGE, 'notes': NO_NOTES}
+    assert client.stats()['calls'] == 0
+
+
+def test_parse_normalizes_no_info_answers():
+    summary = parse_summary_response('```json\n{"usage": "Không tìm thấy thông tin", "notes": "ngắn"}\n```')
+    assert summary == {'usage': NO_USAGE, 'notes': NO_NOTES}
@@ -0,0 +1,64 @@
+"""Test FuzzyMatcher: kết quả phải giống hệt cách tính cũ (duyệt và chấm điểm từng dòng)"""
+from difflib import SequenceMatcher
+
+import pytest
+
+from core.fuzzy_matcher import MIN_WORD_LENGTH, WORD_MATCH_SCORE, FuzzyMatcher
+
+QUERIES = ['paracetamol', 'amoxicilin 500mg', 'panadol extra', 'vitamin c', 'ibuprofen 400',
+           'cetirizin', 'box of 20 tablets', 'xyz', 'omeprazol 20mg', 'vien nen bao phim']
+
+
+def brute_force(names, ingredients, query, threshold, limit=None, accept=None):
+    """Cách tính cũ: ratio với từng tên/hoạt chất, 0.8 nếu một từ của query nằm trong đó"""
+    words = [word for word in query.split() if len(word) >= MIN_WORD_LENGTH]
+    matches = []
+    for row, (name, ingredient) in enumerate(zip(names, ingredients)):
+        score = max(SequenceMatcher(None, query, name).ratio(), SequenceMatcher(None, query, ingredient).ratio())
+        if any(word in name or word in ingredient for word in words):
+            score = max(score, WORD_MATCH_SCORE)
+        score = round(score, 3)
+        if score >= threshold and (accept is None or accept(query, row, score)):
+            matches.append((row, score))
+    matches.sort(key=lambda m: (-m[1], m[0]))
+    return matches if limit is None else matches[:limit]
+
+
+@pytest.fixture(scope='module')
+def sample(catalog):
+    records = catalog.records[:1500]
+    names = [record.name_folded for record in records]
+    ingredients = [record.ingredient_folded for record in records]
+    return names, ingredients, FuzzyMatcher(names, ingredients)
+
+
+@pytest.mark.parametrize('limit', [None, 1, 3, 10])
+def test_search_matches_brute_force(sample, limit):
+    names, ingredients, matcher = sample
+    for query in QUERIES:
+        assert matcher.search(query, threshold=0.6, limit=limit) == \
+            brute_force(names, ingredients, query, 0.6, limit), query
+
+
+def test_search_many_matches_search(sample):
+    _, _, matcher = sample
+    batched = list(matcher.search_many(QUERIES, threshold=0.6, limit=5, chunk_size=4))
+    assert batched == [matcher.search(query, threshold=0.6, limit=5) for query in QUERIES]
+
+
+def test_accept_filters_before_the_limit(sample):
+    names, ingredients, matcher = sample
+
+    def accept(query, row, score):
+        return score != WORD_MATCH_SCORE or matcher.name_similarity(query, row) >= 0.6
+
+    for query in QUERIES:
+        expected = brute_force(names, ingredients, query, 0.6, 3, accept)
+        assert matcher.search(query, threshold=0.6, limit=3, accept=accept) == expected, query
+        assert next(matcher.search_many([query], threshold=0.6, limit=3, accept=accept)) == expected, query
+
+
+def test_name_similarity_whole_words():
+    matcher = FuzzyMatcher(['lupimox', 'kuniclav'], ['amoxicilin', 'amoxicilin va kali clavulanat'])
+    assert matcher.name_similarity('amoxicilin 500mg', 0) == 1.0
+    assert matcher.name_similarity('amoxicilin 500mg', 1) < 0.6
@@ -0,0 +1,108 @@
+"""Test LLM client: timeout, semaphore và chọn model Gemini (với module genai giả lập)"""
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from core.llm_client import GeminiClient, StubLLMClient
+
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = types.SimpleNamespace(prompt_token_count=7)
+
+
+class FakeModel:
+    """GenerativeModel giả lập google-generativeai 0.3.2: không nhận keyword lạ"""
+
+    def __init__(self, name, behaviours, calls):
+        self.name = name
+        self._behaviours = behaviours
+        self._calls = calls
+
+    def generate_content(self, contents, **kwargs):
+        if kwargs:
+            raise ValueError(f"Unknown field for GenerateContentRequest: {sorted(kwargs)[0]}")
+        self._calls.append(self.name)
+        behaviour = self._behaviours.get(self.name, 'ok')
+        if isinstance(behaviour, Exception):
+            raise behaviour
+        if isinstance(behaviour, float):
+            time.sleep(behaviour)
+        return FakeResponse(f"{self.name}: {contents}")
+
+
+@pytest.fixture
+def fake_genai(monkeypatch):
+    """Cài module google.generativeai giả lập; trả về (behaviours, calls) để test điều khiển"""
+    behaviours, calls = {}, []
+    genai = types.ModuleType('google.generativeai')
+    genai.configure = lambda api_key: None
+    genai.GenerativeModel = lambda name: FakeModel(name, behaviours, calls)
+    google = types.ModuleType('google')
+    google.generativeai = genai
+    monkeypatch.setitem(sys.modules, 'google', google)
+    monkeypatch.setitem(sys.modules, 'google.generativeai', genai)
+    return behaviours, calls
+
+
+def test_gemini_calls_without_request_options(fake_genai):
+    client = GeminiClient('key', models=('model-a',))
+    assert client.generate('hello') == 'model-a: hello'
+    assert client.stats()['reported_prompt_tokens'] == 7
+
+
+def test_gemini_falls_back_on_any_model_error_and_pins_the_model(fake_genai):
+    behaviours, calls = fake_genai
+    behaviours['model-a'] = PermissionError('no access')
+    behaviours['model-b'] = RuntimeError('quota')
+    client = GeminiClient('key', models=('model-a', 'model-b', 'model-c'))
+    assert client.generate('hi') == 'model-c: hi'
+    assert client.model_name == 'model-c'
+    assert client.generate('again') == 'model-c: again'
+    assert calls == ['model-a', 'model-b', 'model-c', 'model-c']
+
+
+def test_gemini_raises_last_model_error(fake_genai):
+    behaviours, _ = fake_genai
+    behaviours['model-a'] = RuntimeError('down')
+    behaviours['model-b'] = RuntimeError('also down')
+    client = GeminiClient('key', models=('model-a', 'model-b'))
+    with pytest.raises(RuntimeError, match='also down'):
+        client.generate('hi')
+    assert client.model_name is None
+    assert client.stats()['failures'] == 1
+
+
+def test_gemini_enforces_timeout(fake_genai):
+    behaviours, _ = fake_genai
+    behaviours['model-a'] = 1.0
+    client = GeminiClient('key', models=('model-a',), timeout=0.1)
+    start = time.monotonic()
+    with pytest.raises(TimeoutError):
+        client.generate('slow')
+    assert time.monotonic() - start < 0.8
+
+
+def test_semaphore_rejects_calls_over_the_limit():
+    client = StubLLMClient(latency=0.3, timeout=0.5, max_concurrency=1)
+    errors = []
+
+    def call():
+        try:
+            client.generate('- Tên thuốc: A')
+        except TimeoutError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=call) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    stats = client.stats()
+    assert stats['rejected'] == len(errors) >= 1
+    assert stats['calls'] + stats['rejected'] == 3
+    assert stats['in_flight'] == 0
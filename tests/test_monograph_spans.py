@@ -0,0 +1,77 @@
+"""Test MonographSpanIndex: nhận tiêu đề chuyên luận, vị trí span và lưu/đọc SQLite"""
+import sqlite3
+
+import pytest
+
+from core.monograph_spans import MonographSpanIndex, find_titles
+
+PAGES = [
+    # Trang 0: tiêu đề chạy đầu trang (không phải tiêu đề chuyên luận), hết chuyên luận trước
+    "DƯỢC THƯ QUỐC GIA\n...cuối chuyên luận trước.\nCEFACLOR\nTên chung quốc tế: Cefaclor.\nChỉ định: nhiễm khuẩn.",
+    "Liều dùng: 250 mg mỗi 8 giờ.",
+    "CETIRIZIN\nMã ATC: R06AE07.\nLoại thuốc: kháng histamin.\nLiều dùng: 10 mg/ngày.\nCLORAMPHENICOL\nLoại thuốc: kháng sinh.",
+]
+
+
+def page_text(page_index):
+    return PAGES[page_index]
+
+
+def test_find_titles_requires_a_monograph_opening_line():
+    titles = find_titles(PAGES)
+    assert [(title, page) for title, page, _ in titles] == [('CEFACLOR', 0), ('CETIRIZIN', 2), ('CLORAMPHENICOL', 2)]
+    _, _, offset = titles[0]
+    assert PAGES[0][offset:].startswith('CEFACLOR')
+
+
+def test_spans_run_to_the_next_title():
+    index = MonographSpanIndex.from_pages(PAGES)
+    cefaclor, cetirizin, cloramphenicol = index.spans
+    # Tiêu đề kế tiếp ở đầu trang: span kết thúc ở hết trang trước
+    assert (cefaclor.start_page, cefaclor.end_page, cefaclor.end_offset) == (0, 1, None)
+    text = cefaclor.extract(page_text)
+    assert text.startswith('CEFACLOR') and text.endswith('250 mg mỗi 8 giờ.')
+    assert 'CETIRIZIN' not in text
+    assert cetirizin.extract(page_text).endswith('10 mg/ngày.')
+    assert cloramphenicol.extract(page_text) == 'CLORAMPHENICOL\nLoại thuốc: kháng sinh.'
+
+
+def test_find_by_title_near_the_page():
+    index = MonographSpanIndex.from_pages(PAGES)
+    assert index.find('Cefaclor', 1).title == 'CEFACLOR'
+    assert index.find('Cetirizin hydroclorid', 2).title == 'CETIRIZIN'
+    assert index.find('Cefaclor', 500) is None
+    assert index.find('Ibuprofen', 0) is None
+
+
+def test_at_returns_the_span_containing_a_position():
+    index = MonographSpanIndex.from_pages(PAGES)
+    assert index.at(0, 0) is None
+    assert index.at(1).title == 'CEFACLOR'
+    assert index.at(2, len(PAGES[2]) - 1).title == 'CLORAMPHENICOL'
+
+
+def test_save_and_open_for(tmp_path):
+    pdf_path = str(tmp_path / 'book.pdf')
+    index_path = str(tmp_path / 'book.spans.sqlite')
+    MonographSpanIndex.from_pages(PAGES, source_fingerprint='abc').save(index_path)
+    # PDF không có: vẫn dùng index
+    loaded = MonographSpanIndex.open_for(pdf_path, index_path)
+    assert [repr(span) for span in loaded.spans] == [repr(span) for span in MonographSpanIndex.from_pages(PAGES).spans]
+    assert loaded.source_fingerprint == 'abc'
+    # PDF có nhưng khác fingerprint: index đã cũ
+    with open(pdf_path, 'wb') as f:
+        f.write(b'%PDF-1.4 other content')
+    assert MonographSpanIndex.open_for(pdf_path, index_path) is None
+
+
+def test_load_rejects_other_schema(tmp_path):
+    index_path = str(tmp_path / 'book.spans.sqlite')
+    MonographSpanIndex.from_pages(PAGES).save(index_path)
+    conn = sqlite3.connect(index_path)
+    conn.execute("UPDATE meta SET value = '0' WHERE key = 'schema_version'")
+    conn.commit()
+    conn.close()
+    with pytest.raises(sqlite3.DatabaseError):
+        MonographSpanIndex.load(index_path)
+    assert MonographSpanIndex.open_for(str(tmp_path / 'book.pdf'), index_path) is None
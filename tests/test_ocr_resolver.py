@@ -0,0 +1,56 @@
+"""Test chọn thuốc từ các region OCR (resolve_ocr_regions, confident_candidate)"""
+from core.ocr_resolver import (
+    MATCH_EXACT, MATCH_FUZZY, MATCHES_PER_REGION, OCR_COMMON_WORDS, OCRRegion,
+    _match_region_texts, confident_candidate, resolve_ocr_regions,
+)
+from core.text_utils import normalize_query
+
+
+def region(text, confidence=0.9):
+    return OCRRegion(text, confidence, center_distance=0.1, area=0.05)
+
+
+def test_word_matches_rejected_by_similarity_do_not_take_fuzzy_slots(catalog):
+    query = normalize_query('Amoxicilin 500mg')
+    raw = catalog.fuzzy_matcher.search(query, threshold=0.6, limit=MATCHES_PER_REGION)
+    # Chưa lọc: các khớp từ (Kuniclav...) chiếm top 3, Lupimox nằm ngoài
+    assert not any(catalog[row].name_folded == 'lupimox' for row, _ in raw)
+
+    matches = _match_region_texts(catalog, [query], ['Amoxicilin 500mg'])[0]
+    fuzzy = [catalog[row] for row, _, method in matches if method == MATCH_FUZZY]
+    assert len(fuzzy) == MATCHES_PER_REGION
+    assert all(record.ingredient_folded == 'amoxicilin' for record in fuzzy)
+    assert any(record.name_folded == 'lupimox' for record in fuzzy)
+
+
+def test_amoxicilin_label_resolves_to_a_plain_amoxicilin_drug(catalog):
+    candidates = resolve_ocr_regions(catalog, [region('Amoxicilin 500mg')], ignore_words=OCR_COMMON_WORDS)
+    best = confident_candidate(candidates)
+    assert best is not None
+    assert best.record.ingredient_folded == 'amoxicilin'
+
+
+def test_exact_name_is_trusted(catalog):
+    record = catalog[100]
+    candidates = resolve_ocr_regions(catalog, [region(record.name), region('Made in Korea', 0.99)],
+                                     ignore_words=OCR_COMMON_WORDS)
+    best = confident_candidate(candidates)
+    assert best.method == MATCH_EXACT
+    assert best.record.name_key == record.name_key
+
+
+def test_packaging_text_is_not_trusted(catalog):
+    for text in ('Box of 20 tablets', 'Viên nén bao phim', 'Made in Korea', 'Sản xuất tại Việt Nam'):
+        candidates = resolve_ocr_regions(catalog, [region(text)], ignore_words=OCR_COMMON_WORDS)
+        assert confident_candidate(candidates) is None, text
+
+
+def test_common_words_and_numbers_are_skipped(catalog):
+    regions = [region('Tablets'), region('500 mg'), region('10x 10~')]
+    assert resolve_ocr_regions(catalog, regions, ignore_words=OCR_COMMON_WORDS) == []
+
+
+def test_one_candidate_per_drug_name(catalog):
+    record = catalog[100]
+    candidates = resolve_ocr_regions(catalog, [region(record.name), region(record.name.upper(), 0.5)])
+    assert len({candidate.record.name_key for candidate in candidates}) == len(candidates)
@@ -0,0 +1,65 @@
+"""Test index sửa lỗi OCR (SymSpell) và DrugCatalog.find_ocr_match"""
+import pytest
+
+from core.ocr_spell_index import OCRSpellIndex, edit_distance, fold_ocr_confusions
+
+
+def brute_force_distance(a, b):
+    """Optimal string alignment đầy đủ (không giới hạn dải) để đối chiếu"""
+    d = [[0] * (len(b) + 1) for _ in range(len(a) + 1)]
+    for i in range(len(a) + 1):
+        d[i][0] = i
+    for j in range(len(b) + 1):
+        d[0][j] = j
+    for i in range(1, len(a) + 1):
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            d[i][j] = min(d[i - 1][j] + 1, d[i][j - 1] + 1, d[i - 1][j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                d[i][j] = min(d[i][j], d[i - 2][j - 2] + 1)
+    return d[len(a)][len(b)]
+
+
+@pytest.mark.parametrize('a, b', [
+    ('paracetamol', 'paracetamol'), ('paracetamol', 'paracetmaol'), ('panadol', 'panadl'),
+    ('amoxicilin', 'amoxcillin'), ('abc', 'xyz'), ('zade', 'made'), ('', 'abc'),
+])
+def test_edit_distance_matches_full_table(a, b):
+    for max_distance in (1, 2, 3):
+        expected = brute_force_distance(a, b)
+        assert edit_distance(a, b, max_distance) == (expected if expected <= max_distance else max_distance + 1)
+
+
+def test_ocr_confusions_fold_to_the_same_form():
+    assert fold_ocr_confusions('paracetam0l') == fold_ocr_confusions('paracetamol')
+    assert fold_ocr_confusions('arnoxicilin') == fold_ocr_confusions('amoxicilin')
+    assert fold_ocr_confusions('panad1l') == fold_ocr_confusions('panadil')
+
+
+def test_lookup_matches_brute_force():
+    names = ['panadol', 'paracetamol', 'amoxicilin', 'augmentin', 'zade 40', 'efferalgan']
+    ingredients = ['paracetamol', 'paracetamol', 'amoxicilin', 'amoxicilin va kali clavulanat',
+                   'pantoprazol', 'paracetamol']
+    index = OCRSpellIndex(names, ingredients)
+    for query in ('panadl', 'paracetam0l', 'arnoxicilin', 'augmentn', 'efferalgam', 'xyzxyz'):
+        folded = fold_ocr_confusions(query)
+        expected = {fold_ocr_confusions(term) for term in set(names) | set(ingredients)
+                    if brute_force_distance(folded, fold_ocr_confusions(term)) <= 2}
+        found = {fold_ocr_confusions(match.term) for match in index.lookup(query, limit=100)}
+        assert found == expected, query
+
+
+@pytest.mark.parametrize('text', ['Amoxicilin', 'Arnoxicilin', 'AMOXICILIN 500mg'])
+def test_find_ocr_match_prefers_the_exact_ingredient(catalog, text):
+    record, match = catalog.find_ocr_match(text)
+    assert match.term == 'amoxicilin'
+    assert record.ingredient_folded == 'amoxicilin'
+
+
+def test_find_ocr_match_rejects_unrelated_words(catalog):
+    assert catalog.find_ocr_match('Made in Korea') == (None, None)
+
+
+def test_find_ocr_match_corrects_ocr_digits(catalog):
+    record, _ = catalog.find_ocr_match('Paracetam0l')
+    assert record.ingredient_folded == 'paracetamol'
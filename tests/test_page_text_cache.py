@@ -0,0 +1,32 @@
+"""Test PageTextCache: LRU giới hạn theo dung lượng text, key theo nguồn + trang"""
+from core.page_text_cache import PageTextCache, page_text_source
+
+
+def test_evicts_by_total_bytes():
+    cache = PageTextCache(max_bytes=10)
+    cache.get_or_load('pdf:pypdf', 0, lambda: 'a' * 4)
+    cache.get_or_load('pdf:pypdf', 1, lambda: 'b' * 4)
+    cache.get_or_load('pdf:pypdf', 0, lambda: 'unused')
+    cache.get_or_load('pdf:pypdf', 2, lambda: 'c' * 4)
+    stats = cache.stats()
+    assert (stats['pages'], stats['bytes'], stats['evictions']) == (2, 8, 1)
+    assert cache.get_or_load('pdf:pypdf', 0, lambda: 'reloaded') == 'aaaa'
+    assert cache.get_or_load('pdf:pypdf', 1, lambda: 'reloaded') == 'reloaded'
+
+
+def test_sources_are_separate_and_empty_text_is_not_cached():
+    cache = PageTextCache()
+    pypdf, plumber = page_text_source('book.pdf', 'pypdf'), page_text_source('book.pdf', 'pdfplumber')
+    assert cache.get_or_load(pypdf, 0, lambda: 'one') == 'one'
+    assert cache.get_or_load(plumber, 0, lambda: 'two') == 'two'
+    assert cache.get_or_load(pypdf, 1, lambda: '') == ''
+    assert len(cache) == 2
+    cache.clear(pypdf)
+    assert cache.get_or_load(pypdf, 0, lambda: 'again') == 'again'
+    assert cache.get_or_load(plumber, 0, lambda: 'unused') == 'two'
+
+
+def test_text_larger_than_the_limit_is_not_cached():
+    cache = PageTextCache(max_bytes=4)
+    assert cache.get_or_load('pdf', 0, lambda: 'too long') == 'too long'
+    assert len(cache) == 0
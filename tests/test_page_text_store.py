@@ -0,0 +1,68 @@
+"""Test PageTextStore: dựng store từ text trang, đọc theo trang và phát hiện store cũ"""
+import os
+
+import pytest
+
+from core.page_text_store import PageTextStore, default_store_path, pdf_fingerprint
+
+PAGES = ['Trang đầu', '', 'PARACETAMOL\nLiều dùng: 500 mg.']
+
+
+@pytest.fixture
+def pdf_path(tmp_path):
+    path = str(tmp_path / 'book.pdf')
+    with open(path, 'wb') as f:
+        f.write(b'%PDF-1.4 ' + b'x' * 100)
+    return path
+
+
+def test_build_and_read_pages(pdf_path):
+    store = PageTextStore.build(pdf_path, pages=PAGES)
+    try:
+        assert store.store_path == default_store_path(pdf_path)
+        assert len(store) == 3
+        assert [store.get(i) for i in range(3)] == PAGES
+        assert store.get(3) is None
+        assert store.source_fingerprint == pdf_fingerprint(pdf_path)
+    finally:
+        store.close()
+    assert not os.path.exists(store.store_path + '.tmp')
+
+
+def test_open_for_detects_a_changed_pdf(pdf_path):
+    PageTextStore.build(pdf_path, pages=PAGES).close()
+    store = PageTextStore.open_for(pdf_path)
+    assert store is not None
+    store.close()
+    with open(pdf_path, 'ab') as f:
+        f.write(b'more')
+    assert PageTextStore.open_for(pdf_path) is None
+
+
+def test_open_for_without_the_pdf_uses_the_store(pdf_path):
+    PageTextStore.build(pdf_path, pages=PAGES).close()
+    os.remove(pdf_path)
+    store = PageTextStore.open_for(pdf_path)
+    try:
+        assert store.get(2) == PAGES[2]
+    finally:
+        store.close()
+
+
+def test_open_for_missing_or_broken_store(pdf_path):
+    assert PageTextStore.open_for(pdf_path) is None
+    with open(default_store_path(pdf_path), 'wb') as f:
+        f.write(b'not a database')
+    assert PageTextStore.open_for(pdf_path) is None
+
+
+def test_fingerprint_covers_the_end_of_large_files(tmp_path):
+    path = str(tmp_path / 'large.pdf')
+    with open(path, 'wb') as f:
+        f.write(b'a' * (3 << 20))
+    before = pdf_fingerprint(path)
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'b')
+    assert pdf_fingerprint(path) != before
+    assert pdf_fingerprint(str(tmp_path / 'missing.pdf')) is None
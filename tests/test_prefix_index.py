@@ -0,0 +1,105 @@
+"""Test PrefixIndex: gợi ý phải giống hệt xếp hạng toàn bộ (brute force), kể cả với catalog lớn"""
+import random
+
+import pytest
+
+from core.prefix_index import (
+    KIND_DRUG, KIND_INGREDIENT, PRECOMPUTED_LIMIT, PrefixIndex, _KIND_ORDER, _normalize_prefix,
+)
+
+
+def scaled_completions(catalog, factor):
+    """Catalog nhân factor lần, mỗi bản sao có tên khác nhau (thêm hậu tố số)"""
+    completions = []
+    for replica in range(factor):
+        suffix = f" {replica}" if replica else ''
+        for record in catalog:
+            row = replica * len(catalog) + record.row
+            completions.append((record.name + suffix, KIND_DRUG, [row]))
+            completions.append((record.ingredient + suffix, KIND_INGREDIENT, [row]))
+    return completions
+
+
+class BruteForce:
+    """Xếp hạng mọi tên có key hoặc một từ (tính tới hết key) bắt đầu bằng prefix"""
+
+    def __init__(self, completions):
+        self.names = []
+        for text, kind, rows in completions:
+            key = _normalize_prefix(text)
+            if key:
+                words = key.split(' ')
+                suffixes = [' '.join(words[i:]) for i in range(len(words))]
+                self.names.append((key, kind, rows[0], suffixes))
+
+    def complete(self, prefix, limit):
+        prefix = _normalize_prefix(prefix)
+        ranked = []
+        for key, kind, row, suffixes in self.names:
+            for position, suffix in enumerate(suffixes):
+                if suffix.startswith(prefix):
+                    match = 0 if position == 0 else 1
+                    ranked.append(((key != prefix, match, _KIND_ORDER[kind], len(key), row), (key, kind, row)))
+                    break
+        ranked.sort()
+        return [item for _, item in ranked[:limit]]
+
+
+def as_items(results):
+    return [(completion.key, completion.kind, completion.rows[0]) for completion in results]
+
+
+def sample_prefixes(completions, count, seed=0):
+    rng = random.Random(seed)
+    prefixes = ['p', 'pa', 'par', '500', '100', 'inj', 'vien', 'amox', 'vitamin c', 'zzz', 'a 1']
+    for text, _, _ in rng.sample(completions, count):
+        key = _normalize_prefix(text)
+        words = key.split(' ')
+        start = key.find(words[-1]) if len(words) > 1 and rng.random() < 0.3 else 0
+        prefixes.append(key[start:start + rng.randint(1, 6)])
+    return prefixes
+
+
+@pytest.fixture(scope='module')
+def scaled(catalog):
+    completions = scaled_completions(catalog, 3)
+    return completions, PrefixIndex(completions, heavy_prefix_size=16)
+
+
+def test_complete_matches_brute_force_on_scaled_catalog(scaled):
+    completions, index = scaled
+    brute_force = BruteForce(completions)
+    limits = (1, 10, PRECOMPUTED_LIMIT, PRECOMPUTED_LIMIT + 5)
+    for prefix in sample_prefixes(completions, 25):
+        expected = brute_force.complete(prefix, max(limits))
+        for limit in limits:
+            assert as_items(index.complete(prefix, limit)) == expected[:limit], (prefix, limit)
+
+
+def test_complete_matches_brute_force_with_default_threshold(catalog):
+    index = catalog.prefix_index
+    completions = [(completion.text, completion.kind, completion.rows)
+                   for completion in {id(c): c for _, c in index._entries}.values()]
+    brute_force = BruteForce(completions)
+    for prefix in sample_prefixes(completions, 40, seed=1):
+        assert as_items(index.complete(prefix, 10)) == brute_force.complete(prefix, 10), prefix
+
+
+def test_every_heavy_prefix_is_precomputed(scaled):
+    _, index = scaled
+    keys = index._keys
+    counts = {}
+    for key in keys:
+        for length in range(1, 4):
+            if len(key) >= length:
+                counts[key[:length]] = counts.get(key[:length], 0) + 1
+    heavy = {prefix for prefix, count in counts.items() if count > index.heavy_prefix_size}
+    assert heavy <= set(index._heavy)
+
+
+def test_exact_match_comes_first():
+    index = PrefixIndex([('Panadol Extra', KIND_DRUG, [0]), ('Panadol', KIND_DRUG, [1]),
+                         ('Extra Strength', KIND_DRUG, [2])], heavy_prefix_size=1)
+    assert [c.text for c in index.complete('panadol')] == ['Panadol', 'Panadol Extra']
+    assert [c.text for c in index.complete('extra')] == ['Extra Strength', 'Panadol Extra']
+    assert index.complete('   ') == []
@@ -0,0 +1,60 @@
+"""Test ResultCache: LRU, TTL, clear() theo thế hệ và should_cache"""
+import time
+
+from core.result_cache import ResultCache
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = ResultCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == 1
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert (cache.get('a'), cache.get('c')) == (1, 3)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(ttl=0.05)
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    time.sleep(0.1)
+    assert cache.get('a', 'missing') == 'missing'
+    assert cache.stats()['expirations'] == 1
+
+
+def test_none_results_are_cached():
+    cache = ResultCache()
+    calls = []
+    for _ in range(3):
+        assert cache.get_or_compute('a', lambda: calls.append(1)) is None
+    assert len(calls) == 1
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses']) == (2, 1)
+
+
+def test_should_cache_rejects_results():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {'error': True}
+
+    for _ in range(2):
+        cache.get_or_compute('a', compute, should_cache=lambda value: not value.get('error'))
+    assert len(calls) == 2
+    assert len(cache) == 0
+
+
+def test_results_computed_before_clear_are_dropped():
+    cache = ResultCache()
+
+    def compute():
+        # Dữ liệu nguồn được load lại trong lúc đang tính
+        cache.clear()
+        return 'stale'
+
+    assert cache.get_or_compute('a', compute) == 'stale'
+    assert cache.get('a') is None
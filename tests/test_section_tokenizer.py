@@ -0,0 +1,54 @@
+"""Test SectionTokenizer: tách mục chuyên luận theo tiêu đề ở đầu dòng"""
+import unicodedata
+
+from core.section_tokenizer import SectionTokenizer, find_sections, split_sections
+
+MONOGRAPH = """PARACETAMOL
+Tên chung quốc tế: Paracetamol.
+Chỉ định:
+Giảm đau, hạ sốt.
+Chống chỉ định: Người bệnh nhiều lần thiếu máu.
+Thận trọng (cảnh báo đặc biệt)
+Dùng thận trọng ở người suy gan.
+Sử dụng rượu kéo dài làm tăng độc tính.
+3. Tác dụng không mong muốn (ADR):
+Ban da.
+- Liều lượng và cách dùng.
+Người lớn: 500 mg mỗi 4 - 6 giờ.
+Tương tác thuốc:
+Bảo quản: Nơi khô, dưới 30 độ C.
+"""
+
+
+def test_split_keeps_order_and_preamble():
+    sections = split_sections(MONOGRAPH)
+    assert [label for label, _, _ in sections] == [
+        None, 'indications', 'contraindications', 'precautions', 'side_effects', 'dosage', 'interactions', 'storage',
+    ]
+    assert sections[0][2].startswith('PARACETAMOL')
+    assert sections[1] == ('indications', 'Chỉ định', 'Giảm đau, hạ sốt.')
+
+
+def test_longest_heading_wins_and_sentences_are_not_headings():
+    sections = find_sections(MONOGRAPH)
+    assert sections['contraindications'] == 'Người bệnh nhiều lần thiếu máu.'
+    assert sections['side_effects'] == 'Ban da.'
+    # "Sử dụng rượu..." là câu trong nội dung, không phải tiêu đề mục "sử dụng"
+    assert 'usage' not in sections
+    assert sections['precautions'].endswith('tăng độc tính.')
+
+
+def test_empty_sections_are_skipped_in_find_sections():
+    assert 'interactions' not in find_sections(MONOGRAPH)
+    assert find_sections('') == {}
+
+
+def test_decomposed_unicode_is_normalized():
+    text = unicodedata.normalize('NFD', 'Chỉ định:\nGiảm đau.\nBảo quản: Nơi khô.')
+    assert find_sections(text) == {'indications': 'Giảm đau.', 'storage': 'Nơi khô.'}
+
+
+def test_custom_headings_ignore_case_and_underscores():
+    tokenizer = SectionTokenizer({'dose': ('liều dùng',), 'note': ('ghi chú',)})
+    sections = tokenizer.sections('LIỀU_DÙNG: 1 viên\nghi chú.\nKhông dùng khi đói')
+    assert sections == {'dose': '1 viên', 'note': 'Không dùng khi đói'}
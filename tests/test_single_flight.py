@@ -0,0 +1,112 @@
+"""Test SingleFlight và việc gộp cache miss đồng thời của ResultCache"""
+import threading
+import time
+
+import pytest
+
+from core.result_cache import ResultCache
+from core.single_flight import SingleFlight
+
+
+def run_concurrently(count, target):
+    """Chạy target() trên count thread cùng lúc, trả về kết quả/lỗi của từng thread"""
+    results = [None] * count
+    barrier = threading.Barrier(count)
+
+    def worker(i):
+        barrier.wait()
+        try:
+            results[i] = target()
+        except Exception as e:
+            results[i] = e
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight('test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return 'value'
+
+    results = run_concurrently(10, lambda: flight.do('key', compute))
+    assert results == ['value'] * 10
+    assert len(calls) == 1
+    stats = flight.stats()
+    assert (stats['executions'], stats['coalesced'], stats['in_flight']) == (1, 9, 0)
+
+
+def test_waiting_callers_get_the_leader_error():
+    flight = SingleFlight()
+
+    def compute():
+        time.sleep(0.2)
+        raise RuntimeError('quota')
+
+    results = run_concurrently(5, lambda: flight.do('key', compute))
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert flight.stats()['executions'] == 1
+    # Xong rồi thì key được tính lại (không cache lỗi)
+    assert flight.do('key', lambda: 'retry') == 'retry'
+
+
+def test_different_keys_run_separately():
+    flight = SingleFlight()
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats()['executions'] == 2
+
+
+def test_result_cache_coalesces_concurrent_misses():
+    cache = ResultCache(name='test')
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {'usage': 'x'}
+
+    results = run_concurrently(8, lambda: cache.get_or_compute('key', compute))
+    assert results == [{'usage': 'x'}] * 8
+    assert len(calls) == 1
+    assert cache.stats()['coalesced'] == 7
+
+
+def test_result_cache_shares_results_that_are_not_cached():
+    cache = ResultCache()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return None
+
+    results = run_concurrently(4, lambda: cache.get_or_compute('key', compute, should_cache=lambda v: v is not None))
+    assert results == [None] * 4
+    assert len(calls) == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.parametrize('count', [1, 3])
+def test_in_flight_is_reported_while_computing(count):
+    flight = SingleFlight()
+    release = threading.Event()
+    threads = [threading.Thread(target=flight.do, args=(i, release.wait)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2
+    while flight.in_flight() < count and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert flight.in_flight() == count
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert flight.in_flight() == 0
@@ -0,0 +1,74 @@
+"""Test SummaryCache: khóa (chuyên luận, hash text nguồn, phiên bản prompt), TTL, chỉ đọc"""
+import os
+
+import pytest
+
+from core import summary_cache
+from core.summary_cache import SummaryCache
+
+SUMMARY = {'usage': 'Uống sau bữa ăn.', 'notes': 'Không dùng khi dị ứng.'}
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = SummaryCache(str(tmp_path / 'book.summaries.sqlite'), ttl=100)
+    yield cache
+    cache.close()
+
+
+def test_key_includes_source_text_and_prompt_version(cache):
+    cache.put('m1', 'text', '2-b1200', SUMMARY)
+    assert cache.get('m1', 'text', '2-b1200') == SUMMARY
+    assert cache.get('m1', 'text changed', '2-b1200') is None
+    assert cache.get('m1', 'text', '2-b800') is None
+    assert cache.get('m2', 'text', '2-b1200') is None
+    assert cache.stats()['hits'] == 1
+
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    now = 1_000_000.0
+    monkeypatch.setattr(summary_cache.time, 'time', lambda: now)
+    cache.put('m1', 'text', 'v', SUMMARY)
+    now += 99
+    assert cache.get('m1', 'text', 'v') == SUMMARY
+    now += 2
+    assert cache.get('m1', 'text', 'v') is None
+    assert cache.purge_expired() == 1
+
+
+def test_invalidate_by_monograph_or_version(cache):
+    for monograph_id in ('m1', 'm2'):
+        for version in ('v1', 'v2'):
+            cache.put(monograph_id, 'text', version, SUMMARY)
+    assert cache.invalidate(monograph_id='m1') == 2
+    assert cache.invalidate(prompt_version='v1') == 1
+    assert len(cache) == 1
+    assert cache.get('m2', 'text', 'v2') == SUMMARY
+
+
+def test_entries_are_shared_between_connections(cache):
+    cache.put('m1', 'text', 'v', SUMMARY)
+    other = SummaryCache.open(cache.cache_path)
+    try:
+        assert other.get('m1', 'text', 'v') == SUMMARY
+    finally:
+        other.close()
+
+
+def test_read_only_cache_serves_existing_entries(tmp_path):
+    path = str(tmp_path / 'book.summaries.sqlite')
+    writer = SummaryCache(path)
+    writer.put('m1', 'text', 'v', SUMMARY)
+    writer.close()
+    read_only = SummaryCache(path, read_only=True)
+    try:
+        assert read_only.get('m1', 'text', 'v') == SUMMARY
+        read_only.put('m2', 'text', 'v', SUMMARY)
+        assert read_only.invalidate() == 0
+        assert read_only.stats()['writes'] == 0
+    finally:
+        read_only.close()
+
+
+def test_open_returns_none_when_the_file_cannot_be_created(tmp_path):
+    assert SummaryCache.open(os.path.join(str(tmp_path), 'missing', 'cache.sqlite')) is None
@@ -0,0 +1,43 @@
+"""Test TrigramIndex: kết quả phải giống hệt quét cả cột bằng `needle in key`"""
+import random
+
+import pytest
+
+from core.trigram_index import TrigramIndex
+
+
+@pytest.fixture(scope='module')
+def names(catalog):
+    return [record.name_folded for record in catalog] + [None, float('nan')]
+
+
+def needles(keys, count=80, seed=0):
+    rng = random.Random(seed)
+    samples = ['', 'a', 'pa', 'par', 'paracetamol', '500', ' ', 'zzzq', 'vien nen']
+    for key in rng.sample([key for key in keys if isinstance(key, str) and key], count):
+        start = rng.randrange(len(key))
+        samples.append(key[start:start + rng.randint(1, 8)])
+    return samples
+
+
+def test_iter_containing_matches_scan(names):
+    index = TrigramIndex(names)
+    for needle in needles(names):
+        expected = [row for row, key in enumerate(names) if isinstance(key, str) and needle in key]
+        assert list(index.iter_containing(needle)) == expected, needle
+        assert index.find_first_containing(needle) == (expected[0] if expected else None), needle
+
+
+def test_iter_containing_resumes_from_start(names):
+    index = TrigramIndex(names)
+    for needle in needles(names, count=20, seed=1):
+        rows = list(index.iter_containing(needle))
+        for start in (0, 1, len(names) // 2, len(names)):
+            assert list(index.iter_containing(needle, start)) == [row for row in rows if row >= start], needle
+
+
+def test_find_exact_returns_the_first_row():
+    index = TrigramIndex(['panadol', 'efferalgan', 'panadol', None])
+    assert index.find_exact('panadol') == 0
+    assert index.find_exact('efferalgan') == 1
+    assert index.find_exact('pana') is None